@@ -0,0 +1,417 @@
+"""Subscription analytics: daily and monthly rollups by product and plan.
+
+Every lifecycle event (requested, activated, suspended, cancelled) becomes a
+row in subscription_events, carrying its effect on MRR at the plan's price_now.
+The scheduler job analytics_rollup folds new events into analytics_rollups, so
+reading a series costs one row per bucket, product and plan, whatever the
+number of subscriptions. `python analytics.py rebuild` recomputes every rollup
+from the events, after deriving the missing history of subscriptions that
+predate the ledger from their current rows.
+"""
+import asyncio
+import collections
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import events
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_FLUSH_SECONDS = 2
+FOLD_BATCH_SIZE = 500
+# Ledger rows held in memory while inserts fail; the oldest are dropped past this
+BUFFER_MAX = 100000
+FOLD_MAX_BATCHES = 20
+PAGE_SIZE = 5000
+
+# prefix of the ISO timestamp that names the bucket
+GRANULARITIES = {"day": 10, "month": 7}
+COUNTED_EVENTS = ("new", "activated", "suspended", "cancelled")
+VALUE_COLUMNS = ("new_count", "activated_count", "suspended_count", "cancelled_count", "mrr_delta")
+EVENT_COLUMNS = "id, event, product_id, plan_name, mrr_delta, occurred_at"
+ROLLUP_KEY = "granularity,bucket,product_id,plan_name"
+
+folded_total = metrics.counter("analytics_events_folded_total", "Subscription events folded into rollups")
+fold_duration = metrics.histogram("analytics_fold_duration_ms", "Duration of each rollup fold")
+dropped_total = metrics.counter("analytics_events_dropped_total", "Ledger rows dropped because the retry buffer was full")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def plan_prices(products: list) -> dict:
+    return {(p["id"], plan["name"]): float(plan["price_now"]) for p in products for plan in p["plans"]}
+
+
+def ledger_rows(event: str, sub: dict, prices: dict, occurred_at: str = None) -> list:
+    """subscription_events rows for one lifecycle event.
+
+    Emitters pass previous_status on transitions; an activation without it is
+    a subscription created already active (admin assignment), so it is new too.
+    """
+    status = event.rpartition(".")[2]
+    previous = sub.get("previous_status")
+    price = prices.get((sub.get("product_id"), sub.get("plan_name")), 0.0)
+
+    def row(kind, mrr_delta=0.0):
+        return {
+            "id": str(uuid.uuid4()), "subscription_id": sub["id"], "event": kind,
+            "product_id": sub["product_id"], "plan_name": sub["plan_name"],
+            "mrr_delta": mrr_delta, "occurred_at": occurred_at or _now().isoformat(),
+        }
+
+    if status == "requested":
+        return [row("new")]
+    if status == "activated":
+        rows = [] if "previous_status" in sub else [row("new")]
+        return rows + [row("activated", price if previous != "active" else 0.0)]
+    if status in ("suspended", "cancelled", "pending"):
+        return [row(status, -price if previous == "active" else 0.0)]
+    return []
+
+
+def aggregate(rows, totals=None) -> dict:
+    """(granularity, bucket, product, plan) -> [new, activated, suspended, cancelled, mrr_delta]."""
+    totals = totals if totals is not None else defaultdict(lambda: [0, 0, 0, 0, 0.0])
+    for row in rows:
+        occurred = str(row["occurred_at"])
+        index = COUNTED_EVENTS.index(row["event"]) if row["event"] in COUNTED_EVENTS else None
+        mrr = float(row["mrr_delta"] or 0)
+        for granularity, width in GRANULARITIES.items():
+            values = totals[(granularity, occurred[:width], row["product_id"], row["plan_name"])]
+            if index is not None:
+                values[index] += 1
+            values[4] += mrr
+    return totals
+
+
+def _rollup_row(key: tuple, values) -> dict:
+    granularity, bucket, product_id, plan_name = key
+    row = {"granularity": granularity, "bucket": bucket, "product_id": product_id, "plan_name": plan_name}
+    row.update(zip(VALUE_COLUMNS, values))
+    row["mrr_delta"] = round(row["mrr_delta"], 2)
+    return row
+
+
+class AnalyticsRecorder:
+    """Writes ledger rows from lifecycle listeners; failed inserts are retried by a background task."""
+
+    def __init__(self, client, prices: dict, max_buffer: int = BUFFER_MAX):
+        self.client = client
+        self.prices = prices
+        self.max_buffer = max_buffer
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def record(self, event: str, sub: dict):
+        # inserted on the emitting thread, so the ledger holds the event once the
+        # request that caused it returns; only a failed insert waits in memory
+        rows = ledger_rows(event, sub, self.prices)
+        if not rows:
+            return
+        try:
+            self._insert(rows)
+        except Exception as e:
+            logger.error(f"Analytics insert failed, queued for retry: {e}")
+            self._buffer.extend(rows)
+            self._trim()
+
+    def _insert(self, rows):
+        # Rows carry their id from ledger_rows(), so a retry of an insert that timed
+        # out but committed skips it instead of failing on the primary key
+        self.client.table("subscription_events").upsert(rows, on_conflict="id", ignore_duplicates=True).execute()
+
+    def _trim(self):
+        dropped = 0
+        while len(self._buffer) > self.max_buffer:
+            self._buffer.popleft()
+            dropped += 1
+        if dropped:
+            dropped_total.inc(dropped)
+            logger.error(f"Analytics buffer full, dropped the {dropped} oldest ledger rows")
+
+    def flush(self) -> int:
+        with self._lock:
+            rows = []
+            while self._buffer:
+                rows.append(self._buffer.popleft())
+            if not rows:
+                return 0
+            try:
+                self._insert(rows)
+            except Exception:
+                self._buffer.extendleft(reversed(rows))
+                self._trim()
+                raise
+            return len(rows)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(ANALYTICS_FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Analytics flush failed, will retry: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            logger.error(f"Could not flush analytics events on shutdown: {e}")
+
+
+def register_listeners(recorder: AnalyticsRecorder):
+    for status in ("requested", "activated", "suspended", "cancelled", "pending"):
+        events.subscribe(f"subscription.{status}", recorder.record)
+
+
+# ============== ROLLUPS ==============
+
+def fold_rollups(client) -> int:
+    """Scheduler job: add unfolded events to their rollup rows.
+
+    Only the scheduler leader runs it, so the read-add-upsert is not raced. A
+    crash between the upsert and marking the events folded counts that batch
+    twice; `rebuild` repairs it.
+    """
+    folded = 0
+    for _ in range(FOLD_MAX_BATCHES):
+        started = _now()
+        rows = client.table("subscription_events").select(EVENT_COLUMNS).is_("folded_at", "null").order(
+            "occurred_at"
+        ).limit(FOLD_BATCH_SIZE).execute().data
+        if not rows:
+            break
+        deltas = aggregate(rows)
+        current = {
+            (r["granularity"], r["bucket"], r["product_id"], r["plan_name"]): r
+            for r in client.table("analytics_rollups").select("*").in_(
+                "bucket", sorted({key[1] for key in deltas})
+            ).execute().data
+        }
+        merged = []
+        for key, values in deltas.items():
+            existing = current.get(key)
+            if existing:
+                values = [float(existing[c] or 0) + v if c == "mrr_delta" else int(existing[c] or 0) + v
+                          for c, v in zip(VALUE_COLUMNS, values)]
+            merged.append(_rollup_row(key, values))
+        client.table("analytics_rollups").upsert(merged, on_conflict=ROLLUP_KEY).execute()
+        client.table("subscription_events").update({"folded_at": _now().isoformat()}).in_(
+            "id", [r["id"] for r in rows]
+        ).execute()
+        folded += len(rows)
+        folded_total.inc(len(rows))
+        fold_duration.observe((_now() - started).total_seconds() * 1000)
+        if len(rows) < FOLD_BATCH_SIZE:
+            break
+    return folded
+
+
+def _pages(query_factory):
+    start = 0
+    while True:
+        rows = query_factory().range(start, start + PAGE_SIZE - 1).execute().data
+        yield rows
+        if len(rows) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+
+def _parse(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _ledger_starts(client) -> dict:
+    """subscription_id -> (has a "new" row, first event row) for every subscription in the ledger."""
+    starts = {}
+    query = lambda: client.table("subscription_events").select(
+        "id, subscription_id, event, mrr_delta, occurred_at"
+    ).order("occurred_at").order("id")
+    for page in _pages(query):
+        for row in page:
+            has_new, first = starts.get(row["subscription_id"], (False, row))
+            starts[row["subscription_id"]] = (has_new or row["event"] == "new", first)
+    return starts
+
+
+def backfill_events(client, prices: dict) -> int:
+    """Ledger rows derived from the current subscriptions, for history recorded before the ledger.
+
+    A subscription without a "new" row started before the ledger. With no rows
+    at all, its whole history is derived. Otherwise only what came before its
+    first recorded event is: the request and, when that first event closed an
+    active subscription, the activation.
+
+    Suspensions and cancellations carry no timestamp of their own; they are
+    dated at current_period_end (or creation), which is when they usually
+    happen, and never later than now.
+    """
+    now = _now()
+    starts = _ledger_starts(client)
+    written = 0
+    query = lambda: client.table("subscriptions").select(
+        "id, product_id, plan_name, status, created_at, enabled_at, current_period_end"
+    ).order("created_at").order("id")
+    for page in _pages(query):
+        rows = []
+        for sub in page:
+            has_new, first = starts.get(sub["id"], (False, None))
+            if has_new:
+                continue
+            created = str(sub["created_at"])
+            rows += ledger_rows("subscription.requested", sub, prices, created)
+            if first is not None:
+                if float(first["mrr_delta"] or 0) < 0:
+                    enabled = sub.get("enabled_at") or created
+                    before_first = _parse(enabled) < _parse(first["occurred_at"])
+                    activated_at = str(enabled if before_first else created)
+                    rows += ledger_rows("subscription.activated", {**sub, "previous_status": "pending"}, prices,
+                                        activated_at)
+                continue
+            if sub.get("enabled_at"):
+                rows += ledger_rows("subscription.activated", {**sub, "previous_status": "pending"}, prices,
+                                    str(sub["enabled_at"]))
+            if sub["status"] in ("suspended", "cancelled", "pending") and (sub.get("enabled_at") or sub["status"] != "pending"):
+                closed_at = min(datetime.fromisoformat(str(sub.get("current_period_end") or created)), now).isoformat()
+                previous = "active" if sub.get("enabled_at") else "pending"
+                rows += ledger_rows(f"subscription.{sub['status']}", {**sub, "previous_status": previous}, prices, closed_at)
+        for i in range(0, len(rows), FOLD_BATCH_SIZE):
+            client.table("subscription_events").insert(rows[i:i + FOLD_BATCH_SIZE]).execute()
+        written += len(rows)
+    return written
+
+
+def rebuild(client, prices: dict) -> int:
+    """Recompute every rollup from the whole ledger in one pass; returns the rollup row count."""
+    backfilled = backfill_events(client, prices)
+    if backfilled:
+        logger.info(f"Backfilled {backfilled} subscription events")
+    totals, unfolded = None, []
+    query = lambda: client.table("subscription_events").select(EVENT_COLUMNS + ", folded_at").order(
+        "occurred_at"
+    ).order("id")
+    for page in _pages(query):
+        totals = aggregate(page, totals)
+        unfolded += [r["id"] for r in page if r.get("folded_at") is None]
+
+    rows = [_rollup_row(key, values) for key, values in sorted((totals or {}).items())]
+    client.table("analytics_rollups").delete().neq("granularity", "").execute()
+    for i in range(0, len(rows), FOLD_BATCH_SIZE):
+        client.table("analytics_rollups").insert(rows[i:i + FOLD_BATCH_SIZE]).execute()
+    now = _now().isoformat()
+    for i in range(0, len(unfolded), FOLD_BATCH_SIZE):
+        client.table("subscription_events").update({"folded_at": now}).in_(
+            "id", unfolded[i:i + FOLD_BATCH_SIZE]
+        ).execute()
+    return len(rows)
+
+
+# ============== QUERIES ==============
+
+def _buckets(granularity: str, start: str, end: str) -> list:
+    if granularity == "day":
+        first, last = date.fromisoformat(start), date.fromisoformat(end)
+        return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+    year, month = map(int, start.split("-"))
+    buckets = []
+    while f"{year:04d}-{month:02d}" <= end:
+        buckets.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
+
+def default_range(granularity: str) -> tuple:
+    today = _now().date()
+    if granularity == "day":
+        return (today - timedelta(days=29)).isoformat(), today.isoformat()
+    year, month = (today.year - 1, today.month + 1) if today.month < 12 else (today.year, 1)
+    return f"{year:04d}-{month:02d}", today.isoformat()[:7]
+
+
+def series(client, granularity: str, start: str, end: str, product_id: str = None) -> dict:
+    """Per-bucket counts and end-of-bucket MRR, plus MRR by plan at the end of the range."""
+    def rollups(granularity_, **filters):
+        query = client.table("analytics_rollups").select("*").eq("granularity", granularity_)
+        if product_id:
+            query = query.eq("product_id", product_id)
+        for op, (column, value) in filters.items():
+            query = getattr(query, op)(column, value)
+        return query.execute().data
+
+    # opening MRR: every month before the range, plus the days of its first month before start
+    mrr = defaultdict(float)
+    opening = rollups("month", lt=("bucket", start[:7]))
+    if granularity == "day":
+        opening += rollups("day", gte=("bucket", start[:7] + "-01"), lt=("bucket", start))
+    for row in opening:
+        mrr[(row["product_id"], row["plan_name"])] += float(row["mrr_delta"] or 0)
+
+    by_bucket = defaultdict(list)
+    for row in rollups(granularity, gte=("bucket", start), lte=("bucket", end)):
+        by_bucket[row["bucket"]].append(row)
+
+    points = []
+    for bucket in _buckets(granularity, start, end):
+        counts = dict.fromkeys(COUNTED_EVENTS, 0)
+        for row in by_bucket.get(bucket, ()):
+            for event, column in zip(COUNTED_EVENTS, VALUE_COLUMNS):
+                counts[event] += int(row[column] or 0)
+            mrr[(row["product_id"], row["plan_name"])] += float(row["mrr_delta"] or 0)
+        by_product = defaultdict(float)
+        for (product, _plan), value in mrr.items():
+            by_product[product] += value
+        points.append({
+            "bucket": bucket, **counts,
+            "mrr": round(sum(by_product.values()), 2),
+            "mrr_by_product": {p: round(v, 2) for p, v in sorted(by_product.items()) if round(v, 2)},
+        })
+
+    by_plan = defaultdict(dict)
+    for (product, plan), value in sorted(mrr.items()):
+        if round(value, 2):
+            by_plan[product][plan] = round(value, 2)
+    return {
+        "granularity": granularity, "start": start, "end": end, "product_id": product_id,
+        "points": points, "mrr_by_plan": dict(by_plan),
+    }
+
+
+def main():
+    import argparse
+    from pathlib import Path
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+    from db import create_data_client
+    from products import PRODUCTS
+
+    parser = argparse.ArgumentParser(description="Agregados de analítica de suscripciones")
+    parser.add_argument("command", choices=["rebuild", "fold"])
+    args = parser.parse_args()
+
+    client = create_data_client()
+    if args.command == "rebuild":
+        print(f"{rebuild(client, plan_prices(PRODUCTS))} filas de agregados recalculadas")
+    else:
+        print(f"{fold_rollups(client)} eventos sumados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# "table" appends to the audit_log table, "file" to local JSONL segments
+AUDIT_SINK = os.environ.get('AUDIT_SINK', 'table').lower()
+AUDIT_DIR = Path(os.environ.get('AUDIT_DIR', Path(__file__).parent / 'audit'))
+AUDIT_SEGMENT_MAX_BYTES = int(os.environ.get('AUDIT_SEGMENT_MAX_BYTES', str(8 * 1024 * 1024)))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '1'))
+AUDIT_BATCH_SIZE = 500
+# Entries held in memory while the sink is down; the oldest are dropped past this
+AUDIT_BUFFER_MAX = int(os.environ.get('AUDIT_BUFFER_MAX', '100000'))
+
+flushed_total = metrics.counter("audit_entries_flushed_total", "Audit entries written to the sink")
+flush_duration = metrics.histogram("audit_flush_duration_ms", "Duration of each audit batch write")
+dropped_total = metrics.counter("audit_entries_dropped_total", "Audit entries dropped because the buffer was full")
+
+
+def diff(before: dict, after: dict) -> dict:
+    """Changed fields as {field: [old, new]}, only for keys present in after."""
+    return {
+        key: [before.get(key), value]
+        for key, value in after.items()
+        if before.get(key) != value
+    }
+
+
+class TableSink:
+    def __init__(self, client):
+        self.client = client
+
+    def write(self, entries):
+        # Entries carry their id from record(), so a retried batch skips the rows an
+        # earlier attempt already wrote (or committed after timing out)
+        for i in range(0, len(entries), AUDIT_BATCH_SIZE):
+            self.client.table("audit_log").upsert(
+                entries[i:i + AUDIT_BATCH_SIZE], on_conflict="id", ignore_duplicates=True
+            ).execute()
+
+    def query(self, filters: dict, offset: int, limit: int):
+        query = self.client.table("audit_log").select("*", count="exact")
+        for field, value in filters.items():
+            query = query.eq(field, value)
+        result = query.order("created_at", desc=True).range(offset, offset + limit - 1).execute()
+        return result.count or 0, result.data
+
+
+class SegmentFileSink:
+    """Append-only JSONL segments, a new file once the current one exceeds max_bytes."""
+
+    def __init__(self, directory: Path = AUDIT_DIR, max_bytes: int = AUDIT_SEGMENT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._current = None
+
+    def _segments(self):
+        return sorted(self.directory.glob("audit-*.jsonl"))
+
+    def _segment_for_write(self) -> Path:
+        if self._current is None:
+            existing = self._segments()
+            self._current = existing[-1] if existing else None
+        if self._current is None or self._current.stat().st_size >= self.max_bytes:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            self._current = self.directory / f"audit-{stamp}.jsonl"
+        return self._current
+
+    def write(self, entries):
+        data = "".join(json.dumps(e, default=str, ensure_ascii=False) + "\n" for e in entries)
+        with open(self._segment_for_write(), "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def query(self, filters: dict, offset: int, limit: int):
+        # Newest segment first, newest line first within each segment
+        total, page = 0, []
+        for segment in reversed(self._segments()):
+            with open(segment, encoding="utf-8") as f:
+                lines = f.readlines()
+            for line in reversed(lines):
+                entry = json.loads(line)
+                if any(str(entry.get(k)) != str(v) for k, v in filters.items()):
+                    continue
+                if offset <= total < offset + limit:
+                    page.append(entry)
+                total += 1
+        return total, page
+
+
+class AuditLog:
+    """Buffers audit entries in memory; a background task flushes them in batches."""
+
+    def __init__(self, sink, max_buffer: int = AUDIT_BUFFER_MAX):
+        self.sink = sink
+        self.max_buffer = max_buffer
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def record(self, actor: dict, action: str, target_type: str, target_id: str, changes: dict = None):
+        self._buffer.append({
+            "id": str(uuid.uuid4()),
+            "actor_id": actor.get("id"),
+            "actor_email": actor.get("email"),
+            "action": action,
+            "target_type": target_type,
+            "target_id": str(target_id),
+            "diff": changes or {},
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        self._trim()
+
+    def _trim(self):
+        dropped = 0
+        while len(self._buffer) > self.max_buffer:
+            self._buffer.popleft()
+            dropped += 1
+        if dropped:
+            dropped_total.inc(dropped)
+            logger.error(f"Audit buffer full, dropped the {dropped} oldest entries")
+
+    def flush(self) -> int:
+        # the lock keeps concurrent flushes (timer + query) from reordering batches
+        with self._lock:
+            entries = []
+            while self._buffer:
+                entries.append(self._buffer.popleft())
+            if not entries:
+                return 0
+            started = datetime.now(timezone.utc)
+            try:
+                self.sink.write(entries)
+            except Exception:
+                self._buffer.extendleft(reversed(entries))
+                self._trim()
+                raise
+            flush_duration.observe((datetime.now(timezone.utc) - started).total_seconds() * 1000)
+            flushed_total.inc(len(entries))
+            return len(entries)
+
+    def query(self, filters: dict, page: int, page_size: int):
+        try:
+            self.flush()
+        except Exception as e:
+            # the read may still work; buffered entries show up once a flush does
+            logger.error(f"Audit flush before query failed: {e}")
+        filters = {k: v for k, v in filters.items() if v is not None}
+        return self.sink.query(filters, (page - 1) * page_size, page_size)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(AUDIT_FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Audit flush failed, will retry: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            logger.error(f"Could not flush audit log on shutdown: {e}")
+
+
+def create_audit_log(client) -> AuditLog:
+    sink = SegmentFileSink() if AUDIT_SINK == "file" else TableSink(client)
+    return AuditLog(sink)
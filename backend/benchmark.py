@@ -0,0 +1,319 @@
+"""Throughput of the hot data-access paths on the configured DATA_BACKEND.
+
+    DATA_BACKEND=sqlite python benchmark.py --ops 5000 --threads 8
+    DATA_BACKEND=supabase python benchmark.py --ops 500 --threads 8
+
+Reads only, unless --writes is given (then it also inserts contact messages,
+which stay in the table).
+
+--profiling runs every operation twice, on the plain client and on the
+profiling-instrumented one inside a request profile, to show what
+PROFILING_ENABLED=true costs per data call. --resilience likewise runs it
+through the circuit breaker and timeout pool of resilience.py.
+
+With --http it instead measures the large admin lists of a running server once
+per Accept-Encoding, reporting bytes on the wire and latency:
+
+    python benchmark.py --http http://localhost:8000 --token <admin JWT> --ops 50
+
+--rss serves each large admin list in a fresh process, materialized
+(ADMIN_STREAMING=false) and streamed, and reports the peak RSS it took:
+
+    DATA_BACKEND=sqlite python benchmark.py --rss
+
+--subscribe times the subscription-creation paths, with the duplicate check
+as a query before the insert and folded into it, adding --rtt-ms of latency
+to every data call to stand in for the network (writes rows, removed after):
+
+    DATA_BACKEND=sqlite python benchmark.py --subscribe --rtt-ms 20 --ops 200
+
+--tokens times access-token verification per algorithm: from a PEM on every
+call, with the key loaded once, and from the verified-token cache:
+
+    python benchmark.py --tokens --ops 20000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from dotenv import load_dotenv
+from pathlib import Path
+
+load_dotenv(Path(__file__).parent / '.env')
+
+from db import DATA_BACKEND, create_data_client
+import profiling
+import resilience
+import tokens
+
+
+# path -> table, for the row count
+RSS_LISTS = {
+    "/api/admin/subscriptions": "subscriptions",
+    "/api/admin/messages": "contact_messages",
+    "/api/admin/companies": "companies",
+    "/api/admin/users": "users",
+}
+ADMIN_LISTS = ("/api/admin/subscriptions", "/api/admin/companies", "/api/admin/users", "/api/admin/messages")
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def _report(name: str, latencies: list, elapsed: float, extra: str = ""):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"  {name:26} {len(latencies) / elapsed:9.0f} ops/s  p50 {statistics.median(latencies):7.2f} ms  "
+          f"p99 {p99:7.2f} ms{extra}")
+
+
+def benchmark_http(base_url: str, token: str, ops: int, threads: int):
+    print(f"server={base_url} ops={ops} threads={threads}")
+    headers = {"Authorization": f"Bearer {token}"}
+    with httpx.Client(base_url=base_url, headers=headers, timeout=30) as http:
+        for path in ADMIN_LISTS:
+            print(f"  {path}")
+            for encoding in ENCODINGS:
+                def fetch(_i):
+                    started = time.perf_counter()
+                    # iter_raw counts the bytes as sent, before httpx would decode them
+                    with http.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+                        response.raise_for_status()
+                        size = sum(len(chunk) for chunk in response.iter_raw())
+                        sent = response.headers.get("content-encoding", "identity")
+                    return (time.perf_counter() - started) * 1000, size, sent
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(threads) as pool:
+                    results = list(pool.map(fetch, range(ops)))
+                elapsed = time.perf_counter() - started
+                _report(f"  {encoding}", [r[0] for r in results], elapsed,
+                        f"  {statistics.mean(r[1] for r in results) / 1024:9.1f} KiB ({results[0][2]})")
+
+
+def _serve_list(path: str, streamed: bool, results):
+    """Runs in a spawned process: one GET through the whole app, with the body counted and dropped."""
+    os.environ["ADMIN_STREAMING"] = "true" if streamed else "false"
+    import server
+
+    admin = server.supabase.table("users").select("id, email").eq("role", "admin").limit(1).execute().data[0]
+    token = server.create_token(admin["id"], admin["email"], "admin")
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    size, status = 0, None
+
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # streaming responses listen for a disconnect until they finish
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal size, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"benchmark"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 0), "server": ("benchmark", 80),
+    }
+    started = time.perf_counter()
+    asyncio.run(server.app(scope, receive, send))
+    elapsed = (time.perf_counter() - started) * 1000
+    # ru_maxrss is in KiB on Linux
+    results.put((status, size, baseline, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed))
+
+
+def benchmark_rss(client):
+    print(f"backend={DATA_BACKEND}")
+    context = multiprocessing.get_context("spawn")
+    for path, table in RSS_LISTS.items():
+        rows = client.table(table).select("id", count="exact").limit(1).execute().count
+        print(f"  {path} ({rows} filas)")
+        for label, streamed in (("materialized", False), ("streamed", True)):
+            results = context.Queue()
+            process = context.Process(target=_serve_list, args=(path, streamed, results))
+            process.start()
+            status, size, baseline, peak, elapsed = results.get()
+            process.join()
+            print(f"    {label:13} {status}  {size / 2**20:8.1f} MiB  {elapsed:9.0f} ms  "
+                  f"peak RSS {peak / 1024:7.1f} MiB  (+{(peak - baseline) / 1024:.1f} MiB over startup)")
+
+
+def benchmark_tokens(ops: int):
+    import tempfile
+    from pathlib import Path
+
+    import jwt
+    from cryptography.hazmat.primitives import serialization
+
+    print(f"ops={ops}")
+    claims = {"user_id": str(uuid.uuid4()), "email": "bench@example.com", "role": "user", "exp": time.time() + 3600}
+    with tempfile.TemporaryDirectory() as directory:
+        services = {"HS256": tokens.TokenService({}, secret=uuid.uuid4().hex)}
+        for algorithm in tokens.ALGORITHMS:
+            key = tokens.load_key(tokens.generate(Path(directory), algorithm))
+            services[algorithm] = tokens.TokenService({key.kid: key})
+    for algorithm, service in services.items():
+        token = service.issue(claims)
+        key = service.signing
+        pem = key.verifying_key if algorithm == "HS256" else key.verifying_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        uncached = tokens.TokenService({}, secret=key.signing_key, cache_size=0) if algorithm == "HS256" else \
+            tokens.TokenService({key.kid: key}, cache_size=0)
+        service.verify(token)
+        cases = {
+            "pem per call": lambda: jwt.decode(token, pem, algorithms=[algorithm]),
+            "loaded key": lambda: uncached.verify(token),
+            "cached": lambda: service.verify(token),
+        }
+        for label, verify in cases.items():
+            started = time.perf_counter()
+            for _ in range(ops):
+                verify()
+            elapsed = time.perf_counter() - started
+            print(f"  {algorithm:6} {label:13} {elapsed / ops * 1e6:9.1f} us/verify  ({len(token)} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", action="store_true")
+    parser.add_argument("--profiling", action="store_true")
+    parser.add_argument("--resilience", action="store_true")
+    parser.add_argument("--http", metavar="BASE_URL")
+    parser.add_argument("--token")
+    parser.add_argument("--rss", action="store_true")
+    parser.add_argument("--tokens", action="store_true")
+    parser.add_argument("--subscribe", action="store_true")
+    parser.add_argument("--rtt-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    if args.http:
+        if not args.token:
+            raise SystemExit("--http necesita --token con el JWT de un administrador")
+        return benchmark_http(args.http.rstrip("/"), args.token, args.ops, args.threads)
+
+    if args.tokens:
+        return benchmark_tokens(args.ops)
+
+    raw_client = create_data_client()
+    if args.rss:
+        return benchmark_rss(raw_client)
+    users = raw_client.table("users").select("id, email").limit(50).execute().data
+    if not users:
+        raise SystemExit("No hay usuarios: corra create_admin.py primero")
+
+    if args.subscribe:
+        return benchmark_subscribe(raw_client, users, args.ops, args.threads, args.rtt_ms)
+
+    print(f"backend={DATA_BACKEND} ops={args.ops} threads={args.threads}")
+    variants = [("", raw_client, False)]
+    if args.profiling:
+        variants.append((" +prof", profiling.InstrumentedClient(raw_client), True))
+    if args.resilience:
+        variants.append((" +guard", resilience.GuardedClient(raw_client, resilience.CircuitBreaker("benchmark")), False))
+    for name in data_operations(raw_client, users, args.writes):
+        for suffix, client, profiled in variants:
+            op = data_operations(client, users, args.writes)[name]
+
+            def timed(i, op=op, profiled=profiled):
+                token = profiling.current_profile.set(profiling.RequestProfile("GET", name)) if profiled else None
+                started = time.perf_counter()
+                op(i)
+                elapsed = (time.perf_counter() - started) * 1000
+                if token is not None:
+                    profiling.current_profile.reset(token)
+                return elapsed
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.threads) as pool:
+                latencies = list(pool.map(timed, range(args.ops)))
+            _report(name + suffix, latencies, time.perf_counter() - started)
+
+
+def benchmark_subscribe(raw_client, users: list, ops: int, threads: int, rtt_ms: float):
+    faults = resilience.FaultInjector()
+    faults.set(latency_ms=rtt_ms)
+    client = resilience.GuardedClient(raw_client, resilience.CircuitBreaker("benchmark"), faults)
+    admin, target = users[0], users[-1]
+
+    def new_sub(user: dict) -> dict:
+        # a fresh product per call, so every insert goes through
+        return {"user_id": user["id"], "user_email": user["email"], "user_name": user["name"],
+                "product_id": f"bench-{uuid.uuid4().hex[:12]}", "product_name": "benchmark", "plan_name": "benchmark",
+                "billing_cycle": "monthly", "is_enabled": False, "status": "pending"}
+
+    def check_then_insert(user_id: str, sub: dict):
+        client.table("subscriptions").select("id").eq("user_id", user_id).eq(
+            "product_id", sub["product_id"]
+        ).neq("status", "cancelled").execute()
+        client.table("subscriptions").insert(sub).execute()
+
+    def admin_before(_i):
+        client.table("users").select("*").eq("id", admin["id"]).execute()
+        user = client.table("users").select("*").eq("id", target["id"]).execute().data[0]
+        check_then_insert(user["id"], new_sub(user))
+
+    def admin_after(_i):
+        rows = client.table("users").select("*").in_("id", [admin["id"], target["id"]]).execute().data
+        user = next(u for u in rows if u["id"] == target["id"])
+        client.table("subscriptions").insert(new_sub(user)).execute()
+
+    def user_before(_i):
+        user = client.table("users").select("*").eq("id", target["id"]).execute().data[0]
+        check_then_insert(user["id"], new_sub(user))
+
+    def user_after(_i):
+        user = client.table("users").select("*").eq("id", target["id"]).execute().data[0]
+        client.table("subscriptions").insert(new_sub(user)).execute()
+
+    print(f"backend={DATA_BACKEND} ops={ops} threads={threads} rtt={rtt_ms:g} ms")
+    cases = {"admin_create check+insert": admin_before, "admin_create folded": admin_after,
+             "create check+insert": user_before, "create folded": user_after}
+    try:
+        for name, op in cases.items():
+            def timed(i, op=op):
+                started = time.perf_counter()
+                op(i)
+                return (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                latencies = list(pool.map(timed, range(ops)))
+            _report(name, latencies, time.perf_counter() - started)
+    finally:
+        raw_client.table("subscriptions").delete().like("product_id", "bench-%").execute()
+
+
+def data_operations(client, users: list, writes: bool) -> dict:
+    operations = {
+        "login_lookup": lambda i: client.table("users").select("*").eq("email", users[i % len(users)]["email"]).execute(),
+        "my_subscriptions": lambda i: client.table("subscriptions").select("*").eq("user_id", users[i % len(users)]["id"]).execute(),
+        "my_companies": lambda i: client.table("companies").select("*").eq("owner_id", users[i % len(users)]["id"]).execute(),
+        "admin_messages": lambda i: client.table("contact_messages").select("*").order("created_at", desc=True).limit(50).execute(),
+    }
+    if writes:
+        operations["contact_insert"] = lambda i: client.table("contact_messages").insert({
+            "name": "benchmark", "email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "message": "benchmark",
+        }).execute()
+    return operations
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Flag sequential scans on the backend's hot queries.
+
+    python check_query_plans.py                  # dialect from DATA_BACKEND
+    python check_query_plans.py --dialect sqlite
+
+Postgres plans run with enable_seqscan=off, so a Seq Scan that survives means
+no usable index exists (on small tables the planner would otherwise pick one
+anyway). The database must exist and be migrated (`python migrate.py up`).
+Exits 1 if any query is flagged or it is not, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from migrate import MigrationError, connect_migrated
+
+_UUID = "'00000000-0000-0000-0000-000000000000'"
+_TS = "'2026-01-01T00:00:00+00:00'"
+
+# name -> SQL equivalent of the supabase-py query in server.py / scheduler.py / notifications.py
+HOT_QUERIES = {
+    "login_by_email": "SELECT * FROM users WHERE email = 'admin@example.com'",
+    "register_email_exists": "SELECT id FROM users WHERE email = 'admin@example.com'",
+    "my_subscriptions": f"SELECT * FROM subscriptions WHERE user_id = {_UUID}",
+    "admin_subscription_users": f"SELECT * FROM users WHERE id IN ({_UUID}, {_UUID})",
+    "admin_subscriptions_page": "SELECT * FROM subscriptions ORDER BY created_at DESC, id DESC LIMIT 1000 OFFSET 1000",
+    "my_companies": f"SELECT * FROM companies WHERE owner_id = {_UUID}",
+    "admin_messages_page": "SELECT * FROM contact_messages ORDER BY created_at DESC, id DESC LIMIT 1000 OFFSET 1000",
+    "admin_users_page": "SELECT id, email, name FROM users ORDER BY id LIMIT 1000 OFFSET 1000",
+    "admin_companies_page": "SELECT * FROM companies ORDER BY id LIMIT 1000 OFFSET 1000",
+    "renewal_reminders": (
+        f"SELECT id FROM subscriptions WHERE status = 'active' AND current_period_end <= {_TS} "
+        "AND reminder_sent_at IS NULL ORDER BY current_period_end LIMIT 200"
+    ),
+    "suspend_overdue": (
+        f"SELECT id FROM subscriptions WHERE status = 'active' AND current_period_end <= {_TS} "
+        "ORDER BY current_period_end LIMIT 200"
+    ),
+    "expire_pending": (
+        f"SELECT id FROM subscriptions WHERE status = 'pending' AND created_at <= {_TS} "
+        "ORDER BY created_at LIMIT 200"
+    ),
+    "outbox_due": (
+        f"SELECT id FROM notification_outbox WHERE status = 'pending' AND next_attempt_at <= {_TS} "
+        "ORDER BY next_attempt_at LIMIT 50"
+    ),
+    "audit_page": "SELECT * FROM audit_log ORDER BY created_at DESC LIMIT 50",
+    "leads_pending": (
+        "SELECT id FROM contact_messages WHERE processed_at IS NULL ORDER BY created_at LIMIT 200"
+    ),
+    "leads_by_email": (
+        "SELECT lead_id FROM contact_messages WHERE email_normalized IN ('a@example.com', 'b@example.com')"
+    ),
+    "analytics_unfolded": (
+        "SELECT id FROM subscription_events WHERE folded_at IS NULL ORDER BY occurred_at LIMIT 500"
+    ),
+    "analytics_series": (
+        "SELECT * FROM analytics_rollups WHERE granularity = 'month' AND bucket >= '2026-01' AND bucket <= '2026-12'"
+    ),
+    "sync_delta": (
+        f"SELECT collection, record_id, data, version, deleted, seq FROM sync_records WHERE owner_id = {_UUID} "
+        f"AND company_id = {_UUID} AND seq > 0 ORDER BY seq LIMIT 2001"
+    ),
+    "snapshot_chunks": (
+        f"SELECT collection, start_id, hash, records, bytes, cursor FROM sync_chunks WHERE owner_id = {_UUID} "
+        f"AND company_id = {_UUID} ORDER BY collection, start_id LIMIT 1000"
+    ),
+    "snapshot_chunk_body": (
+        f"SELECT body FROM sync_chunks WHERE owner_id = {_UUID} AND company_id = {_UUID} AND hash = 'ab' LIMIT 1"
+    ),
+    "snapshot_range": (
+        f"SELECT collection, record_id, data, version, deleted FROM sync_records WHERE owner_id = {_UUID} "
+        f"AND company_id = {_UUID} AND collection = 'orders' AND record_id >= 'A' AND record_id < 'B' "
+        "ORDER BY record_id LIMIT 1000"
+    ),
+}
+
+
+def _postgres_scans(node: dict, found: list):
+    if node.get("Node Type") == "Seq Scan":
+        found.append(f"Seq Scan on {node.get('Relation Name')}")
+    for child in node.get("Plans", []):
+        _postgres_scans(child, found)
+    return found
+
+
+def check_postgres(conn) -> dict:
+    problems = {}
+    for name, sql in HOT_QUERIES.items():
+        with conn.transaction():
+            conn.execute("SET LOCAL enable_seqscan = off")
+            plan = conn.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        problems[name] = _postgres_scans(plan[0]["Plan"], [])
+    return problems
+
+
+def check_sqlite(conn) -> dict:
+    problems = {}
+    for name, sql in HOT_QUERIES.items():
+        found = []
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+            detail = row[-1]
+            # "SCAN t USING INDEX i" walks an index in order and is fine
+            if detail.startswith("SCAN ") and "USING" not in detail:
+                found.append(detail)
+            elif "TEMP B-TREE" in detail:
+                found.append(detail)
+        problems[name] = found
+    return problems
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+    from db import DATA_BACKEND
+
+    parser = argparse.ArgumentParser(description="Revisa los planes de las consultas frecuentes")
+    parser.add_argument("--dialect", choices=["postgres", "sqlite"],
+                        default="sqlite" if DATA_BACKEND == "sqlite" else "postgres")
+    args = parser.parse_args()
+
+    try:
+        migrator = connect_migrated(args.dialect)
+    except MigrationError as e:
+        raise SystemExit(str(e))
+    problems = check_sqlite(migrator.conn) if args.dialect == "sqlite" else check_postgres(migrator.conn)
+    flagged = 0
+    for name, found in problems.items():
+        print(f"  {'FALLA' if found else 'ok   '} {name}" + (f": {'; '.join(found)}" if found else ""))
+        flagged += bool(found)
+    print(f"{flagged} de {len(problems)} consultas sin índice adecuado")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Response compression (brotli or gzip) negotiated from Accept-Encoding.
+
+Bodies below COMPRESSION_MIN_SIZE go out unchanged. Streaming responses are
+buffered only until they reach the threshold; after that every chunk is
+compressed and flushed as it arrives, so a long stream is never held back.
+Brotli is used when the `brotli` package is installed.
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+# 4-5 is close to gzip -6 in CPU and still noticeably smaller; 11 is for static assets only
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json", "application/x-ndjson", "application/javascript", "application/xml",
+    "application/problem+json", "image/svg+xml",
+})
+
+bytes_in = metrics.counter("compression_bytes_in_total", "Response bytes before compression")
+bytes_out = metrics.counter("compression_bytes_out_total", "Response bytes sent after compression")
+
+
+def available_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, encodings=None):
+    """Pick the encoding the client weights highest; brotli wins ties."""
+    encodings = encodings or available_encodings()
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        # flushed so the client can decode everything sent so far
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+        self.compressor = None
+        self.buffer = bytearray()
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            if message["status"] < 200 or message["status"] in (204, 304) or not _compressible(headers):
+                self.passthrough = True
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.compressor is not None:
+            return await self._send_compressed(body, more)
+
+        self.buffer += body
+        if len(self.buffer) < self.minimum_size:
+            if more:
+                return
+            # too small to be worth it; Vary still tells caches the response depends on the header
+            MutableHeaders(scope=self.start).add_vary_header("Accept-Encoding")
+            await self.send(self.start)
+            return await self.send({"type": "http.response.body", "body": bytes(self.buffer)})
+
+        headers = MutableHeaders(scope=self.start)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        self.compressor = _Compressor(self.encoding)
+        pending, self.buffer = bytes(self.buffer), bytearray()
+        if not more:
+            compressed = self.compressor.finish(pending)
+            headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start)
+            self._count(len(pending), len(compressed))
+            return await self.send({"type": "http.response.body", "body": compressed})
+        del headers["Content-Length"]
+        await self.send(self.start)
+        await self._send_compressed(pending, True)
+
+    async def _send_compressed(self, body: bytes, more: bool):
+        data = self.compressor.chunk(body) if more else self.compressor.finish(body)
+        self._count(len(body), len(data))
+        if data or not more:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more})
+
+    def _count(self, raw: int, sent: int):
+        bytes_in.inc(raw, encoding=self.encoding)
+        bytes_out.inc(sent, encoding=self.encoding)
@@ -0,0 +1,107 @@
+"""CORS with origins compiled once at startup and long-lived preflight caching.
+
+CORS_ORIGINS is a comma-separated list of exact origins, `*`, or wildcard
+subdomains (`https://*.billennium.com`); CORS_ORIGIN_REGEX adds a full regex.
+Preflights are answered here, before tenancy, idempotency, routing or auth run,
+and carry Access-Control-Max-Age so the browser skips them for that long
+(Chromium caps the cache at 2 hours, Firefox at 24).
+"""
+import functools
+import os
+import re
+
+import metrics
+
+CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*')
+CORS_ORIGIN_REGEX = os.environ.get('CORS_ORIGIN_REGEX', '')
+CORS_MAX_AGE = int(os.environ.get('CORS_MAX_AGE', '86400'))
+
+ALLOW_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+EXPOSE_HEADERS = ("Retry-After", "Idempotent-Replayed", "X-Profile-Id")
+
+preflights = metrics.counter("cors_preflight_total", "CORS preflight requests answered, by outcome")
+
+
+class OriginMatcher:
+    def __init__(self, origins: str = CORS_ORIGINS, regex: str = CORS_ORIGIN_REGEX):
+        entries = [o.strip().rstrip("/") for o in origins.split(",") if o.strip()]
+        self.allow_all = "*" in entries
+        self.exact = frozenset(o.lower() for o in entries if "*" not in o)
+        patterns = [re.escape(o.lower()).replace(r"\*", r"[a-z0-9-]+(?:\.[a-z0-9-]+)*") for o in entries if "*" in o and o != "*"]
+        if regex:
+            patterns.append(f"(?:{regex})")
+        self.pattern = re.compile("|".join(patterns), re.IGNORECASE) if patterns else None
+        # origins repeat on every request; remember the regex verdict per origin
+        self.matches = functools.lru_cache(maxsize=1024)(self._matches)
+
+    def _matches(self, origin: str) -> bool:
+        if self.allow_all or origin.lower() in self.exact:
+            return True
+        return bool(self.pattern and self.pattern.fullmatch(origin))
+
+
+class CORSLayer:
+    """Drop-in for Starlette's CORSMiddleware with credentials always allowed."""
+
+    def __init__(self, app, matcher: OriginMatcher = None, max_age: int = CORS_MAX_AGE):
+        self.app = app
+        self.matcher = matcher or OriginMatcher()
+        self.preflight_headers = [
+            (b"access-control-allow-methods", ", ".join(ALLOW_METHODS).encode()),
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-max-age", str(max_age).encode()),
+            (b"vary", b"Origin, Access-Control-Request-Method, Access-Control-Request-Headers"),
+            (b"content-length", b"0"),
+        ]
+        self.simple_headers = [
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-expose-headers", ", ".join(EXPOSE_HEADERS).encode()),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        origin = request_method = request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+        if origin is None:
+            return await self.app(scope, receive, send)
+
+        allowed = self.matcher.matches(origin.decode("latin-1"))
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            return await self._preflight(send, origin, allowed, request_method, request_headers)
+        if not allowed:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                headers = [(k, v) for k, v in message["headers"] if k != b"vary"]
+                vary = [v for k, v in message["headers"] if k == b"vary"]
+                # the allowed origin is echoed, so shared caches must key on it
+                headers.append((b"vary", b", ".join(vary + [b"Origin"])))
+                headers.append((b"access-control-allow-origin", origin))
+                message["headers"] = headers + self.simple_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    async def _preflight(self, send, origin: bytes, allowed: bool, method: bytes, request_headers):
+        if not allowed or method.decode("latin-1").upper() not in ALLOW_METHODS:
+            preflights.inc(outcome="rejected")
+            body = "Origen no permitido".encode("utf-8")
+            await send({"type": "http.response.start", "status": 400, "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode()),
+            ]})
+            return await send({"type": "http.response.body", "body": body})
+        preflights.inc(outcome="allowed")
+        headers = [(b"access-control-allow-origin", origin)] + self.preflight_headers
+        if request_headers:
+            # any request header is accepted, as with allow_headers=["*"]
+            headers.append((b"access-control-allow-headers", request_headers))
+        await send({"type": "http.response.start", "status": 204, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
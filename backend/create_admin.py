@@ -1,10 +1,12 @@
-from supabase import create_client
-import bcrypt, os
+import bcrypt
 from dotenv import load_dotenv
 from pathlib import Path
 
 load_dotenv(Path('.env'))
-sb = create_client(os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'])
+
+from db import DATA_BACKEND, create_data_client
+
+sb = create_data_client()
 
 def hash_password(pwd):
     return bcrypt.hashpw(pwd.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -27,7 +29,7 @@ else:
 
 # Listar todos los usuarios
 print()
-print('Usuarios en Supabase:')
+print(f'Usuarios en {"SQLite" if DATA_BACKEND == "sqlite" else "Supabase"}:')
 users = sb.table('users').select('id, email, name, role, is_active').execute()
 for u in users.data:
     estado = 'activo' if u['is_active'] else 'inactivo'
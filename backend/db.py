@@ -0,0 +1,44 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+# "supabase" (remote Postgres through PostgREST) or "sqlite" (embedded file,
+# for hermetic dev/test runs and single-node deployments)
+DATA_BACKEND = os.environ.get('DATA_BACKEND', 'supabase').lower()
+SQLITE_PATH = os.environ.get('SQLITE_PATH', str(Path(__file__).parent / 'billennium.db'))
+# JSON {shard name: {"url", "key"} | {"path"}}; when set, tenants are routed
+# across these stores (see tenancy.py) and DATA_BACKEND only picks the default
+DATA_SHARDS = os.environ.get('DATA_SHARDS')
+
+
+def create_store_client(config: dict):
+    """A single store: SQLite when the config has a path, Supabase otherwise."""
+    if config.get("path"):
+        from sqlite_client import SQLiteClient
+        return SQLiteClient(config["path"])
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+    from resilience import DATA_WRITE_TIMEOUT_MS
+    # resilience.py stops waiting at its own timeouts; this one frees the abandoned
+    # data-call thread instead of letting it wait on a hung request for two minutes
+    options = ClientOptions(postgrest_client_timeout=DATA_WRITE_TIMEOUT_MS / 1000 + 5) if DATA_WRITE_TIMEOUT_MS > 0 else None
+    return create_client(config["url"], config["key"], options=options)
+
+
+def create_data_client():
+    """Client exposing the supabase-py table()/execute() surface for the configured backend."""
+    if DATA_SHARDS:
+        from tenancy import create_sharded_client
+        return create_sharded_client(json.loads(DATA_SHARDS), create_store_client)
+    if DATA_BACKEND == "sqlite":
+        return create_store_client({"path": SQLITE_PATH})
+    return create_store_client({"url": os.environ['SUPABASE_URL'], "key": os.environ['SUPABASE_KEY']})
+
+
+def is_unique_violation(exc: Exception) -> bool:
+    """A unique-index conflict on insert/update, from either backend."""
+    if isinstance(exc, sqlite3.IntegrityError):
+        return "UNIQUE" in str(exc)
+    # PostgREST passes the Postgres SQLSTATE through
+    return getattr(exc, "code", None) == "23505"
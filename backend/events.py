@@ -0,0 +1,23 @@
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# In-process lifecycle events ("subscription.suspended", "contact.created", ...).
+# Listeners run synchronously in the emitting thread, so they must stay cheap:
+# bump counters, enqueue work, or write the one row that makes the event
+# durable (the analytics ledger, the notification outbox) before the request returns.
+_listeners = defaultdict(list)
+
+
+def subscribe(event: str, callback):
+    """Register callback(event, payload) for an event name, or "*" for all."""
+    _listeners[event].append(callback)
+
+
+def emit(event: str, payload: dict):
+    for callback in _listeners.get(event, []) + _listeners.get("*", []):
+        try:
+            callback(event, payload)
+        except Exception as e:
+            logger.error(f"Error in listener for {event}: {e}")
@@ -0,0 +1,113 @@
+from functools import lru_cache
+from typing import List, Optional
+
+from pydantic import ConfigDict, TypeAdapter, create_model
+
+# Distinct (fields, include) combinations keep their generated model/adapter
+FIELDSET_CACHE_SIZE = 256
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+class Relation:
+    """A to-one resource that can be embedded through a PostgREST foreign key."""
+
+    def __init__(self, name: str, table: str, fkey: str, model):
+        self.name = name
+        self.table = table
+        self.fkey = fkey
+        self.model = model
+
+
+class Resource:
+    def __init__(self, name: str, model, relations=()):
+        self.name = name
+        self.model = model
+        self.relations = {r.name: r for r in relations}
+
+
+def _ordered(model, names: set, label: str) -> tuple:
+    unknown = names - set(model.model_fields)
+    if unknown:
+        raise FieldsetError(f"Campos desconocidos en {label}: {', '.join(sorted(unknown))}")
+    # model order keeps the output stable and makes equivalent requests share a cache entry
+    return tuple(f for f in model.model_fields if f in names)
+
+
+def parse(resource: Resource, fields: Optional[str], include: Optional[str]):
+    """Turn ?fields=a,b,rel.c&include=rel into a hashable fieldset, or None for the full shape.
+
+    The fieldset is (fields, ((relation, relation_fields), ...)); `id` is always kept.
+    """
+    if not fields and not include:
+        return None
+    own, nested = set(), {}
+    for name in (include or "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in resource.relations:
+            raise FieldsetError(f"Relación desconocida en {resource.name}: {name}")
+        nested.setdefault(name, set())
+    for name in (fields or "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        rel, dot, sub = name.partition(".")
+        if dot:
+            if rel not in resource.relations:
+                raise FieldsetError(f"Relación desconocida en {resource.name}: {rel}")
+            nested.setdefault(rel, set()).add(sub)
+        else:
+            own.add(name)
+
+    own_fields = _ordered(resource.model, own | {"id"}, resource.name) if own else tuple(resource.model.model_fields)
+    includes = []
+    for rel in sorted(nested):
+        relation = resource.relations[rel]
+        sub = nested[rel]
+        sub_fields = _ordered(relation.model, sub | {"id"}, rel) if sub else tuple(relation.model.model_fields)
+        includes.append((rel, sub_fields))
+    return own_fields, tuple(includes)
+
+
+def select_clause(resource: Resource, fieldset) -> str:
+    if fieldset is None:
+        return "*"
+    own_fields, includes = fieldset
+    parts = list(own_fields)
+    for rel, sub_fields in includes:
+        relation = resource.relations[rel]
+        parts.append(f"{rel}:{relation.table}!{relation.fkey}({', '.join(sub_fields)})")
+    return ", ".join(parts)
+
+
+def _sub_model(model, names: tuple, suffix: str):
+    definitions = {f: (model.model_fields[f].annotation, model.model_fields[f]) for f in names}
+    return create_model(f"{model.__name__}_{suffix}", __config__=ConfigDict(extra="ignore"), **definitions)
+
+
+@lru_cache(maxsize=FIELDSET_CACHE_SIZE)
+def model_for(resource: Resource, fieldset):
+    own_fields, includes = fieldset
+    suffix = format(abs(hash(fieldset)), "x")
+    definitions = {f: (resource.model.model_fields[f].annotation, resource.model.model_fields[f]) for f in own_fields}
+    for rel, sub_fields in includes:
+        nested = _sub_model(resource.relations[rel].model, sub_fields, suffix)
+        definitions[rel] = (Optional[nested], None)
+    return create_model(
+        f"{resource.model.__name__}_{suffix}", __config__=ConfigDict(extra="ignore"), **definitions
+    )
+
+
+@lru_cache(maxsize=FIELDSET_CACHE_SIZE)
+def adapter_for(resource: Resource, fieldset) -> TypeAdapter:
+    return TypeAdapter(List[model_for(resource, fieldset)])
+
+
+def render(resource: Resource, fieldset, rows: list) -> bytes:
+    """Validate rows against the fieldset's model and encode them straight to JSON bytes."""
+    adapter = adapter_for(resource, fieldset)
+    return adapter.dump_json(adapter.validate_python(rows))
@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+import metrics
+from resilience import DataUnavailable
+
+logger = logging.getLogger(__name__)
+
+# "memory" (per-process LRU) or "supabase" (idempotency_keys table, shared by workers)
+IDEMPOTENCY_BACKEND = os.environ.get('IDEMPOTENCY_BACKEND', 'memory').lower()
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+# A reservation whose request never finished (crashed worker) stops blocking retries after this
+IN_FLIGHT_TIMEOUT_SECONDS = 60
+MAX_KEY_LENGTH = 255
+
+# Outcomes that depend on auth, rate limits or timing rather than on the body:
+# a retry with the same key must run again, as after a 5xx
+UNSTORED_STATUSES = frozenset({401, 403, 409, 429})
+
+IDEMPOTENT_PATHS = frozenset({
+    "/api/auth/register",
+    "/api/subscriptions",
+    "/api/contact",
+    "/api/companies",
+    "/api/admin/subscriptions/create",
+})
+
+replays = metrics.counter("idempotency_replays_total", "Responses replayed from the idempotency cache")
+conflicts = metrics.counter("idempotency_conflicts_total", "Idempotency-Key reuse rejected (in flight or different body)")
+
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status", "headers", "body")
+
+    def __init__(self, fingerprint: str, status: int, headers: list, body: bytes):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class MemoryIdempotencyStore:
+    """Bounded LRU of completed responses plus in-flight reservations."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_MAX_ENTRIES, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _reserve(self, key: str) -> bool:
+        now = time.monotonic()
+        started = self._in_flight.get(key)
+        if started is not None and now - started < IN_FLIGHT_TIMEOUT_SECONDS:
+            return False
+        self._in_flight[key] = now
+        return True
+
+    def get(self, key: str):
+        with self._lock:
+            return self._get(key)
+
+    def reserve(self, key: str) -> bool:
+        with self._lock:
+            return self._reserve(key)
+
+    def claim(self, key: str):
+        """(stored response, None) or (None, whether the key was reserved), in one step."""
+        with self._lock:
+            stored = self._get(key)
+            if stored is not None:
+                return stored, None
+            return None, self._reserve(key)
+
+    def put(self, key: str, response: StoredResponse):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def release(self, key: str):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+
+class SupabaseIdempotencyStore:
+    """Shared store on the idempotency_keys table; lets any worker replay a response."""
+
+    blocking = True
+
+    def __init__(self, client, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        self.client = client
+        self.ttl = ttl
+
+    def get(self, key: str):
+        rows = self.client.table("idempotency_keys").select("*").eq("key", key).gt(
+            "expires_at", datetime.now(timezone.utc).isoformat()
+        ).execute().data
+        if not rows or rows[0].get("status_code") is None:
+            return None
+        row = rows[0]
+        return StoredResponse(row["fingerprint"], row["status_code"], row["headers"], row["body"].encode("utf-8"))
+
+    def reserve(self, key: str) -> bool:
+        now = datetime.now(timezone.utc)
+        # drop an expired or abandoned reservation so the key can be reused
+        self.client.table("idempotency_keys").delete().eq("key", key).lt("expires_at", now.isoformat()).execute()
+        self.client.table("idempotency_keys").delete().eq("key", key).is_("status_code", "null").lt(
+            "created_at", (now - timedelta(seconds=IN_FLIGHT_TIMEOUT_SECONDS)).isoformat()
+        ).execute()
+        try:
+            self.client.table("idempotency_keys").insert({
+                "key": key,
+                "expires_at": (now + timedelta(seconds=self.ttl)).isoformat(),
+            }).execute()
+            return True
+        except Exception:
+            return False
+
+    def claim(self, key: str):
+        # the insert in reserve() is the atomic step: a racing worker fails it on the primary key
+        stored = self.get(key)
+        if stored is not None:
+            return stored, None
+        return None, self.reserve(key)
+
+    def put(self, key: str, response: StoredResponse):
+        self.client.table("idempotency_keys").update({
+            "fingerprint": response.fingerprint,
+            "status_code": response.status,
+            "headers": response.headers,
+            "body": response.body.decode("utf-8", errors="replace"),
+        }).eq("key", key).execute()
+
+    def release(self, key: str):
+        self.client.table("idempotency_keys").delete().eq("key", key).is_("status_code", "null").execute()
+
+
+def create_store(client):
+    if IDEMPOTENCY_BACKEND == "supabase":
+        return SupabaseIdempotencyStore(client)
+    return MemoryIdempotencyStore()
+
+
+def _json_response(status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    return status, headers, body
+
+
+class IdempotencyMiddleware:
+    """Replays the stored response for a repeated Idempotency-Key on IDEMPOTENT_PATHS.
+
+    The cache key covers method, path, Authorization header and the key, so one
+    client can never replay another's response. A repeated key with a different
+    body is rejected with 422, one still being processed with 409.
+    """
+
+    def __init__(self, app, store_factory=None):
+        self.app = app
+        self.store_factory = store_factory
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = self.store_factory() if self.store_factory else MemoryIdempotencyStore()
+        return self._store
+
+    async def _call_store(self, method, *args):
+        fn = getattr(self.store, method)
+        if self.store.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _release(self, cache_key):
+        try:
+            await self._call_store("release", cache_key)
+        except Exception as e:
+            # the reservation then lapses after IN_FLIGHT_TIMEOUT_SECONDS
+            logger.error(f"Could not release idempotency key: {e}")
+
+    async def _send_stored(self, send, status, headers, body):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        idem_key = headers.get(b"idempotency-key")
+        if not idem_key:
+            return await self.app(scope, receive, send)
+        if len(idem_key) > MAX_KEY_LENGTH:
+            return await self._send_stored(send, *_json_response(400, "Idempotency-Key demasiado larga"))
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        body = bytes(body)
+
+        cache_key = hashlib.sha256(b"\n".join([
+            scope["method"].encode(), scope["path"].encode(), headers.get(b"authorization", b""), idem_key,
+        ])).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        try:
+            stored, reserved = await self._call_store("claim", cache_key)
+        except DataUnavailable as e:
+            # This middleware sits outside the app's DataUnavailable handler, so it answers the 503 itself
+            logger.warning(f"Idempotency store unavailable on {scope['path']}: {e.reason}")
+            status, unavailable_headers, unavailable_body = _json_response(
+                503, "Servicio temporalmente no disponible. Intente de nuevo en unos segundos"
+            )
+            unavailable_headers.append((b"retry-after", str(e.retry_after).encode()))
+            return await self._send_stored(send, status, unavailable_headers, unavailable_body)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                conflicts.inc(reason="body_mismatch")
+                return await self._send_stored(send, *_json_response(
+                    422, "Idempotency-Key ya usada con un contenido distinto"
+                ))
+            replays.inc(path=scope["path"])
+            replay_headers = [(k.encode(), v.encode()) for k, v in stored.headers]
+            replay_headers.append((b"idempotent-replayed", b"true"))
+            return await self._send_stored(send, stored.status, replay_headers, stored.body)
+
+        if not reserved:
+            conflicts.inc(reason="in_flight")
+            return await self._send_stored(send, *_json_response(
+                409, "Ya hay una solicitud en curso con esta Idempotency-Key"
+            ))
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "headers": [], "body": bytearray()}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await self._release(cache_key)
+            raise
+
+        # 5xx are transient, and UNSTORED_STATUSES depend on more than the request: let the client retry for real
+        if response["status"] >= 500 or response["status"] in UNSTORED_STATUSES:
+            await self._release(cache_key)
+            return
+        try:
+            await self._call_store("put", cache_key, StoredResponse(
+                fingerprint,
+                response["status"],
+                [(k.decode("latin-1"), v.decode("latin-1")) for k, v in response["headers"]],
+                bytes(response["body"]),
+            ))
+        except Exception as e:
+            logger.error(f"Could not store idempotent response: {e}")
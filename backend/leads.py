@@ -0,0 +1,263 @@
+"""Lead pipeline for contact messages: normalize, group duplicates, link, score.
+
+Runs in a background task, off the request path. Each batch takes the oldest
+unprocessed messages (processed_at IS NULL) and handles them in four steps:
+
+  1. normalizes email and phone;
+  2. groups each message with earlier ones from the same prospect under a
+     shared lead_id (the first message's id);
+  3. links it to an existing user and company;
+  4. stores a 0-100 score for the product it asks about.
+
+Two workers can pick the same batch; the result is the same, except that two
+simultaneous first messages from one prospect may start separate leads.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LEADS_ENABLED = os.environ.get('LEADS_ENABLED', 'true').lower() == 'true'
+LEADS_INTERVAL_SECONDS = float(os.environ.get('LEADS_INTERVAL_SECONDS', '5'))
+LEADS_BATCH_SIZE = int(os.environ.get('LEADS_BATCH_SIZE', '200'))
+# prepended to national numbers (0980136389 -> 593980136389)
+DEFAULT_COUNTRY_CODE = os.environ.get('LEADS_DEFAULT_COUNTRY_CODE', '593')
+
+MESSAGE_COLUMNS = "id, name, email, phone, company, message, product_interest, created_at"
+# dots in the local part are ignored by these providers
+DOTLESS_DOMAINS = frozenset({"gmail.com", "googlemail.com"})
+FREE_MAIL_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "hotmail.com", "hotmail.es", "outlook.com", "outlook.es", "live.com",
+    "yahoo.com", "yahoo.es", "icloud.com", "me.com", "aol.com", "protonmail.com", "proton.me",
+})
+
+LEAD_WEIGHTS = {
+    "known_product": 20,
+    "business_email": 15,
+    "phone": 10,
+    "company": 10,
+    "detailed_message": 10,
+    "registered_user": 15,
+    "registered_company": 10,
+    "repeat_contact": 10,  # per earlier message from the same lead, up to two
+    "already_subscribed": -40,
+}
+DETAILED_MESSAGE_CHARS = 120
+
+processed_total = metrics.counter("leads_processed_total", "Contact messages processed by the lead pipeline")
+duplicates_total = metrics.counter("leads_duplicates_total", "Contact messages grouped under an earlier lead")
+batch_throughput = metrics.gauge("leads_throughput_per_second", "Messages per second in the last lead batch")
+batch_duration = metrics.histogram("leads_batch_duration_ms", "Time to process one lead batch")
+
+
+def normalize_email(email: str):
+    if not email or "@" not in email:
+        return None
+    local, _, domain = email.strip().lower().rpartition("@")
+    local = local.split("+", 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        local = local.replace(".", "")
+        domain = "gmail.com"
+    return f"{local}@{domain}" if local else None
+
+
+def normalize_phone(phone: str, country_code: str = DEFAULT_COUNTRY_CODE):
+    """Digits with country code, E.164 without the '+'; None if it cannot be a phone."""
+    if not phone:
+        return None
+    international = phone.strip().startswith("+")
+    digits = re.sub(r"\D", "", phone)
+    if not international and digits.startswith("00"):
+        digits, international = digits[2:], True
+    if not international:
+        digits = country_code + digits.lstrip("0")
+    return digits if 8 <= len(digits) <= 15 else None
+
+
+def score(message: dict, products: set, earlier_messages: int, subscribed: bool) -> int:
+    email = message.get("email_normalized") or ""
+    points = 0
+    if message.get("product_interest") in products:
+        points += LEAD_WEIGHTS["known_product"]
+    if email and email.rpartition("@")[2] not in FREE_MAIL_DOMAINS:
+        points += LEAD_WEIGHTS["business_email"]
+    if message.get("phone_normalized"):
+        points += LEAD_WEIGHTS["phone"]
+    if (message.get("company") or "").strip():
+        points += LEAD_WEIGHTS["company"]
+    if len(message.get("message") or "") >= DETAILED_MESSAGE_CHARS:
+        points += LEAD_WEIGHTS["detailed_message"]
+    if message.get("user_id"):
+        points += LEAD_WEIGHTS["registered_user"]
+    if message.get("company_id"):
+        points += LEAD_WEIGHTS["registered_company"]
+    points += LEAD_WEIGHTS["repeat_contact"] * min(earlier_messages, 2)
+    if subscribed:
+        # asking about a product they already have is a support request, not a sale
+        points += LEAD_WEIGHTS["already_subscribed"]
+    return max(0, min(100, points))
+
+
+class LeadSummary:
+    """One lead folded from its messages, newest first; slots keep large lead lists small."""
+
+    __slots__ = ("lead_id", "name", "email", "phone", "company", "user_id", "company_id",
+                 "score", "products", "messages", "unread", "last_message_at")
+
+    def __init__(self, message: dict):
+        # newest message first, so contact details are the most recent ones given
+        self.lead_id = message["lead_id"]
+        self.name = message["name"]
+        self.email = message["email"]
+        self.phone = self.company = self.user_id = self.company_id = None
+        self.score = self.messages = self.unread = 0
+        self.products = {}
+        self.last_message_at = message["created_at"]
+
+    def add(self, message: dict):
+        product_id = message.get("product_interest") or "general"
+        self.products[product_id] = max(self.products.get(product_id, 0), message["lead_score"])
+        self.score = max(self.score, message["lead_score"])
+        self.messages += 1
+        self.unread += not message["is_read"]
+        for field in ("phone", "company", "user_id", "company_id"):
+            if getattr(self, field) is None:
+                setattr(self, field, message.get(field) or None)
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class LeadPipeline:
+    def __init__(self, client, products):
+        self.client = client
+        self.products = {p["id"] for p in products}
+        self._task = None
+
+    def _pending(self):
+        return self.client.table("contact_messages").select(MESSAGE_COLUMNS).is_("processed_at", "null").order(
+            "created_at"
+        ).limit(LEADS_BATCH_SIZE).execute().data
+
+    def _known_leads(self, column: str, values: set) -> dict:
+        """normalized value -> (lead_id, messages) among already processed messages.
+
+        Unprocessed rows have no normalized values yet, so they never match.
+        """
+        if not values:
+            return {}
+        rows = self.client.table("contact_messages").select(f"lead_id, {column}").in_(
+            column, sorted(values)
+        ).order("created_at").execute().data
+        found = {}
+        for row in rows:
+            lead_id, count = found.get(row[column], (row["lead_id"], 0))
+            found[row[column]] = (lead_id, count + 1)
+        return found
+
+    def _accounts(self, rows: list):
+        """Users and companies whose email normalizes to one in the batch, plus open subscriptions."""
+        users, companies, subscribed = {}, {}, set()
+        # stored emails keep the local part as typed (lookups are case-sensitive, as in login);
+        # try the raw, lowercased and normalized forms and compare normalized
+        candidates = sorted({
+            e for r in rows if r["email_normalized"]
+            for e in (r["email"], r["email"].strip().lower(), r["email_normalized"])
+        })
+        if not candidates:
+            return users, companies, subscribed
+        for user in self.client.table("users").select("id, email").in_("email", candidates).execute().data:
+            users[normalize_email(user["email"])] = user["id"]
+        owners = self.client.table("companies").select("id, email, owner_id").in_(
+            "owner_id", sorted(set(users.values()))
+        ).execute().data if users else []
+        by_email = self.client.table("companies").select("id, email, owner_id").in_("email", candidates).execute().data
+        owner_email = {uid: email for email, uid in users.items()}
+        for company in owners + by_email:
+            companies.setdefault(normalize_email(company["email"]), company["id"])
+            if company["owner_id"] in owner_email:
+                companies.setdefault(owner_email[company["owner_id"]], company["id"])
+        if users:
+            for sub in self.client.table("subscriptions").select("user_id, product_id").in_(
+                "user_id", sorted(set(users.values()))
+            ).neq("status", "cancelled").execute().data:
+                subscribed.add((sub["user_id"], sub["product_id"]))
+        return users, companies, subscribed
+
+    def process_batch(self) -> int:
+        started = time.perf_counter()
+        rows = self._pending()
+        if not rows:
+            return 0
+        for row in rows:
+            row["email_normalized"] = normalize_email(row["email"])
+            row["phone_normalized"] = normalize_phone(row.get("phone"))
+        emails = {r["email_normalized"] for r in rows if r["email_normalized"]}
+        phones = {r["phone_normalized"] for r in rows if r["phone_normalized"]}
+        by_email = self._known_leads("email_normalized", emails)
+        by_phone = self._known_leads("phone_normalized", phones)
+        users, companies, subscribed = self._accounts(rows)
+
+        now = datetime.now(timezone.utc).isoformat()
+        for row in rows:
+            email, phone = row["email_normalized"], row["phone_normalized"]
+            lead_id, earlier = by_email.get(email) or by_phone.get(phone) or (row["id"], 0)
+            if earlier:
+                duplicates_total.inc()
+            # later messages in this same batch join the lead too
+            for index, key in ((by_email, email), (by_phone, phone)):
+                if key:
+                    index[key] = (lead_id, earlier + 1)
+            row["lead_id"] = lead_id
+            row["user_id"] = users.get(email)
+            row["company_id"] = companies.get(email)
+            row["lead_score"] = score(
+                row, self.products, earlier, (row["user_id"], row.get("product_interest")) in subscribed
+            )
+            row["processed_at"] = now
+
+        # one round trip for the batch; columns the pipeline does not own (is_read) are left alone
+        self.client.table("contact_messages").upsert(rows, on_conflict="id").execute()
+
+        elapsed = time.perf_counter() - started
+        processed_total.inc(len(rows))
+        batch_duration.observe(elapsed * 1000)
+        if elapsed > 0:
+            batch_throughput.set(round(len(rows) / elapsed, 2))
+        return len(rows)
+
+    def process_pending(self) -> int:
+        processed = 0
+        while True:
+            count = self.process_batch()
+            processed += count
+            if count < LEADS_BATCH_SIZE:
+                return processed
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.process_pending)
+            except Exception as e:
+                logger.error(f"Lead pipeline failed: {e}")
+            await asyncio.sleep(LEADS_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,110 @@
+import threading
+from collections import defaultdict
+
+# Minimal in-process metrics registry, exposed through GET /api/admin/metrics.
+# Values are per worker process and reset on restart.
+
+_lock = threading.Lock()
+_registry = {}
+
+
+def _label_key(labels: dict) -> str:
+    return ",".join(f"{k}={labels[k]}" for k in sorted(labels)) if labels else ""
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] += amount
+
+    def snapshot(self) -> dict:
+        with _lock:
+            return {"type": "counter", "description": self.description, "values": dict(self._values)}
+
+
+class Histogram:
+    """Tracks count / sum / max plus cumulative bucket counts per label set."""
+
+    DEFAULT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with _lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = {
+                    "count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.buckets),
+                }
+            data["count"] += 1
+            data["sum"] += value
+            data["max"] = max(data["max"], value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data["buckets"][i] += 1
+
+    def snapshot(self) -> dict:
+        with _lock:
+            values = {
+                key: {
+                    "count": d["count"],
+                    "sum": round(d["sum"], 3),
+                    "avg": round(d["sum"] / d["count"], 3) if d["count"] else 0.0,
+                    "max": round(d["max"], 3),
+                    "buckets": dict(zip((f"le_{b}" for b in self.buckets), d["buckets"])),
+                }
+                for key, d in self._values.items()
+            }
+        return {"type": "histogram", "description": self.description, "values": values}
+
+
+class Gauge:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self._values[_label_key(labels)] = value
+
+    def snapshot(self) -> dict:
+        with _lock:
+            return {"type": "gauge", "description": self.description, "values": dict(self._values)}
+
+
+def _register(cls, name, description, **kwargs):
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, description, **kwargs)
+    return metric
+
+
+def counter(name: str, description: str = "") -> Counter:
+    return _register(Counter, name, description)
+
+
+def histogram(name: str, description: str = "", **kwargs) -> Histogram:
+    return _register(Histogram, name, description, **kwargs)
+
+
+def gauge(name: str, description: str = "") -> Gauge:
+    return _register(Gauge, name, description)
+
+
+def snapshot() -> dict:
+    with _lock:
+        metrics = list(_registry.values())
+    return {m.name: m.snapshot() for m in metrics}
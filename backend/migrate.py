@@ -0,0 +1,187 @@
+"""Versioned schema migrations for Postgres (Supabase) and SQLite.
+
+    python migrate.py status
+    python migrate.py up
+    python migrate.py sql > schema.sql   # every Postgres migration, for the Supabase SQL Editor
+
+The dialect follows DATA_BACKEND (override with --dialect). Postgres needs
+DATABASE_URL (Supabase → Project Settings → Database) and psycopg; SQLite
+uses SQLITE_PATH. Applied versions and checksums live in schema_migrations.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, path: Path):
+        self.path = path
+        self.version, _, self.name = path.stem.partition("_")
+        self.sql = path.read_text(encoding="utf-8").replace("\r\n", "\n")
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+
+def load_migrations(dialect: str) -> list:
+    directory = MIGRATIONS_DIR / dialect
+    if not directory.is_dir():
+        raise MigrationError(f"No hay migraciones para {dialect}")
+    return [Migration(p) for p in sorted(directory.glob("[0-9]*_*.sql"))]
+
+
+def _split_sqlite(sql: str) -> list:
+    # complete_statement() keeps CREATE TRIGGER ... BEGIN ...; END; in one piece
+    statements, current = [], ""
+    for line in sql.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    if current.strip() and not all(l.strip().startswith("--") or not l.strip() for l in current.splitlines()):
+        raise MigrationError("Sentencia SQL incompleta al final de la migración")
+    return statements
+
+
+class SQLiteMigrator:
+    def __init__(self, conn: sqlite3.Connection):
+        # the caller's connection must be in autocommit mode (isolation_level=None)
+        self.conn = conn
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version TEXT PRIMARY KEY, name TEXT NOT NULL, checksum TEXT NOT NULL, applied_at TEXT NOT NULL)"
+        )
+
+    def applied(self) -> dict:
+        return dict(self.conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+    def apply(self, migration: Migration) -> bool:
+        # IMMEDIATE takes the write lock up front, so workers starting together apply each version once
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (migration.version,)).fetchone():
+                self.conn.execute("ROLLBACK")
+                return False
+            for statement in _split_sqlite(migration.sql):
+                self.conn.execute(statement)
+            self.conn.execute(
+                "INSERT INTO schema_migrations (version, name, checksum, applied_at) VALUES (?, ?, ?, ?)",
+                (migration.version, migration.name, migration.checksum, datetime.now(timezone.utc).isoformat()),
+            )
+            self.conn.execute("COMMIT")
+            return True
+        except Exception:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+
+
+class PostgresMigrator:
+    def __init__(self, dsn: str):
+        try:
+            import psycopg
+        except ImportError:
+            raise MigrationError("Instale psycopg (pip install 'psycopg[binary]') para migrar Postgres")
+        self.conn = psycopg.connect(dsn, autocommit=True)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version TEXT PRIMARY KEY, name TEXT NOT NULL, checksum TEXT NOT NULL, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW())"
+        )
+        self.conn.execute("ALTER TABLE schema_migrations DISABLE ROW LEVEL SECURITY")
+
+    def applied(self) -> dict:
+        return dict(self.conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+    def apply(self, migration: Migration) -> bool:
+        # DDL is transactional in Postgres; the advisory lock serializes concurrent runners
+        with self.conn.transaction():
+            self.conn.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+            if self.conn.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (migration.version,)).fetchone():
+                return False
+            self.conn.execute(migration.sql)
+            self.conn.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum),
+            )
+        return True
+
+
+def pending(migrator, migrations: list) -> list:
+    applied = migrator.applied()
+    for m in migrations:
+        if m.version in applied and applied[m.version] != m.checksum:
+            raise MigrationError(
+                f"La migración {m.path.name} cambió después de aplicarse; cree una nueva en lugar de editarla"
+            )
+    return [m for m in migrations if m.version not in applied]
+
+
+def migrate(migrator, migrations: list) -> list:
+    """Apply pending migrations in order; returns the ones this call applied."""
+    return [m for m in pending(migrator, migrations) if migrator.apply(m)]
+
+
+def connect(dialect: str):
+    if dialect == "sqlite":
+        from db import SQLITE_PATH
+        conn = sqlite3.connect(SQLITE_PATH, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return SQLiteMigrator(conn)
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        raise MigrationError("Defina DATABASE_URL con la cadena de conexión de Postgres")
+    return PostgresMigrator(dsn)
+
+
+def connect_migrated(dialect: str):
+    """connect() for tools that use the schema without changing it: no new SQLite file, no pending migrations."""
+    if dialect == "sqlite":
+        from db import SQLITE_PATH
+        if not Path(SQLITE_PATH).exists():
+            raise MigrationError(f"No existe la base {SQLITE_PATH}; corra python migrate.py up primero")
+    migrator = connect(dialect)
+    if pending(migrator, load_migrations(dialect)):
+        raise MigrationError("Hay migraciones pendientes; corra python migrate.py up primero")
+    return migrator
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+    from db import DATA_BACKEND
+
+    parser = argparse.ArgumentParser(description="Migraciones de esquema")
+    parser.add_argument("command", choices=["status", "up", "sql"])
+    parser.add_argument("--dialect", choices=["postgres", "sqlite"],
+                        default="sqlite" if DATA_BACKEND == "sqlite" else "postgres")
+    args = parser.parse_args()
+
+    migrations = load_migrations(args.dialect)
+    if args.command == "sql":
+        for m in migrations:
+            print(f"-- {m.path.name}\n{m.sql}")
+        return
+
+    migrator = connect(args.dialect)
+    if args.command == "status":
+        todo = {m.version for m in pending(migrator, migrations)}
+        for m in migrations:
+            print(f"  [{'pendiente' if m.version in todo else 'aplicada '}] {m.path.name}")
+    else:
+        applied = migrate(migrator, migrations)
+        for m in applied:
+            print(f"  aplicada {m.path.name}")
+        print(f"{len(applied)} migraciones aplicadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,81 @@
--- ============================================================
--- BILLENNIUM SYSTEM — Schema para Supabase (PostgreSQL)
--- Correr este script en: Supabase Dashboard → SQL Editor
--- ============================================================
-
--- Tabla de usuarios
-CREATE TABLE IF NOT EXISTS users (
-  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-  email TEXT UNIQUE NOT NULL,
-  name TEXT NOT NULL,
-  company_name TEXT,
-  phone TEXT,
-  password_hash TEXT NOT NULL,
-  role TEXT DEFAULT 'user' CHECK (role IN ('user', 'admin')),
-  is_active BOOLEAN DEFAULT TRUE,
-  created_at TIMESTAMPTZ DEFAULT NOW()
-);
-
--- Tabla de suscripciones
-CREATE TABLE IF NOT EXISTS subscriptions (
-  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-  user_id UUID NOT NULL,
-  user_email TEXT NOT NULL,
-  user_name TEXT NOT NULL,
-  company_name TEXT,
-  product_id TEXT NOT NULL,
-  product_name TEXT NOT NULL,
-  plan_name TEXT NOT NULL,
-  billing_cycle TEXT DEFAULT 'monthly',
-  is_enabled BOOLEAN DEFAULT FALSE,
-  status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'active', 'suspended', 'cancelled')),
-  created_at TIMESTAMPTZ DEFAULT NOW(),
-  enabled_at TIMESTAMPTZ,
-  enabled_by TEXT
-);
-
--- Tabla de mensajes de contacto
-CREATE TABLE IF NOT EXISTS contact_messages (
-  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-  name TEXT NOT NULL,
-  email TEXT NOT NULL,
-  phone TEXT,
-  company TEXT,
-  message TEXT NOT NULL,
-  product_interest TEXT,
-  is_read BOOLEAN DEFAULT FALSE,
-  created_at TIMESTAMPTZ DEFAULT NOW()
-);
-
--- Tabla de empresas
-CREATE TABLE IF NOT EXISTS companies (
-  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-  name TEXT NOT NULL,
-  ruc TEXT,
-  email TEXT NOT NULL,
-  phone TEXT,
-  address TEXT,
-  owner_id UUID NOT NULL,
-  enabled_products TEXT[] DEFAULT '{}',
-  is_active BOOLEAN DEFAULT TRUE,
-  created_at TIMESTAMPTZ DEFAULT NOW()
-);
-
--- ============================================================
--- DESHABILITAR RLS (Row Level Security)
--- La autenticacion es manejada por FastAPI + JWT, no por Supabase
--- ============================================================
-ALTER TABLE users DISABLE ROW LEVEL SECURITY;
-ALTER TABLE subscriptions DISABLE ROW LEVEL SECURITY;
-ALTER TABLE contact_messages DISABLE ROW LEVEL SECURITY;
-ALTER TABLE companies DISABLE ROW LEVEL SECURITY;
-
--- ============================================================
--- Índices de rendimiento
--- ============================================================
-CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_subscriptions_user_id ON subscriptions(user_id);
-CREATE INDEX IF NOT EXISTS idx_subscriptions_status ON subscriptions(status);
-CREATE INDEX IF NOT EXISTS idx_companies_owner_id ON companies(owner_id);
-CREATE INDEX IF NOT EXISTS idx_messages_created_at ON contact_messages(created_at DESC);
+-- ============================================================
+-- BILLENNIUM SYSTEM — Tablas base (PostgreSQL / Supabase)
+-- Aplicar con: python migrate.py up (DATABASE_URL), o pegar la salida
+-- de "python migrate.py sql" en Supabase Dashboard → SQL Editor
+-- ============================================================
+
+-- Tabla de usuarios
+CREATE TABLE IF NOT EXISTS users (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  email TEXT UNIQUE NOT NULL,
+  name TEXT NOT NULL,
+  company_name TEXT,
+  phone TEXT,
+  password_hash TEXT NOT NULL,
+  role TEXT DEFAULT 'user' CHECK (role IN ('user', 'admin')),
+  is_active BOOLEAN DEFAULT TRUE,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Tabla de suscripciones
+CREATE TABLE IF NOT EXISTS subscriptions (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id UUID NOT NULL,
+  user_email TEXT NOT NULL,
+  user_name TEXT NOT NULL,
+  company_name TEXT,
+  product_id TEXT NOT NULL,
+  product_name TEXT NOT NULL,
+  plan_name TEXT NOT NULL,
+  billing_cycle TEXT DEFAULT 'monthly',
+  is_enabled BOOLEAN DEFAULT FALSE,
+  status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'active', 'suspended', 'cancelled')),
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  enabled_at TIMESTAMPTZ,
+  enabled_by TEXT
+);
+
+-- Tabla de mensajes de contacto
+CREATE TABLE IF NOT EXISTS contact_messages (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  name TEXT NOT NULL,
+  email TEXT NOT NULL,
+  phone TEXT,
+  company TEXT,
+  message TEXT NOT NULL,
+  product_interest TEXT,
+  is_read BOOLEAN DEFAULT FALSE,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Tabla de empresas
+CREATE TABLE IF NOT EXISTS companies (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  name TEXT NOT NULL,
+  ruc TEXT,
+  email TEXT NOT NULL,
+  phone TEXT,
+  address TEXT,
+  owner_id UUID NOT NULL,
+  enabled_products TEXT[] DEFAULT '{}',
+  is_active BOOLEAN DEFAULT TRUE,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- ============================================================
+-- DESHABILITAR RLS (Row Level Security)
+-- La autenticacion es manejada por FastAPI + JWT, no por Supabase
+-- ============================================================
+ALTER TABLE users DISABLE ROW LEVEL SECURITY;
+ALTER TABLE subscriptions DISABLE ROW LEVEL SECURITY;
+ALTER TABLE contact_messages DISABLE ROW LEVEL SECURITY;
+ALTER TABLE companies DISABLE ROW LEVEL SECURITY;
+
+-- ============================================================
+-- Índices de rendimiento
+-- ============================================================
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user_id ON subscriptions(user_id);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_status ON subscriptions(status);
+CREATE INDEX IF NOT EXISTS idx_companies_owner_id ON companies(owner_id);
+CREATE INDEX IF NOT EXISTS idx_messages_created_at ON contact_messages(created_at DESC);
@@ -0,0 +1,71 @@
+-- ============================================================
+-- Búsqueda del panel admin (full-text + trigramas)
+-- Usado por GET /api/admin/search (SEARCH_BACKEND=postgres)
+-- ============================================================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE contact_messages ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(email, '')), 'A') ||
+  setweight(to_tsvector('simple', coalesce(company, '') || ' ' || coalesce(product_interest, '')), 'B') ||
+  setweight(to_tsvector('simple', coalesce(message, '')), 'C')
+) STORED;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(email, '')), 'A') ||
+  setweight(to_tsvector('simple', coalesce(company_name, '')), 'B')
+) STORED;
+
+ALTER TABLE companies ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(ruc, '') || ' ' || coalesce(email, '')), 'A')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_messages_search ON contact_messages USING GIN (search_tsv);
+CREATE INDEX IF NOT EXISTS idx_users_search ON users USING GIN (search_tsv);
+CREATE INDEX IF NOT EXISTS idx_companies_search ON companies USING GIN (search_tsv);
+
+-- Coincidencias parciales (ILIKE '%...%') sobre emails, empresas y RUC
+CREATE INDEX IF NOT EXISTS idx_messages_email_trgm ON contact_messages USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_messages_company_trgm ON contact_messages USING GIN (company gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON users USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_name_trgm ON users USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_companies_ruc_trgm ON companies USING GIN (ruc gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_companies_name_trgm ON companies USING GIN (name gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION admin_search(
+  q TEXT,
+  kinds TEXT[] DEFAULT ARRAY['message', 'user', 'company'],
+  lim INT DEFAULT 20,
+  off INT DEFAULT 0
+)
+RETURNS TABLE (
+  kind TEXT, id UUID, title TEXT, subtitle TEXT, snippet TEXT,
+  score REAL, created_at TIMESTAMPTZ, total BIGINT
+)
+LANGUAGE sql STABLE AS $$
+  WITH query AS (
+    SELECT websearch_to_tsquery('simple', q) AS tsq, '%' || q || '%' AS pattern
+  ),
+  hits AS (
+    SELECT 'message'::TEXT, m.id, m.name, m.email, left(m.message, 160),
+           (ts_rank(m.search_tsv, query.tsq) + similarity(m.email, q))::REAL, m.created_at
+    FROM contact_messages m, query
+    WHERE 'message' = ANY(kinds)
+      AND (m.search_tsv @@ query.tsq OR m.email ILIKE query.pattern OR m.company ILIKE query.pattern)
+    UNION ALL
+    SELECT 'user'::TEXT, u.id, u.name, u.email, u.company_name,
+           (ts_rank(u.search_tsv, query.tsq) + similarity(u.email, q))::REAL, u.created_at
+    FROM users u, query
+    WHERE 'user' = ANY(kinds)
+      AND (u.search_tsv @@ query.tsq OR u.email ILIKE query.pattern OR u.name ILIKE query.pattern)
+    UNION ALL
+    SELECT 'company'::TEXT, c.id, c.name, coalesce(c.ruc, c.email), c.address,
+           (ts_rank(c.search_tsv, query.tsq) + similarity(coalesce(c.ruc, ''), q))::REAL, c.created_at
+    FROM companies c, query
+    WHERE 'company' = ANY(kinds)
+      AND (c.search_tsv @@ query.tsq OR c.ruc ILIKE query.pattern OR c.name ILIKE query.pattern)
+  )
+  SELECT h.*, count(*) OVER () AS total
+  FROM hits h (kind, id, title, subtitle, snippet, score, created_at)
+  ORDER BY score DESC, created_at DESC
+  LIMIT lim OFFSET off;
+$$;
@@ -0,0 +1,35 @@
+-- ============================================================
+-- Ciclo de vida de suscripciones (scheduler.py)
+-- ============================================================
+ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS current_period_end TIMESTAMPTZ;
+ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS reminder_sent_at TIMESTAMPTZ;
+
+-- Índices parciales: cada barrido recorre solo las filas que le corresponden
+CREATE INDEX IF NOT EXISTS idx_subscriptions_active_period_end
+  ON subscriptions(current_period_end) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_subscriptions_reminder_due
+  ON subscriptions(current_period_end) WHERE status = 'active' AND reminder_sent_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_subscriptions_pending_created
+  ON subscriptions(created_at) WHERE status = 'pending';
+
+-- Trabajos programados persistentes (sobreviven reinicios)
+CREATE TABLE IF NOT EXISTS scheduler_jobs (
+  name TEXT PRIMARY KEY,
+  interval_seconds INT NOT NULL,
+  next_run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  last_run_at TIMESTAMPTZ,
+  last_status TEXT,
+  last_error TEXT,
+  last_duration_ms REAL,
+  last_processed INT
+);
+
+-- Lock de líder: solo un worker ejecuta los trabajos
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
+ALTER TABLE scheduler_jobs DISABLE ROW LEVEL SECURITY;
+ALTER TABLE scheduler_leases DISABLE ROW LEVEL SECURITY;
@@ -0,0 +1,25 @@
+-- ============================================================
+-- Outbox de notificaciones (notifications.py)
+-- ============================================================
+CREATE TABLE IF NOT EXISTS notification_outbox (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  kind TEXT NOT NULL,
+  recipient TEXT NOT NULL,
+  subject TEXT NOT NULL,
+  body TEXT NOT NULL,
+  status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+  attempts INT DEFAULT 0,
+  next_attempt_at TIMESTAMPTZ DEFAULT NOW(),
+  claimed_by TEXT,
+  claimed_at TIMESTAMPTZ,
+  last_error TEXT,
+  sent_at TIMESTAMPTZ,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE notification_outbox DISABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_outbox_pending_due
+  ON notification_outbox(next_attempt_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_outbox_sending_claimed
+  ON notification_outbox(claimed_at) WHERE status = 'sending';
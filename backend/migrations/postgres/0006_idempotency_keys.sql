@@ -0,0 +1,16 @@
+-- ============================================================
+-- Idempotency-Key compartido entre workers (IDEMPOTENCY_BACKEND=supabase)
+-- ============================================================
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  key TEXT PRIMARY KEY,
+  fingerprint TEXT,
+  status_code INT,
+  headers JSONB,
+  body TEXT,
+  expires_at TIMESTAMPTZ NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE idempotency_keys DISABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires_at ON idempotency_keys(expires_at);
@@ -0,0 +1,20 @@
+-- ============================================================
+-- Claves foráneas para embeber recursos en PostgREST
+-- (?include=user en suscripciones, ?include=owner en empresas)
+-- NOT VALID: no revalida filas existentes, solo las nuevas
+-- ============================================================
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'subscriptions_user_id_fkey') THEN
+    ALTER TABLE subscriptions
+      ADD CONSTRAINT subscriptions_user_id_fkey
+      FOREIGN KEY (user_id) REFERENCES users(id) NOT VALID;
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'companies_owner_id_fkey') THEN
+    ALTER TABLE companies
+      ADD CONSTRAINT companies_owner_id_fkey
+      FOREIGN KEY (owner_id) REFERENCES users(id) NOT VALID;
+  END IF;
+END $$;
+
+NOTIFY pgrst, 'reload schema';
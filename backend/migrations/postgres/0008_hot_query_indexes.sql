@@ -0,0 +1,14 @@
+-- ============================================================
+-- Índices para las consultas frecuentes del backend
+-- (ver check_query_plans.py)
+-- ============================================================
+
+-- UNIQUE(email) ya crea users_email_key; este índice solo duplicaba escrituras
+DROP INDEX IF EXISTS idx_users_email;
+
+-- Producto ya asignado: user_id + product_id, sin contar canceladas
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user_product_open
+  ON subscriptions(user_id, product_id) WHERE status <> 'cancelled';
+
+-- GET /api/admin/subscriptions ordena por fecha
+CREATE INDEX IF NOT EXISTS idx_subscriptions_created_at ON subscriptions(created_at DESC);
@@ -0,0 +1,36 @@
+-- ============================================================
+-- Sincronización ERP / offline (POST /api/sync/{company_id}, sync.py)
+-- seq crece en cada escritura y es el cursor de los deltas
+-- ============================================================
+CREATE SEQUENCE IF NOT EXISTS sync_records_seq;
+
+CREATE TABLE IF NOT EXISTS sync_records (
+  company_id UUID NOT NULL REFERENCES companies(id),
+  owner_id UUID NOT NULL,
+  collection TEXT NOT NULL,
+  record_id TEXT NOT NULL,
+  data JSONB NOT NULL DEFAULT '{}',
+  version JSONB NOT NULL DEFAULT '{}',
+  deleted BOOLEAN NOT NULL DEFAULT FALSE,
+  seq BIGINT NOT NULL DEFAULT nextval('sync_records_seq'),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (company_id, collection, record_id)
+);
+
+ALTER TABLE sync_records DISABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION sync_records_bump_seq() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  NEW.seq := nextval('sync_records_seq');
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_sync_records_bump_seq ON sync_records;
+CREATE TRIGGER trg_sync_records_bump_seq
+  BEFORE UPDATE ON sync_records
+  FOR EACH ROW EXECUTE FUNCTION sync_records_bump_seq();
+
+CREATE INDEX IF NOT EXISTS idx_sync_records_company_seq ON sync_records(company_id, seq);
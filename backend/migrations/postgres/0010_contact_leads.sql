@@ -0,0 +1,22 @@
+-- ============================================================
+-- Leads: normalización, agrupación de duplicados y puntaje de los
+-- mensajes de contacto (leads.py los procesa en segundo plano)
+-- ============================================================
+
+ALTER TABLE contact_messages
+  ADD COLUMN IF NOT EXISTS email_normalized TEXT,
+  ADD COLUMN IF NOT EXISTS phone_normalized TEXT,
+  ADD COLUMN IF NOT EXISTS lead_id UUID,
+  ADD COLUMN IF NOT EXISTS user_id UUID,
+  ADD COLUMN IF NOT EXISTS company_id UUID,
+  ADD COLUMN IF NOT EXISTS lead_score INTEGER,
+  ADD COLUMN IF NOT EXISTS processed_at TIMESTAMPTZ;
+
+-- Solo se buscan por igualdad (in_), así que alcanza con índices hash
+CREATE INDEX IF NOT EXISTS idx_messages_email_normalized ON contact_messages USING HASH (email_normalized);
+CREATE INDEX IF NOT EXISTS idx_messages_phone_normalized ON contact_messages USING HASH (phone_normalized);
+CREATE INDEX IF NOT EXISTS idx_messages_lead_id ON contact_messages(lead_id);
+
+-- Cola de pendientes: queda casi vacía una vez procesado el histórico
+CREATE INDEX IF NOT EXISTS idx_messages_unprocessed
+  ON contact_messages(created_at) WHERE processed_at IS NULL;
@@ -0,0 +1,35 @@
+-- ============================================================
+-- Analítica de suscripciones (analytics.py)
+-- subscription_events: un registro por cambio de estado (solo inserción)
+-- analytics_rollups: agregados diarios y mensuales por producto y plan
+-- ============================================================
+CREATE TABLE IF NOT EXISTS subscription_events (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  subscription_id UUID NOT NULL,
+  event TEXT NOT NULL CHECK (event IN ('new', 'activated', 'suspended', 'cancelled', 'pending')),
+  product_id TEXT NOT NULL,
+  plan_name TEXT NOT NULL,
+  mrr_delta NUMERIC(12, 2) NOT NULL DEFAULT 0,
+  occurred_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  folded_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS analytics_rollups (
+  granularity TEXT NOT NULL CHECK (granularity IN ('day', 'month')),
+  bucket TEXT NOT NULL,
+  product_id TEXT NOT NULL,
+  plan_name TEXT NOT NULL,
+  new_count INT NOT NULL DEFAULT 0,
+  activated_count INT NOT NULL DEFAULT 0,
+  suspended_count INT NOT NULL DEFAULT 0,
+  cancelled_count INT NOT NULL DEFAULT 0,
+  mrr_delta NUMERIC(12, 2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (granularity, bucket, product_id, plan_name)
+);
+
+ALTER TABLE subscription_events DISABLE ROW LEVEL SECURITY;
+ALTER TABLE analytics_rollups DISABLE ROW LEVEL SECURITY;
+
+-- Eventos aún no sumados a los agregados (el job analytics_rollup los consume)
+CREATE INDEX IF NOT EXISTS idx_subscription_events_unfolded
+  ON subscription_events(occurred_at) WHERE folded_at IS NULL;
@@ -0,0 +1,29 @@
+-- ============================================================
+-- Snapshots offline por trozos (GET /api/sync/{company_id}/snapshot,
+-- snapshots.py) y cola de escrituras (POST /api/sync/{company_id}/queue)
+-- ============================================================
+
+-- Los trozos son rangos de record_id calculados en Python: el orden de
+-- la base tiene que ser el de bytes, no el del locale
+ALTER TABLE sync_records ALTER COLUMN record_id TYPE TEXT COLLATE "C";
+
+-- Reloj de la última edición por campo (ms); "*" cubre todos los campos
+ALTER TABLE sync_records ADD COLUMN IF NOT EXISTS clock JSONB NOT NULL DEFAULT '{}';
+
+CREATE TABLE IF NOT EXISTS sync_chunks (
+  company_id UUID NOT NULL REFERENCES companies(id),
+  owner_id UUID NOT NULL,
+  collection TEXT NOT NULL,
+  start_id TEXT COLLATE "C" NOT NULL,
+  hash TEXT NOT NULL,
+  records INTEGER NOT NULL,
+  bytes INTEGER NOT NULL,
+  body TEXT NOT NULL,
+  cursor BIGINT NOT NULL,
+  built_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (company_id, collection, start_id)
+);
+
+ALTER TABLE sync_chunks DISABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_sync_chunks_hash ON sync_chunks(company_id, hash);
@@ -0,0 +1,21 @@
+-- ============================================================
+-- Un solo producto abierto (no cancelado) por usuario.
+-- El INSERT de POST /api/subscriptions y /api/admin/subscriptions/create
+-- choca con este índice (23505) en lugar de consultar antes
+-- ============================================================
+
+-- Los duplicados que dejó la carrera entre la consulta y el INSERT impedirían crear el índice
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM subscriptions WHERE status <> 'cancelled'
+    GROUP BY user_id, product_id HAVING count(*) > 1
+  ) THEN
+    RAISE EXCEPTION 'Hay suscripciones abiertas duplicadas por (user_id, product_id); cancele las sobrantes y vuelva a migrar';
+  END IF;
+END $$;
+
+DROP INDEX IF EXISTS idx_subscriptions_user_product_open;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_subscriptions_user_product_open
+  ON subscriptions(user_id, product_id) WHERE status <> 'cancelled';
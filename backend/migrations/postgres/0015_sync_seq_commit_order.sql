@@ -0,0 +1,22 @@
+-- ============================================================
+-- seq en orden de commit por empresa.
+-- nextval() se toma al escribir, no al confirmar: si T1 toma 10 y T2 toma 11
+-- pero T2 confirma primero, un cliente que ya avanzó su cursor a 11 nunca
+-- recibe el 10. El candado de transacción por empresa hace que la siguiente
+-- escritura de esa empresa espere al commit de la anterior, así que un seq
+-- visible nunca queda por debajo de uno que aún no lo es
+-- ============================================================
+CREATE OR REPLACE FUNCTION sync_records_bump_seq() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtextextended('sync_records:' || NEW.company_id::text, 0));
+  NEW.seq := nextval('sync_records_seq');
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_sync_records_bump_seq ON sync_records;
+CREATE TRIGGER trg_sync_records_bump_seq
+  BEFORE INSERT OR UPDATE ON sync_records
+  FOR EACH ROW EXECUTE FUNCTION sync_records_bump_seq();
@@ -0,0 +1,30 @@
+-- ============================================================
+-- current_period_end para suscripciones activas anteriores a 0003.
+-- Sin él, el barrido de recordatorios y el de suspensión nunca las ven.
+-- El periodo se cuenta desde enabled_at (o created_at) en ciclos de
+-- billing_cycle, y se toma el fin del ciclo en curso, así que ninguna
+-- queda vencida solo por haberse migrado
+-- ============================================================
+WITH periods AS (
+  SELECT
+    id,
+    COALESCE(enabled_at, created_at) AS start,
+    CASE billing_cycle
+      WHEN 'quarterly' THEN 3
+      WHEN 'semiannual' THEN 6
+      WHEN 'annual' THEN 12
+      WHEN 'yearly' THEN 12
+      ELSE 1
+    END AS cycle_months
+  FROM subscriptions
+  WHERE status = 'active' AND current_period_end IS NULL
+), elapsed AS (
+  SELECT
+    id, start, cycle_months,
+    (EXTRACT(YEAR FROM age(NOW(), start)) * 12 + EXTRACT(MONTH FROM age(NOW(), start)))::int AS months
+  FROM periods
+)
+UPDATE subscriptions s
+SET current_period_end = e.start + make_interval(months => e.cycle_months * (e.months / e.cycle_months + 1))
+FROM elapsed e
+WHERE s.id = e.id;
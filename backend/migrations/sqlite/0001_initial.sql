@@ -0,0 +1,145 @@
+-- ============================================================
+-- BILLENNIUM SYSTEM — Schema embebido (SQLite, DATA_BACKEND=sqlite)
+-- Mismas tablas que migrations/postgres. Tipos declarados que usa
+-- sqlite_client.py: BOOLEAN -> bool, JSON -> json.loads
+-- Fechas en TEXT ISO-8601 (UTC), ids UUID en TEXT
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS users (
+  id TEXT PRIMARY KEY,
+  email TEXT UNIQUE NOT NULL,
+  name TEXT NOT NULL,
+  company_name TEXT,
+  phone TEXT,
+  password_hash TEXT NOT NULL,
+  role TEXT DEFAULT 'user' CHECK (role IN ('user', 'admin')),
+  is_active BOOLEAN DEFAULT 1,
+  created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id),
+  user_email TEXT NOT NULL,
+  user_name TEXT NOT NULL,
+  company_name TEXT,
+  product_id TEXT NOT NULL,
+  product_name TEXT NOT NULL,
+  plan_name TEXT NOT NULL,
+  billing_cycle TEXT DEFAULT 'monthly',
+  is_enabled BOOLEAN DEFAULT 0,
+  status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'active', 'suspended', 'cancelled')),
+  created_at TEXT NOT NULL,
+  enabled_at TEXT,
+  enabled_by TEXT,
+  current_period_end TEXT,
+  reminder_sent_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS contact_messages (
+  id TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  email TEXT NOT NULL,
+  phone TEXT,
+  company TEXT,
+  message TEXT NOT NULL,
+  product_interest TEXT,
+  is_read BOOLEAN DEFAULT 0,
+  created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS companies (
+  id TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  ruc TEXT,
+  email TEXT NOT NULL,
+  phone TEXT,
+  address TEXT,
+  owner_id TEXT NOT NULL REFERENCES users(id),
+  enabled_products JSON DEFAULT '[]',
+  is_active BOOLEAN DEFAULT 1,
+  created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user_id ON subscriptions(user_id, product_id, status);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_status ON subscriptions(status);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_created_at ON subscriptions(created_at);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_period_end
+  ON subscriptions(current_period_end) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_companies_owner_id ON companies(owner_id);
+CREATE INDEX IF NOT EXISTS idx_companies_created_at ON companies(created_at);
+CREATE INDEX IF NOT EXISTS idx_messages_created_at ON contact_messages(created_at);
+
+CREATE TABLE IF NOT EXISTS scheduler_jobs (
+  name TEXT PRIMARY KEY,
+  interval_seconds INTEGER NOT NULL,
+  next_run_at TEXT NOT NULL,
+  last_run_at TEXT,
+  last_status TEXT,
+  last_error TEXT,
+  last_duration_ms REAL,
+  last_processed INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+  id TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  recipient TEXT NOT NULL,
+  subject TEXT NOT NULL,
+  body TEXT NOT NULL,
+  status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+  attempts INTEGER DEFAULT 0,
+  next_attempt_at TEXT,
+  claimed_by TEXT,
+  claimed_at TEXT,
+  last_error TEXT,
+  sent_at TEXT,
+  created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON notification_outbox(next_attempt_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_outbox_sending ON notification_outbox(claimed_at) WHERE status = 'sending';
+
+CREATE TABLE IF NOT EXISTS audit_log (
+  id TEXT PRIMARY KEY,
+  actor_id TEXT,
+  actor_email TEXT,
+  action TEXT NOT NULL,
+  target_type TEXT NOT NULL,
+  target_id TEXT NOT NULL,
+  diff JSON DEFAULT '{}',
+  created_at TEXT NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_audit_log_no_update BEFORE UPDATE ON audit_log
+BEGIN
+  SELECT RAISE(ABORT, 'audit_log es de solo inserción');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_audit_log_no_delete BEFORE DELETE ON audit_log
+BEGIN
+  SELECT RAISE(ABORT, 'audit_log es de solo inserción');
+END;
+
+CREATE INDEX IF NOT EXISTS idx_audit_created_at ON audit_log(created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_actor ON audit_log(actor_email, created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_target ON audit_log(target_type, target_id, created_at);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  key TEXT PRIMARY KEY,
+  fingerprint TEXT,
+  status_code INTEGER,
+  headers JSON,
+  body TEXT,
+  expires_at TEXT NOT NULL,
+  created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires_at ON idempotency_keys(expires_at);
@@ -0,0 +1,11 @@
+-- ============================================================
+-- Barridos del scheduler: status = ? + rango y orden por fecha.
+-- Sin estadísticas SQLite prefiere el índice de igualdad sobre
+-- status y ordena en un B-tree temporal; los compuestos evitan el sort
+-- ============================================================
+
+DROP INDEX IF EXISTS idx_subscriptions_status;
+DROP INDEX IF EXISTS idx_subscriptions_period_end;
+
+CREATE INDEX IF NOT EXISTS idx_subscriptions_status_period_end ON subscriptions(status, current_period_end);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_status_created_at ON subscriptions(status, created_at);
@@ -0,0 +1,35 @@
+-- ============================================================
+-- Sincronización ERP / offline (POST /api/sync/{company_id}, sync.py)
+-- seq crece en cada escritura y es el cursor de los deltas
+-- ============================================================
+CREATE TABLE IF NOT EXISTS sync_records (
+  company_id TEXT NOT NULL REFERENCES companies(id),
+  owner_id TEXT NOT NULL,
+  collection TEXT NOT NULL,
+  record_id TEXT NOT NULL,
+  data JSON NOT NULL DEFAULT '{}',
+  version JSON NOT NULL DEFAULT '{}',
+  deleted BOOLEAN NOT NULL DEFAULT 0,
+  seq INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT,
+  PRIMARY KEY (company_id, collection, record_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_records_seq ON sync_records(seq);
+CREATE INDEX IF NOT EXISTS idx_sync_records_company_seq ON sync_records(company_id, seq);
+
+CREATE TRIGGER IF NOT EXISTS trg_sync_records_seq_insert AFTER INSERT ON sync_records
+BEGIN
+  UPDATE sync_records
+     SET seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM sync_records),
+         updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')
+   WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sync_records_seq_update AFTER UPDATE OF data, version, deleted ON sync_records
+BEGIN
+  UPDATE sync_records
+     SET seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM sync_records),
+         updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')
+   WHERE rowid = NEW.rowid;
+END;
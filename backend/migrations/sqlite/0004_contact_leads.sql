@@ -0,0 +1,17 @@
+-- ============================================================
+-- Leads: normalización, agrupación de duplicados y puntaje de los
+-- mensajes de contacto (leads.py los procesa en segundo plano)
+-- ============================================================
+
+ALTER TABLE contact_messages ADD COLUMN email_normalized TEXT;
+ALTER TABLE contact_messages ADD COLUMN phone_normalized TEXT;
+ALTER TABLE contact_messages ADD COLUMN lead_id TEXT;
+ALTER TABLE contact_messages ADD COLUMN user_id TEXT;
+ALTER TABLE contact_messages ADD COLUMN company_id TEXT;
+ALTER TABLE contact_messages ADD COLUMN lead_score INTEGER;
+ALTER TABLE contact_messages ADD COLUMN processed_at TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_messages_email_normalized ON contact_messages(email_normalized);
+CREATE INDEX IF NOT EXISTS idx_messages_phone_normalized ON contact_messages(phone_normalized);
+CREATE INDEX IF NOT EXISTS idx_messages_lead_id ON contact_messages(lead_id);
+CREATE INDEX IF NOT EXISTS idx_messages_unprocessed ON contact_messages(created_at) WHERE processed_at IS NULL;
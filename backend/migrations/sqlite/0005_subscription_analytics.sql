@@ -0,0 +1,29 @@
+-- ============================================================
+-- Analítica de suscripciones (analytics.py)
+-- ============================================================
+CREATE TABLE IF NOT EXISTS subscription_events (
+  id TEXT PRIMARY KEY,
+  subscription_id TEXT NOT NULL,
+  event TEXT NOT NULL CHECK (event IN ('new', 'activated', 'suspended', 'cancelled', 'pending')),
+  product_id TEXT NOT NULL,
+  plan_name TEXT NOT NULL,
+  mrr_delta REAL NOT NULL DEFAULT 0,
+  occurred_at TEXT NOT NULL,
+  folded_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS analytics_rollups (
+  granularity TEXT NOT NULL CHECK (granularity IN ('day', 'month')),
+  bucket TEXT NOT NULL,
+  product_id TEXT NOT NULL,
+  plan_name TEXT NOT NULL,
+  new_count INTEGER NOT NULL DEFAULT 0,
+  activated_count INTEGER NOT NULL DEFAULT 0,
+  suspended_count INTEGER NOT NULL DEFAULT 0,
+  cancelled_count INTEGER NOT NULL DEFAULT 0,
+  mrr_delta REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (granularity, bucket, product_id, plan_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_subscription_events_unfolded
+  ON subscription_events(occurred_at) WHERE folded_at IS NULL;
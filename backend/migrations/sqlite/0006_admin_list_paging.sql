@@ -0,0 +1,10 @@
+-- ============================================================
+-- Listas de administración paginadas por offset (streaming.py):
+-- el orden debe ser total, así que id desempata created_at
+-- ============================================================
+
+DROP INDEX IF EXISTS idx_subscriptions_created_at;
+DROP INDEX IF EXISTS idx_messages_created_at;
+
+CREATE INDEX IF NOT EXISTS idx_subscriptions_created_at_id ON subscriptions(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_created_at_id ON contact_messages(created_at, id);
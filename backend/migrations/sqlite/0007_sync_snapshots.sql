@@ -0,0 +1,23 @@
+-- ============================================================
+-- Snapshots offline por trozos (GET /api/sync/{company_id}/snapshot,
+-- snapshots.py) y cola de escrituras (POST /api/sync/{company_id}/queue)
+-- ============================================================
+
+-- Reloj de la última edición por campo (ms); "*" cubre todos los campos
+ALTER TABLE sync_records ADD COLUMN clock JSON NOT NULL DEFAULT '{}';
+
+CREATE TABLE IF NOT EXISTS sync_chunks (
+  company_id TEXT NOT NULL REFERENCES companies(id),
+  owner_id TEXT NOT NULL,
+  collection TEXT NOT NULL,
+  start_id TEXT NOT NULL,
+  hash TEXT NOT NULL,
+  records INTEGER NOT NULL,
+  bytes INTEGER NOT NULL,
+  body TEXT NOT NULL,
+  cursor INTEGER NOT NULL,
+  built_at TEXT NOT NULL,
+  PRIMARY KEY (company_id, collection, start_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_chunks_hash ON sync_chunks(company_id, hash);
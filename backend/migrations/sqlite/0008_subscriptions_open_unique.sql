@@ -0,0 +1,9 @@
+-- ============================================================
+-- Un solo producto abierto (no cancelado) por usuario.
+-- El INSERT de POST /api/subscriptions y /api/admin/subscriptions/create
+-- choca con este índice en lugar de consultar antes.
+-- Falla si ya hay duplicados: cancele los sobrantes y vuelva a migrar
+-- ============================================================
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_subscriptions_user_product_open
+  ON subscriptions(user_id, product_id) WHERE status <> 'cancelled';
@@ -0,0 +1,342 @@
+import asyncio
+import collections
+import logging
+import os
+import random
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from email.message import EmailMessage
+
+import events
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Off unless a mail server is configured, so a deploy without one does not fill
+# the outbox with failing retries. For local testing: python smtp_sink.py and
+# NOTIFICATIONS_ENABLED=true, which sends to localhost:1025
+NOTIFICATIONS_ENABLED = os.environ.get(
+    'NOTIFICATIONS_ENABLED', 'true' if os.environ.get('SMTP_HOST') else 'false'
+).lower() == 'true'
+
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '1025'))
+SMTP_USER = os.environ.get('SMTP_USER')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'false').lower() == 'true'
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', '10'))
+MAIL_FROM = os.environ.get('MAIL_FROM', 'Billennium System <no-reply@billenniumsystem.com>')
+ADMIN_NOTIFY_EMAILS = [e.strip() for e in os.environ.get(
+    'ADMIN_NOTIFY_EMAILS', 'facturacion@billenniumsystem.com'
+).split(',') if e.strip()]
+
+DISPATCH_INTERVAL_SECONDS = float(os.environ.get('DISPATCH_INTERVAL_SECONDS', '2'))
+DISPATCH_BATCH_SIZE = int(os.environ.get('DISPATCH_BATCH_SIZE', '50'))
+MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '6'))
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# Rows stuck in "sending" (worker died mid-batch) go back to the queue after this
+CLAIM_TIMEOUT_SECONDS = 300
+
+sent_total = metrics.counter("notifications_sent_total", "Notifications delivered")
+failed_total = metrics.counter("notifications_failed_total", "Notification delivery attempts that failed")
+queue_lag = metrics.histogram(
+    "notification_queue_lag_ms", "Time from enqueue to delivery",
+    buckets=(100, 500, 1000, 5000, 10000, 30000, 60000, 300000, 3600000),
+)
+throughput = metrics.gauge("notification_throughput_per_second", "Delivery rate of the last dispatched batch")
+buffered = metrics.gauge("notification_buffer_size", "Notifications whose outbox insert failed, waiting for a retry")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_ts(value) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _header(value: str) -> str:
+    # names and subjects come from user input; a line break would make EmailMessage refuse the header
+    return " ".join(str(value).splitlines())
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class SMTPConnection:
+    """Keeps one SMTP session open across batches and reconnects when it drops."""
+
+    IDLE_CHECK_SECONDS = 60
+
+    def __init__(self):
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USER:
+            smtp.login(SMTP_USER, SMTP_PASSWORD or "")
+        return smtp
+
+    def _get(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.IDLE_CHECK_SECONDS:
+            try:
+                self._smtp.noop()
+            except OSError:
+                self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    def send(self, message: EmailMessage):
+        try:
+            self._get().send_message(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # stale pooled connection: retry once on a fresh one
+            self.close()
+            self._get().send_message(message)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+class NotificationDispatcher:
+    """Writes notifications to notification_outbox as they happen and delivers
+    them in batches from a background task."""
+
+    def __init__(self, client, connection=None):
+        self.client = client
+        self.connection = connection or SMTPConnection()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def enqueue(self, *notifications):
+        """Insert (kind, recipient, subject, body) tuples into the outbox in one write.
+
+        Runs on the request that caused them, so they survive a crash once it
+        returns; only rows whose insert failed wait in memory for the next
+        dispatch to retry.
+        """
+        now = _now().isoformat()
+        rows = [{
+            "kind": kind,
+            "recipient": recipient,
+            "subject": subject,
+            "body": body,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        } for kind, recipient, subject, body in notifications if recipient]
+        if not rows:
+            return
+        try:
+            self.client.table("notification_outbox").insert(rows).execute()
+        except Exception as e:
+            logger.error(f"Outbox insert failed, queued for retry: {e}")
+            with self._lock:
+                self._buffer.extend(rows)
+                buffered.set(len(self._buffer))
+
+    def _flush_buffer(self):
+        with self._lock:
+            rows = list(self._buffer)
+            self._buffer.clear()
+            buffered.set(0)
+        if not rows:
+            return 0
+        try:
+            self.client.table("notification_outbox").insert(rows).execute()
+        except Exception:
+            with self._lock:
+                self._buffer.extendleft(reversed(rows))
+                buffered.set(len(self._buffer))
+            raise
+        return len(rows)
+
+    def _claim_batch(self):
+        now = _now()
+        self.client.table("notification_outbox").update({"status": "pending", "claimed_by": None}).eq(
+            "status", "sending"
+        ).lt("claimed_at", (now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)).isoformat()).execute()
+
+        due = self.client.table("notification_outbox").select("id").eq("status", "pending").lte(
+            "next_attempt_at", now.isoformat()
+        ).order("next_attempt_at").limit(DISPATCH_BATCH_SIZE).execute().data
+        if not due:
+            return []
+        # Conditional update: rows another worker grabbed first are not returned
+        return self.client.table("notification_outbox").update({
+            "status": "sending", "claimed_by": self.worker_id, "claimed_at": now.isoformat(),
+        }).in_("id", [r["id"] for r in due]).eq("status", "pending").execute().data
+
+    def _build_message(self, row: dict) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = MAIL_FROM
+        message["To"] = _header(row["recipient"])
+        message["Subject"] = _header(row["subject"])
+        message.set_content(row["body"])
+        return message
+
+    def _deliver(self, rows):
+        started = time.perf_counter()
+        sent_ids = []
+        for row in rows:
+            try:
+                self.connection.send(self._build_message(row))
+            except Exception as e:
+                self._record_failure(row, e)
+                continue
+            sent_ids.append(row["id"])
+            sent_total.inc(kind=row["kind"])
+            lag_ms = (_now() - _parse_ts(row["created_at"])).total_seconds() * 1000
+            queue_lag.observe(lag_ms, kind=row["kind"])
+
+        if sent_ids:
+            self.client.table("notification_outbox").update({
+                "status": "sent", "sent_at": _now().isoformat(), "last_error": None,
+            }).in_("id", sent_ids).execute()
+        elapsed = time.perf_counter() - started
+        if elapsed > 0:
+            throughput.set(round(len(sent_ids) / elapsed, 2))
+        return len(sent_ids)
+
+    def _record_failure(self, row: dict, error: Exception):
+        attempts = row.get("attempts", 0) + 1
+        failed_total.inc(kind=row["kind"])
+        gave_up = attempts >= MAX_ATTEMPTS
+        logger.warning(f"Notification {row['id']} to {row['recipient']} failed (attempt {attempts}): {error}")
+        self.client.table("notification_outbox").update({
+            "status": "failed" if gave_up else "pending",
+            "attempts": attempts,
+            "last_error": str(error)[:500],
+            "next_attempt_at": (_now() + timedelta(seconds=backoff_seconds(attempts))).isoformat(),
+        }).eq("id", row["id"]).execute()
+
+    def dispatch_once(self) -> int:
+        self._flush_buffer()
+        delivered = 0
+        while True:
+            rows = self._claim_batch()
+            if not rows:
+                break
+            delivered += self._deliver(rows)
+            if len(rows) < DISPATCH_BATCH_SIZE:
+                break
+        return delivered
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.dispatch_once)
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+            await asyncio.sleep(DISPATCH_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # retry the inserts that failed so they are sent after restart
+        try:
+            await asyncio.to_thread(self._flush_buffer)
+        except Exception as e:
+            logger.error(f"Could not flush notification buffer: {e}")
+        self.connection.close()
+
+
+# ============== TEMPLATES ==============
+
+def _for_admins(kind, subject, body) -> list:
+    return [(kind, email, subject, body) for email in ADMIN_NOTIFY_EMAILS]
+
+
+def register_listeners(dispatcher: NotificationDispatcher):
+    def on_user_registered(_event, user):
+        dispatcher.enqueue(
+            ("welcome", user["email"], "Bienvenido a Billennium System",
+             f"Hola {user['name']},\n\nTu cuenta fue creada correctamente. "
+             "Ya puedes solicitar productos desde tu panel.\n\nEquipo Billennium"),
+            *_for_admins(
+                "admin_new_user", f"Nuevo usuario registrado: {user['email']}",
+                f"{user['name']} ({user['email']}) se registró.\nEmpresa: {user.get('company_name') or '-'}",
+            ),
+        )
+
+    def on_subscription_requested(_event, sub):
+        dispatcher.enqueue(
+            ("subscription_requested", sub["user_email"], f"Solicitud recibida: {sub['product_name']}",
+             f"Hola {sub['user_name']},\n\nRecibimos tu solicitud del plan {sub['plan_name']} de "
+             f"{sub['product_name']}. Te avisaremos cuando sea habilitada.\n\nEquipo Billennium"),
+            *_for_admins(
+                "admin_subscription_requested",
+                f"Nueva solicitud: {sub['product_name']} ({sub['plan_name']})",
+                f"{sub['user_name']} ({sub['user_email']}) solicitó {sub['product_name']} - plan {sub['plan_name']}.",
+            ),
+        )
+
+    def on_subscription_activated(_event, sub):
+        dispatcher.enqueue((
+            "subscription_activated", sub["user_email"], f"{sub['product_name']} habilitado",
+            f"Hola {sub['user_name']},\n\nTu plan {sub['plan_name']} de {sub['product_name']} ya está activo."
+            "\n\nEquipo Billennium",
+        ))
+
+    def on_renewal_reminder(_event, sub):
+        dispatcher.enqueue((
+            "renewal_reminder", sub["user_email"], f"Tu suscripción a {sub['product_name']} vence pronto",
+            f"Hola {sub['user_name']},\n\nTu plan {sub['plan_name']} de {sub['product_name']} vence el "
+            f"{str(sub.get('current_period_end') or '')[:10]}. Contáctanos para renovarlo.\n\nEquipo Billennium",
+        ))
+
+    def on_subscription_suspended(_event, sub):
+        dispatcher.enqueue((
+            "subscription_suspended", sub["user_email"], f"{sub['product_name']} suspendido",
+            f"Hola {sub['user_name']},\n\nTu suscripción a {sub['product_name']} fue suspendida. "
+            "Contáctanos para reactivarla.\n\nEquipo Billennium",
+        ))
+
+    def on_contact_created(_event, msg):
+        dispatcher.enqueue(
+            ("contact_ack", msg["email"], "Recibimos tu mensaje",
+             f"Hola {msg['name']},\n\nGracias por escribirnos. Un asesor te contactará pronto."
+             "\n\nEquipo Billennium"),
+            *_for_admins(
+                "admin_contact", f"Nuevo mensaje de contacto: {msg['name']}",
+                f"De: {msg['name']} <{msg['email']}>\nTeléfono: {msg.get('phone') or '-'}\n"
+                f"Empresa: {msg.get('company') or '-'}\nInterés: {msg.get('product_interest') or '-'}\n\n{msg['message']}",
+            ),
+        )
+
+    events.subscribe("user.registered", on_user_registered)
+    events.subscribe("subscription.requested", on_subscription_requested)
+    events.subscribe("subscription.activated", on_subscription_activated)
+    events.subscribe("subscription.renewal_reminder", on_renewal_reminder)
+    events.subscribe("subscription.suspended", on_subscription_suspended)
+    events.subscribe("contact.created", on_contact_created)
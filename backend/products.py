@@ -0,0 +1,253 @@
+"""The product catalog and its plans, shared by the API, seed.py and analytics.py."""
+
+PRODUCTS = [
+    {
+        "id": "restoflow",
+        "name": "RestoFlow",
+        "slug": "restoflow",
+        "description": "Software SaaS para gestión integral de restaurantes con facturación electrónica SRI",
+        "icon": "UtensilsCrossed",
+        "features": [
+            "Gestión de mesas en tiempo real",
+            "Comandas a cocina automáticas",
+            "Facturación electrónica SRI",
+            "Control de inventario",
+            "Cierre de caja por turnos",
+            "División de cuentas"
+        ],
+        "plans": [
+            {
+                "name": "Emprendedor",
+                "price_before": 40,
+                "price_now": 20,
+                "billing": "mensual",
+                "features": ["1 local", "1 usuario administrador", "3 usuarios meseros", "Facturación electrónica básica", "Reportes estándar", "Soporte básico"]
+            },
+            {
+                "name": "Empresarial",
+                "price_before": 80,
+                "price_now": 50,
+                "billing": "mensual",
+                "popular": True,
+                "features": ["1 local", "Usuarios ilimitados", "Inventario con Kardex", "Control de cajas", "Facturación electrónica completa", "Dividir cuenta de clientes", "Soporte prioritario"]
+            },
+            {
+                "name": "Corporativo",
+                "price_before": 120,
+                "price_now": 80,
+                "billing": "mensual",
+                "features": ["Multiempresa", "Multi local", "Usuarios ilimitados", "Inventario con Kardex", "Control de cajas", "Facturación electrónica", "Acompañamiento en implementación", "Dividir cuenta de clientes", "Recetas y costo por plato"]
+            }
+        ]
+    },
+    {
+        "id": "sentinel",
+        "name": "Pedidos Sentinel",
+        "slug": "pedidos-sentinel",
+        "description": "Aplicación de toma de pedidos enlazada a ERP Billennium para equipos de ventas",
+        "icon": "Smartphone",
+        "features": [
+            "Multi-empresa",
+            "Sincronización con ERP",
+            "Trabajo offline/online",
+            "Generación de proformas PDF",
+            "Dashboard de ventas",
+            "Control de cartera"
+        ],
+        "plans": [
+            {
+                "name": "Básico",
+                "price_before": 60,
+                "price_now": 30,
+                "billing": "mensual",
+                "features": ["1 vendedor", "1 empresa", "Pedidos y proformas", "Catálogo actualizado diario", "Envío por email/WhatsApp", "Trabajo offline/online", "Sincronización automática con ERP", "Soporte básico"]
+            },
+            {
+                "name": "Profesional",
+                "price_before": 120,
+                "price_now": 60,
+                "billing": "mensual",
+                "popular": True,
+                "features": ["Hasta 5 vendedores", "Hasta 3 empresas", "Todo lo del Plan Básico", "Cartera (cobranza en ruta)", "Bancos y formas de pago", "Administración de documentos", "Autorización proforma→pedido", "Soporte profesional", "Reportes en PDF/Excel"]
+            },
+            {
+                "name": "Corporativo",
+                "price_before": 250,
+                "price_now": 125,
+                "billing": "mensual",
+                "features": ["Hasta 20 vendedores", "Hasta 10 empresas", "Todo lo del Plan Profesional", "Dashboard avanzado de ventas y costos", "Por vendedor, empresa y periodo", "Configuración avanzada de parámetros", "Soporte prioritario"]
+            }
+        ]
+    },
+    {
+        "id": "importaciones",
+        "name": "Módulo de Importaciones",
+        "slug": "modulo-importaciones",
+        "description": "Control completo de procesos de importación, costos y órdenes de compra internacionales",
+        "icon": "Ship",
+        "features": [
+            "Control de órdenes de compra",
+            "Seguimiento de embarques",
+            "Cálculo de costos de importación",
+            "Gestión de proveedores internacionales",
+            "Reportes de costeo",
+            "Integración con ERP"
+        ],
+        "plans": [
+            {
+                "name": "Estándar",
+                "price_before": 80,
+                "price_now": 45,
+                "billing": "mensual",
+                "features": ["Hasta 50 importaciones/mes", "1 usuario", "Control de órdenes de compra", "Seguimiento de embarques", "Cálculo de costos básico", "Reportes estándar"]
+            },
+            {
+                "name": "Profesional",
+                "price_before": 150,
+                "price_now": 85,
+                "billing": "mensual",
+                "popular": True,
+                "features": ["Importaciones ilimitadas", "Hasta 5 usuarios", "Todo lo del Plan Estándar", "Gestión de proveedores", "Reportes avanzados de costeo", "Integración con ERP", "Soporte prioritario"]
+            }
+        ]
+    },
+    {
+        "id": "lopdp",
+        "name": "LOPDP",
+        "slug": "lopdp",
+        "description": "Solución para cumplir la Ley Orgánica de Protección de Datos Personales en Ecuador",
+        "icon": "ShieldCheck",
+        "features": [
+            "Inventario de datos personales",
+            "Gestión de consentimientos",
+            "Registro de tratamientos",
+            "Portal de derechos ARCO",
+            "Alertas de cumplimiento",
+            "Documentación legal automatizada"
+        ],
+        "plans": [
+            {
+                "name": "PYME",
+                "price_before": 60,
+                "price_now": 35,
+                "billing": "mensual",
+                "features": ["Hasta 500 registros", "1 usuario administrador", "Inventario de datos", "Gestión de consentimientos básica", "Portal ARCO", "Documentación legal básica"]
+            },
+            {
+                "name": "Empresarial",
+                "price_before": 120,
+                "price_now": 70,
+                "billing": "mensual",
+                "popular": True,
+                "features": ["Registros ilimitados", "Hasta 5 usuarios", "Todo lo del Plan PYME", "Registro de tratamientos completo", "Alertas de cumplimiento", "Reportes de auditoría", "Soporte prioritario"]
+            }
+        ]
+    },
+    {
+        "id": "facturacion",
+        "name": "Facturación Electrónica",
+        "slug": "facturacion-electronica",
+        "description": "Sistema en la nube para emitir comprobantes electrónicos cumpliendo normativa SRI",
+        "icon": "FileText",
+        "features": [
+            "Facturas electrónicas",
+            "Notas de crédito/débito",
+            "Retenciones",
+            "Guías de remisión",
+            "Liquidaciones de compra",
+            "Reportes para declaraciones"
+        ],
+        "plans": [
+            {
+                "name": "Básico",
+                "price_before": 25,
+                "price_now": 15,
+                "billing": "mensual",
+                "features": ["Hasta 100 documentos/mes", "1 usuario", "Facturas y notas de crédito", "Envío automático al SRI", "Portal de consulta", "Soporte por email"]
+            },
+            {
+                "name": "Profesional",
+                "price_before": 50,
+                "price_now": 30,
+                "billing": "mensual",
+                "popular": True,
+                "features": ["Hasta 500 documentos/mes", "Hasta 3 usuarios", "Todos los tipos de comprobantes", "Retenciones automáticas", "Reportes para declaraciones", "Soporte prioritario"]
+            },
+            {
+                "name": "Empresarial",
+                "price_before": 100,
+                "price_now": 60,
+                "billing": "mensual",
+                "features": ["Documentos ilimitados", "Usuarios ilimitados", "Todo lo del Plan Profesional", "API de integración", "Múltiples puntos de emisión", "Soporte dedicado"]
+            }
+        ]
+    },
+    {
+        "id": "dashboard",
+        "name": "Dashboard Empresarial",
+        "slug": "dashboard-empresarial",
+        "description": "Dashboard comercial y financiero para empresas enlazado a su propio ERP",
+        "icon": "BarChart3",
+        "features": [
+            "KPIs en tiempo real",
+            "Análisis de ventas",
+            "Control de cartera",
+            "Indicadores financieros",
+            "Reportes personalizados",
+            "Integración con ERP"
+        ],
+        "plans": [
+            {
+                "name": "Básico",
+                "price_before": 250,
+                "price_now": 150,
+                "billing": "mensual",
+                "features": [
+                    "Dashboard principal con KPIs básicos",
+                    "Ventas, compras y cobros del día anterior",
+                    "Top 10 clientes y productos",
+                    "Hasta 3 usuarios",
+                    "Exportación a Excel",
+                    "Soporte estándar"
+                ]
+            },
+            {
+                "name": "Profesional",
+                "price_before": 400,
+                "price_now": 250,
+                "billing": "mensual",
+                "popular": True,
+                "features": [
+                    "Todo lo del Plan Básico",
+                    "Datos en tiempo real",
+                    "Dashboard de cartera y vencimientos",
+                    "Rentabilidad por producto, vendedor y cliente",
+                    "Hasta 10 usuarios",
+                    "Alertas configurables por indicador",
+                    "Reportes personalizados en PDF/Excel",
+                    "Integración total con ERP Billennium",
+                    "Soporte prioritario"
+                ]
+            }
+        ]
+    },
+    {
+        "id": "plataforma-ferias",
+        "name": "Plataforma Móvil para Ferias",
+        "slug": "plataforma-ferias",
+        "description": "App móvil instalable + panel web de administración para gestionar ferias y exposiciones de forma profesional.",
+        "icon": "Ticket",
+        "features": [
+            "Registro de visitantes con credencial digital QR",
+            "Mapa del recinto con ubicación de stands",
+            "Catálogo de expositores con búsqueda por nombre y rubro",
+            "Captura de leads mediante escaneo de QR",
+            "Clasificación de leads (frío/tibio/caliente)",
+            "Exportación de leads a Excel/CSV",
+            "Notificaciones generales a visitantes",
+            "Cumplimiento LOPDP (consentimiento explícito)"
+        ],
+        "external_link": "https://proyecto-ferias2026.vercel.app/",
+        "plans": []
+    }
+]
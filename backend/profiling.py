@@ -0,0 +1,281 @@
+"""Opt-in request profiling (PROFILING_ENABLED=true).
+
+Every request records how long its data-client calls and bcrypt took. The
+PROFILE_SLOWEST slowest requests over PROFILE_SLOW_MS are kept in memory, per
+worker process. A stack sampler also runs on a request when an admin sends
+`X-Profile: 1`, or on a random PROFILE_SAMPLE_RATE fraction of requests. Its
+stacks are exported in folded format ("a;b;c 12"), which flamegraph.pl and
+speedscope read directly.
+
+When disabled, the middleware is not installed and instrument() returns the
+client unchanged; only span() remains, as a context-variable lookup.
+"""
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '500'))
+PROFILE_SLOWEST = int(os.environ.get('PROFILE_SLOWEST', '50'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+# explicitly requested profiles are kept regardless of duration, newest last
+PROFILE_RECENT = 20
+
+_OPS = ("select", "insert", "upsert", "update", "delete")
+# leaf frames of threads that are parked, not working (pool workers, the event loop's select)
+_IDLE_LEAVES = frozenset({("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get")})
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, explicit: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.explicit = explicit
+        self.started_at = datetime.now(timezone.utc)
+        self.status = None
+        self.duration_ms = 0.0
+        self.data_calls = []
+        self.spans = Counter()
+        self.stacks = None
+        self._started = time.perf_counter()
+
+    def data_call(self, table: str, op: str, ms: float):
+        self.data_calls.append((table, op, ms))
+
+    def finish(self, status: int, stacks: Counter = None):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.status = status
+        self.stacks = stacks
+
+    def summary(self) -> dict:
+        calls = {}
+        for table, op, ms in self.data_calls:
+            entry = calls.setdefault((table, op), {"table": table, "op": op, "count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += ms
+        breakdown = sorted(calls.values(), key=lambda c: c["total_ms"], reverse=True)
+        for entry in breakdown:
+            entry["total_ms"] = round(entry["total_ms"], 2)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "data_ms": round(sum(ms for _t, _o, ms in self.data_calls), 2),
+            "bcrypt_ms": round(self.spans.get("bcrypt", 0.0), 2),
+            "data_calls": breakdown,
+            "explicit": self.explicit,
+            "samples": sum(self.stacks.values()) if self.stacks else 0,
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted((self.stacks or {}).items()))
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Adds the block's wall time to the current request profile, if any."""
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.spans[name] += (time.perf_counter() - started) * 1000
+
+
+# ============== DATA CLIENT TIMING ==============
+
+class _TimedQuery:
+    def __init__(self, builder, table: str, op: str = "select"):
+        self._builder = builder
+        self._table = table
+        self._op = op
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # properties such as .not_ return the next builder
+            if hasattr(attr, "execute"):
+                self._builder = attr
+                return self
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if name in _OPS:
+                self._op = name
+            if hasattr(result, "execute"):
+                self._builder = result
+                return self
+            return result
+        return chained
+
+    def execute(self):
+        profile = current_profile.get()
+        if profile is None:
+            return self._builder.execute()
+        started = time.perf_counter()
+        try:
+            return self._builder.execute()
+        finally:
+            profile.data_call(self._table, self._op, (time.perf_counter() - started) * 1000)
+
+
+class InstrumentedClient:
+    """Wraps a data client so execute() calls are timed into the current request profile."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _TimedQuery(self._client.table(name), name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: dict = None):
+        return _TimedQuery(self._client.rpc(fn, params), f"rpc:{fn}", "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument(client):
+    return InstrumentedClient(client) if PROFILING_ENABLED else client
+
+
+# ============== SAMPLING ==============
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of every busy thread in the process until stopped.
+
+    Python cannot attribute a sync handler's worker thread to its request from
+    the outside, so concurrent requests show up in each other's profiles.
+    Profile on a quiet worker for clean results.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                code = frame.f_code
+                if ident == me or (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                self.stacks[_fold(frame)] += 1
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+# ============== STORE ==============
+
+class ProfileStore:
+    def __init__(self, slowest: int = PROFILE_SLOWEST, recent: int = PROFILE_RECENT):
+        self.slowest = slowest
+        self._heap = []
+        self._explicit = deque(maxlen=recent)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            if profile.explicit:
+                self._explicit.append(profile)
+            if profile.duration_ms < PROFILE_SLOW_MS:
+                return
+            item = (profile.duration_ms, next(self._seq), profile)
+            if len(self._heap) < self.slowest:
+                heapq.heappush(self._heap, item)
+            elif profile.duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def slowest_profiles(self) -> list:
+        with self._lock:
+            return [p for _d, _s, p in sorted(self._heap, reverse=True)]
+
+    def explicit_profiles(self) -> list:
+        with self._lock:
+            return list(reversed(self._explicit))
+
+    def get(self, profile_id: str):
+        with self._lock:
+            for profile in itertools.chain((p for _d, _s, p in self._heap), self._explicit):
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+
+store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """Profiles each request; `is_admin(token)` gates the X-Profile header."""
+
+    def __init__(self, app, is_admin):
+        self.app = app
+        self.is_admin = is_admin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        explicit = False
+        if headers.get(b"x-profile") == b"1":
+            auth = headers.get(b"authorization", b"").decode("latin-1")
+            explicit = auth.lower().startswith("bearer ") and self.is_admin(auth[7:].strip())
+        profile = RequestProfile(scope["method"], scope["path"], explicit)
+        sampler = None
+        if explicit or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+            sampler = StackSampler()
+            sampler.start()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if explicit:
+                    message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_profile.reset(token)
+            profile.finish(status, sampler.stop() if sampler else None)
+            store.add(profile)
@@ -0,0 +1,234 @@
+import math
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+import metrics
+
+# Behind Railway's proxy request.client is the proxy; the client address is
+# the last hop appended to X-Forwarded-For. Off by default: a client that
+# reaches the process directly could set that header to dodge its limits.
+# The Railway start commands turn it on.
+TRUST_PROXY_HEADERS = os.environ.get('TRUST_PROXY_HEADERS', 'false').lower() == 'true'
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+
+blocked_total = metrics.counter("rate_limit_blocked_total", "Requests rejected by auth and contact rate limiting")
+tracked_keys = metrics.gauge("rate_limit_tracked_keys", "Keys currently tracked per limiter")
+
+
+class RateLimited(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Window:
+    __slots__ = ("counts", "stamps", "last_seen")
+
+    def __init__(self, buckets: int):
+        self.counts = array("I", bytes(4 * buckets))
+        self.stamps = array("q", bytes(8 * buckets))
+        self.last_seen = 0.0
+
+
+class SlidingWindowCounter:
+    """Approximate sliding-window counts per key using a small ring of buckets.
+
+    Each key costs two fixed arrays of `buckets` slots; keys idle for a full
+    window are evicted, and the table never holds more than max_keys (LRU).
+    """
+
+    def __init__(self, name: str, window_seconds: float, buckets: int = 12, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.name = name
+        self.window = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sum(self, win: _Window, epoch: int) -> int:
+        oldest = epoch - self.buckets + 1
+        return sum(c for c, s in zip(win.counts, win.stamps) if s >= oldest)
+
+    def _evict(self, now: float):
+        # the OrderedDict is in last-use order, so idle keys are at the front
+        while self._keys:
+            key, win = next(iter(self._keys.items()))
+            if now - win.last_seen < self.window and len(self._keys) <= self.max_keys:
+                break
+            self._keys.popitem(last=False)
+
+    def hit(self, key: str, now: float = None) -> int:
+        now = time.monotonic() if now is None else now
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % self.buckets
+        with self._lock:
+            win = self._keys.get(key)
+            if win is None:
+                win = self._keys[key] = _Window(self.buckets)
+            else:
+                self._keys.move_to_end(key)
+            if win.stamps[slot] != epoch:
+                win.stamps[slot] = epoch
+                win.counts[slot] = 0
+            win.counts[slot] += 1
+            win.last_seen = now
+            total = self._sum(win, epoch)
+            self._evict(now)
+            tracked_keys.set(len(self._keys), limiter=self.name)
+        return total
+
+    def count(self, key: str, now: float = None) -> int:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            win = self._keys.get(key)
+            return self._sum(win, int(now // self.bucket_seconds)) if win else 0
+
+    def reset(self, key: str):
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+class LockoutTable:
+    """key -> unlock time (monotonic), bounded like the counters."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._until = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set(self, key: str, until: float):
+        with self._lock:
+            self._until[key] = until
+            self._until.move_to_end(key)
+            while len(self._until) > self.max_keys:
+                self._until.popitem(last=False)
+
+    def remaining(self, key: str, now: float) -> float:
+        with self._lock:
+            until = self._until.get(key)
+            if until is None:
+                return 0
+            if until <= now:
+                del self._until[key]
+                return 0
+            return until - now
+
+    def clear(self, key: str):
+        with self._lock:
+            self._until.pop(key, None)
+
+
+def client_ip(request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class LoginGuard:
+    """Brute-force protection for /auth/login, checked before any DB or bcrypt work."""
+
+    IP_ATTEMPTS_PER_MINUTE = 30
+    FAILURE_WINDOW_SECONDS = 900
+    # failures on one (ip, email) pair before progressive delays kick in
+    FREE_FAILURES = 3
+    MAX_DELAY_SECONDS = 30
+    PAIR_LOCKOUT_FAILURES = 8
+    EMAIL_LOCKOUT_FAILURES = 20
+    LOCKOUT_SECONDS = 900
+
+    def __init__(self):
+        self.ip_attempts = SlidingWindowCounter("login_ip", 60)
+        self.pair_failures = SlidingWindowCounter("login_ip_email_failures", self.FAILURE_WINDOW_SECONDS, buckets=15)
+        self.email_failures = SlidingWindowCounter("login_email_failures", self.FAILURE_WINDOW_SECONDS, buckets=15)
+        self.lockouts = LockoutTable()
+        self.last_failure = LockoutTable()
+
+    def _block(self, reason: str, retry_after: float):
+        blocked_total.inc(endpoint="login", reason=reason)
+        raise RateLimited(reason, retry_after)
+
+    def check(self, ip: str, email: str):
+        now = time.monotonic()
+        email = email.lower()
+        pair = f"{ip}|{email}"
+
+        for key in (pair, f"email|{email}"):
+            remaining = self.lockouts.remaining(key, now)
+            if remaining:
+                self._block("lockout", remaining)
+
+        # progressive delay, set by record_failure: a retry inside it is rejected
+        # with Retry-After rather than holding a worker thread asleep
+        wait = self.last_failure.remaining(pair, now)
+        if wait:
+            self._block("delay", wait)
+
+        if self.ip_attempts.hit(ip, now) > self.IP_ATTEMPTS_PER_MINUTE:
+            self._block("ip_rate", self.ip_attempts.bucket_seconds)
+
+    def record_failure(self, ip: str, email: str):
+        now = time.monotonic()
+        email = email.lower()
+        pair = f"{ip}|{email}"
+        failures = self.pair_failures.hit(pair, now)
+        if failures >= self.FREE_FAILURES:
+            delay = min(2 ** (failures - self.FREE_FAILURES + 1), self.MAX_DELAY_SECONDS)
+            self.last_failure.set(pair, now + delay)
+        if failures >= self.PAIR_LOCKOUT_FAILURES:
+            self.lockouts.set(pair, now + self.LOCKOUT_SECONDS)
+        if self.email_failures.hit(f"email|{email}", now) >= self.EMAIL_LOCKOUT_FAILURES:
+            self.lockouts.set(f"email|{email}", now + self.LOCKOUT_SECONDS)
+
+    def record_success(self, ip: str, email: str):
+        pair = f"{ip}|{email.lower()}"
+        self.pair_failures.reset(pair)
+        self.last_failure.clear(pair)
+
+
+class _HourlyGuard:
+    """Caps attempts per IP and per email over the last hour."""
+
+    ENDPOINT = ""
+    IP_PER_HOUR = 0
+    EMAIL_PER_HOUR = 0
+
+    def __init__(self):
+        self.ip_attempts = SlidingWindowCounter(f"{self.ENDPOINT}_ip", 3600)
+        self.email_attempts = SlidingWindowCounter(f"{self.ENDPOINT}_email", 3600)
+
+    def check(self, ip: str, email: str):
+        now = time.monotonic()
+        if self.ip_attempts.hit(ip, now) > self.IP_PER_HOUR:
+            blocked_total.inc(endpoint=self.ENDPOINT, reason="ip_rate")
+            raise RateLimited("ip_rate", self.ip_attempts.bucket_seconds)
+        if self.email_attempts.hit(email.lower(), now) > self.EMAIL_PER_HOUR:
+            blocked_total.inc(endpoint=self.ENDPOINT, reason="email_rate")
+            raise RateLimited("email_rate", self.email_attempts.bucket_seconds)
+
+
+class RegisterGuard(_HourlyGuard):
+    """Caps account creation per IP and per email before the existence query and bcrypt."""
+
+    ENDPOINT = "register"
+    IP_PER_HOUR = 10
+    EMAIL_PER_HOUR = 3
+
+
+class ContactGuard(_HourlyGuard):
+    """Caps anonymous contact messages, each of which sends mail."""
+
+    ENDPOINT = "contact"
+    IP_PER_HOUR = 10
+    EMAIL_PER_HOUR = 5
+
+
+login_guard = LoginGuard()
+register_guard = RegisterGuard()
+contact_guard = ContactGuard()
@@ -0,0 +1,446 @@
+"""Keeping the API useful while the data layer is slow or down.
+
+Every data call goes through a circuit breaker with a per-operation timeout
+(DATA_READ_TIMEOUT_MS for selects and rpcs, DATA_WRITE_TIMEOUT_MS for writes).
+The call runs on a bounded pool of DATA_CALL_WORKERS threads, so a hung
+Supabase request stops holding its caller at the timeout, and at most that
+many hung requests pile up. A timed-out write may still land; clients retry
+those with an Idempotency-Key.
+
+- Timeouts and outage errors (connection failures, gateway 5xx, PostgREST
+  connection codes, SQLSTATE classes 08/53/57/58, a locked SQLite file)
+  count as failures. Constraint violations and other answers from the
+  database do not.
+- After BREAKER_FAILURES consecutive failures the breaker opens. Calls then
+  fail at once with DataUnavailable (503 with Retry-After) for
+  BREAKER_RESET_SECONDS. After that, one probe call is let through: if it
+  succeeds the breaker closes, otherwise it opens again.
+
+ReadCache keeps the last good result of a few read endpoints and serves it,
+marked with Age and a `Warning: 110` header, when the data layer fails, for up
+to STALE_MAX_SECONDS. The caller's own user row, which carries the role that
+admin checks read, is only served stale for AUTH_STALE_MAX_SECONDS, so a
+demoted or deleted account loses access soon after the outage starts. An
+endpoint may also give it a fresh window, served without asking, and a
+revalidate window after it, served while refreshing in the background
+(stale-while-revalidate).
+
+LoadShedMiddleware caps the requests in flight per worker at MAX_INFLIGHT.
+Public catalog and login traffic may use all of it. Other requests are
+turned away with 503 once SHED_NORMAL_FRACTION of it is in use, and admin
+and sync traffic once SHED_LOW_FRACTION is.
+
+DATA_FAULTS injects latency and errors into data calls, e.g.
+`latency_ms=2000,error_rate=0.5,tables=users;subscriptions`. It is only
+honoured with DATA_BACKEND=sqlite. tests/test_degradation.py sets the same
+injector directly.
+"""
+import contextvars
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import httpx
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DATA_READ_TIMEOUT_MS = float(os.environ.get('DATA_READ_TIMEOUT_MS', '5000'))
+DATA_WRITE_TIMEOUT_MS = float(os.environ.get('DATA_WRITE_TIMEOUT_MS', '10000'))
+DATA_CALL_WORKERS = int(os.environ.get('DATA_CALL_WORKERS', '32'))
+BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', '15'))
+STALE_MAX_SECONDS = float(os.environ.get('STALE_MAX_SECONDS', '3600'))
+AUTH_STALE_MAX_SECONDS = float(os.environ.get('AUTH_STALE_MAX_SECONDS', '60'))
+READ_CACHE_SIZE = int(os.environ.get('READ_CACHE_SIZE', '10000'))
+MAX_INFLIGHT = int(os.environ.get('MAX_INFLIGHT', '200'))
+SHED_NORMAL_FRACTION = float(os.environ.get('SHED_NORMAL_FRACTION', '0.75'))
+SHED_LOW_FRACTION = float(os.environ.get('SHED_LOW_FRACTION', '0.5'))
+SHED_RETRY_AFTER = 2
+DATA_FAULTS = os.environ.get('DATA_FAULTS', '')
+
+WRITE_OPS = frozenset({"insert", "upsert", "update", "delete"})
+_OPS = WRITE_OPS | {"select"}
+_OUTAGE_SQLSTATE_CLASSES = ("08", "53", "57", "58")
+_OUTAGE_POSTGREST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+STALE_HEADERS = ("age", "warning")
+
+breaker_state = metrics.gauge("data_breaker_state", "Data-layer circuit breaker: 0 closed, 1 half-open, 2 open")
+data_failures = metrics.counter("data_call_failures_total", "Data calls that failed as an outage, by reason")
+read_cache_hits = metrics.counter("read_cache_total", "Cached read endpoint lookups, by outcome")
+shed_total = metrics.counter("requests_shed_total", "Requests turned away under load, by priority")
+inflight_gauge = metrics.gauge("requests_inflight", "Requests being handled by this worker")
+
+
+class DataUnavailable(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def is_outage(exc: BaseException) -> bool:
+    # OSError covers ConnectionError and TimeoutError
+    if isinstance(exc, (OSError, httpx.TransportError)):
+        return True
+    if isinstance(exc, sqlite3.OperationalError):
+        return "locked" in str(exc) or "disk I/O" in str(exc)
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        # postgrest-py puts the HTTP status here when the body was not JSON (gateway errors)
+        return code >= 500
+    code = str(code or "")
+    return code in _OUTAGE_POSTGREST_CODES or (len(code) == 5 and code[:2] in _OUTAGE_SQLSTATE_CLASSES)
+
+
+# ============== CIRCUIT BREAKER ==============
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.name = name
+        self.threshold = failures
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        breaker_state.set(0, breaker=name)
+
+    def _set(self, state: str):
+        if state != self.state:
+            log = logger.warning if state == self.OPEN else logger.info
+            log(f"Data breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+        breaker_state.set(self._GAUGE[state], breaker=self.name)
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_seconds - (self.clock() - self._opened_at))
+
+    def allow(self):
+        """Raises DataUnavailable unless a call may go through now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                if self.retry_after() > 0:
+                    raise DataUnavailable("circuit open", self.retry_after())
+                self._set(self.HALF_OPEN)
+                self._probing = False
+            # half-open: a single probe at a time
+            if self._probing:
+                raise DataUnavailable("circuit half-open", 1)
+            self._probing = True
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                self._set(self.CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._failures >= self.threshold):
+                self._probing = False
+                self._opened_at = self.clock()
+                self._set(self.OPEN)
+
+
+# ============== FAULT INJECTION ==============
+
+class FaultInjector:
+    """Latency and errors added to data calls, for degradation drills on the local stand-in."""
+
+    def __init__(self):
+        self.latency_ms = 0.0
+        self.error_rate = 0.0
+        self.tables = None
+
+    @property
+    def active(self) -> bool:
+        return self.latency_ms > 0 or self.error_rate > 0
+
+    def set(self, latency_ms: float = 0.0, error_rate: float = 0.0, tables=None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.tables = frozenset(tables) if tables else None
+
+    def clear(self):
+        self.set()
+
+    def configure(self, spec: str):
+        """`latency_ms=2000,error_rate=0.5,tables=users;subscriptions`"""
+        options = dict(part.split("=", 1) for part in spec.split(",") if "=" in part)
+        self.set(
+            float(options.get("latency_ms", 0)),
+            float(options.get("error_rate", 0)),
+            [t for t in options.get("tables", "").split(";") if t],
+        )
+
+    def apply(self, table: str):
+        if self.tables is not None and table not in self.tables:
+            return
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            raise ConnectionError(f"Fallo inyectado en {table}")
+
+
+# ============== GUARDED CLIENT ==============
+
+class _GuardedQuery:
+    def __init__(self, guard, builder, table: str, op: str = "select"):
+        self._guard = guard
+        self._builder = builder
+        self._table = table
+        self._op = op
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # properties such as .not_ return the next builder
+            if hasattr(attr, "execute"):
+                self._builder = attr
+                return self
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if name in _OPS:
+                self._op = name
+            if hasattr(result, "execute"):
+                self._builder = result
+                return self
+            return result
+        return chained
+
+    def execute(self):
+        return self._guard.call(self._builder.execute, self._table, self._op)
+
+
+class GuardedClient:
+    """Wraps a data client so every execute() goes through the breaker with a timeout."""
+
+    def __init__(self, client, breaker: CircuitBreaker, faults: FaultInjector = None, workers: int = DATA_CALL_WORKERS):
+        self._client = client
+        self.breaker = breaker
+        self.faults = faults or FaultInjector()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="data-call")
+
+    def table(self, name: str):
+        return _GuardedQuery(self, self._client.table(name), name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: dict = None):
+        return _GuardedQuery(self, self._client.rpc(fn, params), f"rpc:{fn}", "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _run(self, execute, table: str):
+        if self.faults.active:
+            self.faults.apply(table)
+        return execute()
+
+    def call(self, execute, table: str, op: str):
+        self.breaker.allow()
+        timeout_ms = DATA_WRITE_TIMEOUT_MS if op in WRITE_OPS else DATA_READ_TIMEOUT_MS
+        try:
+            if timeout_ms <= 0:
+                result = self._run(execute, table)
+            else:
+                # the tenant and profile context variables travel with the call
+                future = self._pool.submit(contextvars.copy_context().run, self._run, execute, table)
+                try:
+                    result = future.result(timeout_ms / 1000)
+                except FutureTimeout:
+                    future.cancel()
+                    data_failures.inc(reason="timeout")
+                    self.breaker.failure()
+                    raise DataUnavailable(f"{table} {op} timed out", self.breaker.retry_after() or 1) from None
+        except DataUnavailable:
+            raise
+        except Exception as e:
+            if not is_outage(e):
+                self.breaker.success()
+                raise
+            data_failures.inc(reason="error")
+            self.breaker.failure()
+            raise DataUnavailable(f"{table} {op} failed: {e}", self.breaker.retry_after() or 1) from e
+        self.breaker.success()
+        return result
+
+
+breaker = CircuitBreaker("data")
+faults = FaultInjector()
+
+
+def guard(client, backend: str) -> GuardedClient:
+    if DATA_FAULTS:
+        if backend == "sqlite":
+            faults.configure(DATA_FAULTS)
+            logger.warning(f"DATA_FAULTS active: {DATA_FAULTS}")
+        else:
+            logger.error("DATA_FAULTS is ignored outside DATA_BACKEND=sqlite")
+    return GuardedClient(client, breaker, faults)
+
+
+# ============== READ CACHE ==============
+
+class ReadCache:
+    """Last good value per key, for serving reads through a data-layer outage."""
+
+    def __init__(self, size: int = READ_CACHE_SIZE, max_stale: float = STALE_MAX_SECONDS, clock=time.monotonic):
+        self.size = size
+        self.max_stale = max_stale
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidate")
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _revalidate(self, key, load):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(key, load())
+                read_cache_hits.inc(outcome="revalidated")
+            except Exception as e:
+                logger.warning(f"Background refresh of {key[0]} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._pool.submit(contextvars.copy_context().run, refresh)
+
+    def get(self, key, load, fresh: float = 0.0, revalidate: float = 0.0, max_stale: float = None):
+        """(value, age): age is None for a fresh value, or the seconds a stale one has been cached.
+
+        Younger than `fresh`, the cached value is returned as is; for `revalidate`
+        seconds more, it is returned while one background load refreshes it.
+        `max_stale` overrides the cache's limit for serving through an outage.
+        """
+        max_stale = self.max_stale if max_stale is None else max_stale
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = self.clock() - stored_at
+            if age < fresh:
+                read_cache_hits.inc(outcome="fresh")
+                return value, None
+            if age < fresh + revalidate:
+                read_cache_hits.inc(outcome="revalidating")
+                self._revalidate(key, load)
+                return value, age
+        try:
+            value = load()
+        except DataUnavailable:
+            if entry is None or self.clock() - entry[1] >= max_stale:
+                raise
+            read_cache_hits.inc(outcome="stale")
+            return entry[0], self.clock() - entry[1]
+        read_cache_hits.inc(outcome="loaded")
+        self.put(key, value)
+        return value, None
+
+
+def mark_stale(response, age: float):
+    """Age and Warning headers on a response served from a stale cache entry."""
+    age = max(int(age), int(response.headers.get("age", 0)))
+    response.headers["Age"] = str(age)
+    response.headers["Warning"] = '110 - "Response is Stale"'
+
+
+def stale_headers(response) -> dict:
+    return {name: response.headers[name] for name in STALE_HEADERS if name in response.headers}
+
+
+# ============== LOAD SHEDDING ==============
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+CRITICAL_ROUTES = (("GET", "/api/products"), ("POST", "/api/auth/login"), ("GET", "/api/.well-known/"))
+LOW_PREFIXES = ("/api/admin/", "/api/bff/admin/", "/api/sync/")
+
+
+def priority(method: str, path: str) -> str:
+    if path == "/api/" or any(method == m and path.startswith(p) for m, p in CRITICAL_ROUTES):
+        return CRITICAL
+    if path.startswith(LOW_PREFIXES):
+        return LOW
+    return NORMAL
+
+
+class LoadShedMiddleware:
+    """Turns requests away with 503 before they queue up, lowest priority first."""
+
+    def __init__(self, app, max_inflight: int = MAX_INFLIGHT, classify=priority):
+        self.app = app
+        self.classify = classify
+        self.limits = {
+            CRITICAL: max_inflight,
+            NORMAL: int(max_inflight * SHED_NORMAL_FRACTION),
+            LOW: int(max_inflight * SHED_LOW_FRACTION),
+        }
+        self.enabled = max_inflight > 0
+        self.inflight = 0
+        body = b'{"detail":"Servicio sobrecargado. Intente de nuevo en unos segundos"}'
+        self.shed_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(SHED_RETRY_AFTER).encode()),
+        ]
+        self.shed_body = body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            return await self.app(scope, receive, send)
+        tier = self.classify(scope["method"], scope["path"])
+        # handlers run on the event loop's thread, so the counter needs no lock
+        if self.inflight >= self.limits[tier]:
+            shed_total.inc(priority=tier)
+            await send({"type": "http.response.start", "status": 503, "headers": self.shed_headers})
+            return await send({"type": "http.response.body", "body": self.shed_body})
+        self.inflight += 1
+        inflight_gauge.set(self.inflight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+            inflight_gauge.set(self.inflight)
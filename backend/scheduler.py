@@ -0,0 +1,255 @@
+import asyncio
+import calendar
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+import events
+import metrics
+from analytics import fold_rollups
+
+logger = logging.getLogger(__name__)
+
+# Off by default: once on, expire_pending cancels every pending request older than
+# PENDING_EXPIRY_DAYS, including ones still waiting for an admin. Run
+# migrations/postgres/0016 first so active subscriptions have a period end
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'false').lower() == 'true'
+SCHEDULER_POLL_SECONDS = int(os.environ.get('SCHEDULER_POLL_SECONDS', '30'))
+SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', '90'))
+SWEEP_BATCH_SIZE = int(os.environ.get('SWEEP_BATCH_SIZE', '200'))
+# Upper bound on batches per sweep so one run can't monopolize the worker
+SWEEP_MAX_BATCHES = int(os.environ.get('SWEEP_MAX_BATCHES', '50'))
+
+RENEWAL_REMINDER_DAYS = int(os.environ.get('RENEWAL_REMINDER_DAYS', '5'))
+PAYMENT_GRACE_DAYS = int(os.environ.get('PAYMENT_GRACE_DAYS', '3'))
+PENDING_EXPIRY_DAYS = int(os.environ.get('PENDING_EXPIRY_DAYS', '30'))
+
+LEASE_NAME = "subscription-scheduler"
+
+BILLING_CYCLE_MONTHS = {
+    "monthly": 1,
+    "quarterly": 3,
+    "semiannual": 6,
+    "annual": 12,
+    "yearly": 12,
+}
+
+sweep_duration = metrics.histogram(
+    "scheduler_sweep_duration_ms", "Duration of each scheduler job run"
+)
+sweep_rows = metrics.counter(
+    "scheduler_sweep_rows_total", "Subscriptions transitioned by scheduler jobs"
+)
+lifecycle_events = metrics.counter(
+    "subscription_lifecycle_events_total", "Subscription lifecycle events emitted"
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    month = value.month - 1 + months
+    year = value.year + month // 12
+    month = month % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def next_period_end(billing_cycle: str, start: datetime = None) -> datetime:
+    return add_months(start or _now(), BILLING_CYCLE_MONTHS.get(billing_cycle, 1))
+
+
+def emit_lifecycle(event: str, sub: dict, **extra):
+    lifecycle_events.inc(event=event)
+    events.emit(event, {**sub, **extra})
+
+
+# ============== JOBS ==============
+# Each job sweeps one partial index (see migrations/postgres/0003) in batches
+# ordered by due date; transitioned rows drop out of the index predicate,
+# so every batch starts from the front again.
+
+SWEEP_COLUMNS = "id, user_id, user_email, user_name, product_id, product_name, plan_name, billing_cycle, current_period_end"
+
+
+def _sweep(client, job: str, status: str, due_column: str, cutoff: datetime, update_fields, event: str, extra_filter=None):
+    total = 0
+    for _ in range(SWEEP_MAX_BATCHES):
+        query = client.table("subscriptions").select(SWEEP_COLUMNS + ", created_at").eq(
+            "status", status
+        ).lte(due_column, cutoff.isoformat())
+        if extra_filter:
+            query = extra_filter(query)
+        rows = query.order(due_column).limit(SWEEP_BATCH_SIZE).execute().data
+        if not rows:
+            break
+
+        # the update repeats the predicate: a row an admin enabled, cancelled or
+        # renewed since the select is left alone, and gets no event
+        update = client.table("subscriptions").update(update_fields()).in_("id", [r["id"] for r in rows]).eq(
+            "status", status
+        ).lte(due_column, cutoff.isoformat())
+        if extra_filter:
+            update = extra_filter(update)
+        updated = {r["id"] for r in update.execute().data}
+        for row in rows:
+            if row["id"] in updated:
+                emit_lifecycle(event, row, previous_status=status)
+        total += len(updated)
+        if len(rows) < SWEEP_BATCH_SIZE:
+            break
+
+    sweep_rows.inc(total, job=job)
+    return total
+
+
+def send_renewal_reminders(client):
+    return _sweep(
+        client, "renewal_reminders", "active", "current_period_end",
+        _now() + timedelta(days=RENEWAL_REMINDER_DAYS),
+        lambda: {"reminder_sent_at": _now().isoformat()},
+        "subscription.renewal_reminder",
+        extra_filter=lambda q: q.is_("reminder_sent_at", "null"),
+    )
+
+
+def suspend_overdue(client):
+    return _sweep(
+        client, "suspend_overdue", "active", "current_period_end",
+        _now() - timedelta(days=PAYMENT_GRACE_DAYS),
+        lambda: {"status": "suspended", "is_enabled": False},
+        "subscription.suspended",
+    )
+
+
+def expire_pending(client):
+    return _sweep(
+        client, "expire_pending", "pending", "created_at",
+        _now() - timedelta(days=PENDING_EXPIRY_DAYS),
+        lambda: {"status": "cancelled"},
+        "subscription.cancelled",
+    )
+
+
+# name -> (callable, interval seconds)
+JOBS = {
+    "renewal_reminders": (send_renewal_reminders, 3600),
+    "suspend_overdue": (suspend_overdue, 900),
+    "expire_pending": (expire_pending, 86400),
+    "analytics_rollup": (fold_rollups, 60),
+}
+
+
+class Scheduler:
+    """Runs JOBS from the scheduler_jobs table while holding the leader lease."""
+
+    def __init__(self, client, jobs=None):
+        self.client = client
+        self.jobs = dict(jobs or JOBS)
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._task = None
+
+    # ---- leader lease ----
+
+    def _acquire_lease(self) -> bool:
+        now = _now()
+        lease = {"holder": self.worker_id, "expires_at": (now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)).isoformat()}
+        table = lambda: self.client.table("scheduler_leases")
+
+        # renew our own lease, or take over one that expired
+        if table().update(lease).eq("name", LEASE_NAME).eq("holder", self.worker_id).execute().data:
+            return True
+        if table().update(lease).eq("name", LEASE_NAME).lt("expires_at", now.isoformat()).execute().data:
+            return True
+        try:
+            return bool(table().insert({"name": LEASE_NAME, **lease}).execute().data)
+        except Exception:
+            # another worker holds it (primary key conflict)
+            return False
+
+    def _release_lease(self):
+        self.client.table("scheduler_leases").delete().eq("name", LEASE_NAME).eq(
+            "holder", self.worker_id
+        ).execute()
+
+    # ---- job table ----
+
+    def _register_jobs(self):
+        now = _now().isoformat()
+        rows = [
+            {"name": name, "interval_seconds": interval, "next_run_at": now}
+            for name, (_fn, interval) in self.jobs.items()
+        ]
+        # keep next_run_at of jobs that already exist so restarts don't re-run them
+        self.client.table("scheduler_jobs").upsert(rows, on_conflict="name", ignore_duplicates=True).execute()
+
+    def _run_due_jobs(self):
+        now = _now()
+        due = self.client.table("scheduler_jobs").select("name, interval_seconds").lte(
+            "next_run_at", now.isoformat()
+        ).execute().data
+        for job in due:
+            entry = self.jobs.get(job["name"])
+            if not entry:
+                continue
+            fn, _interval = entry
+            started = time.perf_counter()
+            status, error, processed = "ok", None, 0
+            try:
+                processed = fn(self.client)
+            except Exception as e:
+                status, error = "error", str(e)[:500]
+                logger.error(f"Scheduler job {job['name']} failed: {e}")
+            duration_ms = (time.perf_counter() - started) * 1000
+            sweep_duration.observe(duration_ms, job=job["name"])
+
+            self.client.table("scheduler_jobs").update({
+                "next_run_at": (now + timedelta(seconds=job["interval_seconds"])).isoformat(),
+                "last_run_at": now.isoformat(),
+                "last_status": status,
+                "last_error": error,
+                "last_duration_ms": round(duration_ms, 2),
+                "last_processed": processed,
+            }).eq("name", job["name"]).execute()
+
+    def tick(self):
+        self.is_leader = self._acquire_lease()
+        if self.is_leader:
+            self._run_due_jobs()
+
+    # ---- asyncio integration ----
+
+    async def _loop(self):
+        registered = False
+        while True:
+            try:
+                if not registered:
+                    await asyncio.to_thread(self._register_jobs)
+                    registered = True
+                await asyncio.to_thread(self.tick)
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            await asyncio.sleep(SCHEDULER_POLL_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+            logger.info(f"Scheduler started as {self.worker_id}")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.is_leader:
+            await asyncio.to_thread(self._release_lease)
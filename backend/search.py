@@ -0,0 +1,347 @@
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from db import DATA_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# "postgres" uses the admin_search() function (migrations/postgres/0002),
+# "memory" keeps a local inverted index (dev / local stand-in, and the
+# default on SQLite, which has no admin_search()).
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'memory' if DATA_BACKEND == 'sqlite' else 'postgres').lower()
+if SEARCH_BACKEND == "postgres" and DATA_BACKEND == "sqlite":
+    raise ValueError("SEARCH_BACKEND=postgres necesita admin_search(), que no existe en SQLite; use SEARCH_BACKEND=memory")
+
+SEARCH_KINDS = ("message", "user", "company")
+
+# PostgREST caps responses at 1000 rows, so bulk loads go page by page
+LOAD_PAGE_SIZE = 1000
+
+# kind -> (table, [(field, weight)], title field, subtitle fields, snippet field)
+_SCHEMA = {
+    "message": (
+        "contact_messages",
+        [("name", 3), ("email", 3), ("company", 2), ("product_interest", 2), ("message", 1)],
+        "name", ("email",), "message",
+    ),
+    "user": (
+        "users",
+        [("name", 3), ("email", 3), ("company_name", 2)],
+        "name", ("email",), "company_name",
+    ),
+    "company": (
+        "companies",
+        [("name", 3), ("ruc", 3), ("email", 3)],
+        "name", ("ruc", "email"), "address",
+    ),
+}
+
+SNIPPET_LENGTH = 160
+
+# Workers refresh their in-memory indexes at least this often so they pick
+# up rows written through other workers.
+USER_INDEX_MAX_AGE = int(os.environ.get('USER_INDEX_MAX_AGE', '300'))
+SEARCH_INDEX_MAX_AGE = int(os.environ.get('SEARCH_INDEX_MAX_AGE', '300'))
+USER_LOOKUP_COLUMNS = "id, email, name, company_name, phone, role, is_active"
+# Each prefix scan stops after this many index keys
+LOOKUP_SCAN_LIMIT = 500
+
+
+def normalize(text) -> str:
+    """Lowercase, strip accents and turn punctuation into spaces."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(
+        ch if ch.isalnum() or ch in "@." else " "
+        for ch in text if not unicodedata.combining(ch)
+    )
+
+
+def tokenize(text) -> list:
+    return _split_tokens(normalize(text))
+
+
+def _split_tokens(normalized: str) -> list:
+    tokens = []
+    for raw in normalized.split():
+        tokens.append(raw)
+        # index the pieces of emails / dotted names too
+        if "@" in raw or "." in raw:
+            tokens.extend(p for p in raw.replace("@", " ").replace(".", " ").split() if p)
+    return tokens
+
+
+def trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """In-memory token + trigram index over messages, users and companies."""
+
+    def __init__(self, max_age: int = SEARCH_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._docs = {}
+        self._tokens = defaultdict(set)
+        self._trigrams = defaultdict(set)
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def reload(self, client):
+        fresh = SearchIndex(self.max_age)
+        for kind, (table, *_rest) in _SCHEMA.items():
+            start = 0
+            while True:
+                rows = client.table(table).select("*").range(
+                    start, start + LOAD_PAGE_SIZE - 1
+                ).execute().data
+                for row in rows:
+                    fresh._add(kind, row)
+                if len(rows) < LOAD_PAGE_SIZE:
+                    break
+                start += LOAD_PAGE_SIZE
+        with self._lock:
+            self._docs, self._tokens, self._trigrams = fresh._docs, fresh._tokens, fresh._trigrams
+            self.loaded_at = time.monotonic()
+        logger.info(f"Search index loaded: {len(fresh._docs)} documents")
+
+    def load(self, client):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age:
+            self.reload(client)
+
+    def upsert(self, kind: str, row: dict):
+        # Before the first load the rows will be picked up by load() anyway
+        with self._lock:
+            if self.loaded_at is None:
+                return
+            self._remove(kind, row["id"])
+            self._add(kind, row)
+
+    def _add(self, kind: str, row: dict):
+        _table, fields, title, subtitles, snippet = _SCHEMA[kind]
+        key = (kind, str(row["id"]))
+        field_tokens = []
+        for field, weight in fields:
+            toks = set(tokenize(row.get(field)))
+            field_tokens.append((toks, normalize(row.get(field)), weight))
+            for tok in toks:
+                self._tokens[tok].add(key)
+                for tri in trigrams(tok):
+                    self._trigrams[tri].add(key)
+        subtitle = next((row.get(f) for f in subtitles if row.get(f)), None)
+        self._docs[key] = {
+            "fields": field_tokens,
+            "hit": {
+                "kind": kind,
+                "id": str(row["id"]),
+                "title": row.get(title) or "",
+                "subtitle": subtitle,
+                "snippet": (row.get(snippet) or "")[:SNIPPET_LENGTH] or None,
+                "created_at": row.get("created_at"),
+            },
+        }
+
+    def _remove(self, kind: str, doc_id):
+        key = (kind, str(doc_id))
+        doc = self._docs.pop(key, None)
+        if not doc:
+            return
+        for toks, _text, _weight in doc["fields"]:
+            for tok in toks:
+                self._tokens[tok].discard(key)
+                for tri in trigrams(tok):
+                    self._trigrams[tri].discard(key)
+
+    def _candidates(self, term: str) -> set:
+        exact = self._tokens.get(term, set())
+        if len(term) < 3:
+            # Short terms: prefix match through the padded leading trigram
+            return self._trigrams.get(f"  {term}"[-3:], set()) | exact
+        # Substring candidates: documents containing every inner trigram of the term
+        inner = {term[i:i + 3] for i in range(len(term) - 2)}
+        grams = sorted((self._trigrams.get(t, set()) for t in inner), key=len)
+        found = set(grams[0])
+        for g in grams[1:]:
+            found &= g
+            if not found:
+                break
+        return found | exact
+
+    def search(self, query: str, kinds=SEARCH_KINDS, limit: int = 20, offset: int = 0):
+        terms = list(dict.fromkeys(normalize(query).split()))
+        if not terms:
+            return 0, []
+        with self._lock:
+            candidates = None
+            for term in terms:
+                found = self._candidates(term)
+                candidates = found if candidates is None else candidates & found
+                if not candidates:
+                    return 0, []
+            scored = []
+            for key in candidates:
+                if key[0] not in kinds:
+                    continue
+                doc = self._docs[key]
+                score = 0
+                for term in terms:
+                    best = 0
+                    for toks, text, weight in doc["fields"]:
+                        if term in toks:
+                            best = max(best, weight * 2)
+                        elif term in text:
+                            best = max(best, weight)
+                    if not best:
+                        break
+                    score += best
+                else:
+                    scored.append((score, str(doc["hit"]["created_at"] or ""), doc["hit"]))
+        scored.sort(key=lambda s: (s[0], s[1]), reverse=True)
+        page = [{**hit, "score": float(score)} for score, _ts, hit in scored[offset:offset + limit]]
+        return len(scored), page
+
+
+search_index = SearchIndex()
+
+
+def run_search(client, query: str, kinds=SEARCH_KINDS, limit: int = 20, offset: int = 0):
+    """Return (total, hits) from the configured search backend."""
+    if SEARCH_BACKEND == "memory":
+        search_index.load(client)
+        return search_index.search(query, kinds, limit, offset)
+
+    rows = client.rpc("admin_search", {
+        "q": query,
+        "kinds": list(kinds),
+        "lim": limit,
+        "off": offset,
+    }).execute().data or []
+    total = rows[0]["total"] if rows else 0
+    return total, [{k: v for k, v in r.items() if k != "total"} for r in rows]
+
+
+def index_row(kind: str, row: dict):
+    if kind == "user":
+        user_lookup.upsert(row)
+    if SEARCH_BACKEND == "memory":
+        search_index.upsert(kind, row)
+
+
+class UserLookupIndex:
+    """Sorted prefix lists for lookups of the admin user picker.
+
+    `_heads` holds each user's email and full name, the matches that rank
+    first, and `_keys` every token. Both are (text, user_id) pairs scanned
+    for at most LOOKUP_SCAN_LIMIT keys, so a short query costs no more than a
+    long one.
+    """
+
+    def __init__(self, max_age: int = USER_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._keys = []
+        self._heads = []
+        self._users = {}
+        self.loaded_at = None
+
+    def _entry(self, user: dict):
+        """(row, tokens, blob, heads, (email, name)), normalized once here for every lookup."""
+        name, email, company = (normalize(user.get(f)) for f in ("name", "email", "company_name"))
+        tokens = {email, name.strip()}
+        for text in (name, company, email):
+            tokens.update(_split_tokens(text))
+        tokens.discard("")
+        row = {k: user.get(k) for k in USER_LOOKUP_COLUMNS.split(", ")}
+        name = name.strip()
+        return row, tokens, " ".join((name, email, company)), {email, name} - {""}, (email, name)
+
+    def reload(self, client):
+        users = {}
+        start = 0
+        while True:
+            rows = client.table("users").select(USER_LOOKUP_COLUMNS).range(
+                start, start + LOAD_PAGE_SIZE - 1
+            ).execute().data
+            for row in rows:
+                users[str(row["id"])] = self._entry(row)
+            if len(rows) < LOAD_PAGE_SIZE:
+                break
+            start += LOAD_PAGE_SIZE
+        keys = sorted((tok, uid) for uid, entry in users.items() for tok in entry[1])
+        heads = sorted((head, uid) for uid, entry in users.items() for head in entry[3])
+        with self._lock:
+            self._users, self._keys, self._heads = users, keys, heads
+            self.loaded_at = time.monotonic()
+
+    def _ensure_loaded(self, client):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age:
+            self.reload(client)
+
+    @staticmethod
+    def _remove(keys: list, key: tuple):
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def upsert(self, user: dict):
+        with self._lock:
+            if self.loaded_at is None:
+                return
+            uid = str(user["id"])
+            old = self._users.get(uid)
+            if old:
+                # partial updates (e.g. is_active) keep the other fields
+                user = {**old[0], **user}
+                for tok in old[1]:
+                    self._remove(self._keys, (tok, uid))
+                for head in old[3]:
+                    self._remove(self._heads, (head, uid))
+            entry = self._entry(user)
+            self._users[uid] = entry
+            for tok in entry[1]:
+                bisect.insort(self._keys, (tok, uid))
+            for head in entry[3]:
+                bisect.insort(self._heads, (head, uid))
+
+    def lookup(self, client, query: str, limit: int = 10, role: str = None):
+        q = normalize(query).strip()
+        terms = q.split()
+        if not terms:
+            return []
+        self._ensure_loaded(client)
+        rest = terms[1:]
+        found = {}
+
+        def scan(keys: list, prefix: str):
+            i = bisect.bisect_left(keys, (prefix,))
+            end = min(len(keys), i + LOOKUP_SCAN_LIMIT)
+            while i < end and keys[i][0].startswith(prefix):
+                uid = keys[i][1]
+                i += 1
+                if uid in found:
+                    continue
+                user, _toks, blob, _heads, (email, name) = self._users[uid]
+                if (role is None or user.get("role") == role) and all(t in blob for t in rest):
+                    tier = 0 if email.startswith(q) else 1 if name.startswith(q) else 2
+                    found[uid] = (tier, name, uid), user
+
+        with self._lock:
+            # Emails and names starting with the query outrank any other token
+            # match, so their own range is scanned first
+            scan(self._heads, q)
+            if len(found) < limit:
+                scan(self._keys, terms[0])
+        return [user for _rank, user in heapq.nsmallest(limit, found.values(), key=lambda c: c[0])]
+
+
+user_lookup = UserLookupIndex()
@@ -0,0 +1,391 @@
+"""Deterministic, production-sized dataset for scale testing.
+
+    python seed.py --users 1000000                  # dialect from DATA_BACKEND
+    python seed.py --users 200000 --seed 7 --today 2026-06-01
+    python seed.py --purge
+
+The same --seed, --users, --messages and --today always produce the same
+rows, ids included, so a slow query found on one machine reproduces on
+another. Dates are laid out relative to --today (default: the current UTC
+date), so active subscriptions are still inside their billing period.
+
+- Signups grow over --years, more of them recent.
+- About 60% of users own a company, and a few own several.
+- Subscriptions cover every PRODUCTS plan, weighted toward the first
+  products and the plan marked popular. Most are active; the rest are
+  pending, suspended or cancelled. Each user has at most one open
+  subscription per product.
+- A third of the contact messages come from seeded users. The rest come from
+  prospects, some of whom write more than once.
+
+Rows go straight into the database migrate.py uses (DATABASE_URL or
+SQLITE_PATH), which must be migrated first. Postgres loads with COPY and
+SQLite with batched executemany, one transaction per batch. Every seeded
+email ends in @seed.example.com, which is what --purge deletes by, and
+every seeded user logs in with the password seed-password.
+
+Afterwards:
+- `python analytics.py rebuild` backfills the analytics from the seeded
+  subscriptions.
+- Contact messages are left unprocessed, so with LEADS_ENABLED the lead
+  pipeline works through them on the next start.
+- With DATA_SHARDS, every row lands in the one database being seeded.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import bcrypt
+
+from migrate import connect, load_migrations, pending
+from scheduler import BILLING_CYCLE_MONTHS, RENEWAL_REMINDER_DAYS, add_months
+
+# example.com never receives mail, and unlike .test it passes the API's email validation
+SEED_DOMAIN = "seed.example.com"
+SEED_PASSWORD = "seed-password"
+# a fixed salt keeps the hash, like every other column, identical across runs
+SEED_SALT = b"$2b$12$SeedBillenniumScaleTeu"
+SEED_ADMIN = "facturacion@billenniumsystem.com"
+# users sign up at a rate growing with time: the first i of n by (i / n) ** (1 / GROWTH) of the span
+GROWTH = 2.0
+
+USER_COLUMNS = ("id", "email", "name", "company_name", "phone", "password_hash", "role", "is_active", "created_at")
+COMPANY_COLUMNS = (
+    "id", "name", "ruc", "email", "phone", "address", "owner_id", "enabled_products", "is_active", "created_at",
+)
+SUBSCRIPTION_COLUMNS = (
+    "id", "user_id", "user_email", "user_name", "company_name", "product_id", "product_name", "plan_name",
+    "billing_cycle", "is_enabled", "status", "created_at", "enabled_at", "enabled_by", "current_period_end",
+    "reminder_sent_at",
+)
+MESSAGE_COLUMNS = ("id", "name", "email", "phone", "company", "message", "product_interest", "is_read", "created_at")
+# load order: rows are only written after the rows they reference
+TABLES = (
+    ("users", USER_COLUMNS), ("companies", COMPANY_COLUMNS),
+    ("subscriptions", SUBSCRIPTION_COLUMNS), ("contact_messages", MESSAGE_COLUMNS),
+)
+
+COMPANIES_PER_USER = ((0, 42), (1, 45), (2, 9), (3, 3), (4, 1))
+SUBSCRIPTIONS_PER_USER = ((0, 35), (1, 40), (2, 17), (3, 6), (4, 2))
+STATUSES = (("active", 62), ("pending", 8), ("suspended", 10), ("cancelled", 20))
+BILLING_CYCLES = (("monthly", 60), ("quarterly", 10), ("semiannual", 10), ("annual", 20))
+
+FIRST_NAMES = (
+    "María", "José", "Luis", "Ana", "Carlos", "Gabriela", "Jorge", "Daniela", "Andrés", "Paola", "Diego",
+    "Verónica", "Fernando", "Carolina", "Javier", "Mónica", "Santiago", "Lorena", "Pablo", "Cristina", "Miguel",
+    "Alejandra", "Ricardo", "Fernanda", "Esteban", "Valeria", "Marco", "Patricia", "Sebastián", "Silvia",
+)
+LAST_NAMES = (
+    "Andrade", "Zambrano", "Vera", "Mendoza", "Torres", "Cedeño", "Morales", "Ortiz", "Salazar", "Castro",
+    "Vásquez", "Guerrero", "Paredes", "Flores", "Jaramillo", "Chávez", "Moreira", "Ramírez", "Villacís",
+    "Espinoza", "Carrión", "Benítez", "Ruiz", "Cevallos", "Naranjo", "Aguirre", "Proaño", "León", "Pazmiño",
+)
+COMPANY_KINDS = (
+    "Comercial", "Distribuidora", "Importadora", "Restaurante", "Ferretería", "Farmacia", "Servicios",
+    "Constructora", "Agroindustrial", "Textiles", "Tecnología", "Transportes",
+)
+COMPANY_SUFFIXES = ("S.A.", "Cía. Ltda.", "S.A.S.", "")
+CITIES = ("Quito", "Guayaquil", "Cuenca", "Manta", "Ambato", "Loja", "Machala", "Portoviejo", "Ibarra", "Riobamba")
+STREETS = ("Amazonas", "10 de Agosto", "6 de Diciembre", "9 de Octubre", "Bolívar", "Sucre", "Olmedo", "Colón")
+MESSAGES = (
+    "Quisiera una demostración de {product} para mi empresa.",
+    "¿Cuál es el precio de {product} para varios locales?",
+    "Necesito facturación electrónica, ¿{product} la incluye?",
+    "Me interesa {product}. ¿Pueden llamarme esta semana?",
+    "¿Tienen descuento por pago anual de {product}?",
+    "Buenos días, solicito información de {product}.",
+)
+
+
+def _mix(i: int, salt: int) -> int:
+    # stateless per-index choice, so a message can name user i without storing it
+    return ((i + 1) * 2654435761 + salt * 40503) % 4294967296
+
+
+def user_name(i: int) -> str:
+    return f"{FIRST_NAMES[_mix(i, 1) % len(FIRST_NAMES)]} {LAST_NAMES[_mix(i, 2) % len(LAST_NAMES)]}"
+
+
+def user_email(i: int) -> str:
+    return f"user{i:07d}@{SEED_DOMAIN}"
+
+
+def _weighted(table: tuple):
+    values, weights = zip(*table)
+    return list(values), list(weights)
+
+
+class SeedGenerator:
+    def __init__(self, seed: int, users: int, messages: int, today: date, years: float, products: list):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.messages = messages
+        self.now = datetime(today.year, today.month, today.day, 12, tzinfo=timezone.utc)
+        self.start = self.now - timedelta(days=365 * years)
+        self.span = (self.now - self.start).total_seconds()
+        # a subscription names a plan, so products without one are never sold
+        self.products = [p for p in products if p.get("plans")]
+        # the first products sell most
+        self.product_weights = [1 / (rank + 1) for rank in range(len(self.products))]
+        self.plan_weights = [
+            [3 if plan.get("popular") else 1.5 if j == 0 else 1 for j, plan in enumerate(p["plans"])]
+            for p in self.products
+        ]
+        self.password_hash = bcrypt.hashpw(SEED_PASSWORD.encode("utf-8"), SEED_SALT).decode("utf-8")
+        self.companies_per_user = _weighted(COMPANIES_PER_USER)
+        self.subscriptions_per_user = _weighted(SUBSCRIPTIONS_PER_USER)
+        self.statuses = _weighted(STATUSES)
+        self.cycles = _weighted(tuple((c, w) for c, w in BILLING_CYCLES if c in BILLING_CYCLE_MONTHS))
+
+    def _id(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _choice(self, weighted):
+        return self.rng.choices(weighted[0], weighted[1])[0]
+
+    def _between(self, start: datetime, end: datetime) -> datetime:
+        if end <= start:
+            return start
+        return start + timedelta(seconds=self.rng.uniform(0, (end - start).total_seconds()))
+
+    def signed_up(self, i: int) -> datetime:
+        return self.start + timedelta(seconds=self.span * ((i + 0.5) / self.users) ** (1 / GROWTH))
+
+    def _phone(self) -> str:
+        return f"09{self.rng.randrange(10 ** 8):08d}"
+
+    def user(self, i: int) -> dict:
+        """One user with the companies and subscriptions they own: {table: rows}."""
+        created = self.signed_up(i)
+        user_id, name, email = self._id(), user_name(i), user_email(i)
+        subscriptions = self._subscriptions(user_id, name, email, created)
+        enabled = sorted({s["product_id"] for s in subscriptions if s["status"] == "active"})
+        companies = [
+            self._company(user_id, email, created, enabled)
+            for _ in range(self._choice(self.companies_per_user))
+        ]
+        company_name = companies[0]["name"] if companies else None
+        for sub in subscriptions:
+            sub["company_name"] = company_name
+        user = {
+            "id": user_id, "email": email, "name": name, "company_name": company_name,
+            "phone": self._phone() if self.rng.random() < 0.7 else None, "password_hash": self.password_hash,
+            "role": "user", "is_active": self.rng.random() < 0.97, "created_at": created.isoformat(),
+        }
+        return {"users": [user], "companies": companies, "subscriptions": subscriptions}
+
+    def _company(self, owner_id: str, email: str, user_created: datetime, enabled: list) -> dict:
+        rng = self.rng
+        name = f"{rng.choice(COMPANY_KINDS)} {rng.choice(LAST_NAMES)} {rng.choice(COMPANY_SUFFIXES)}".strip()
+        return {
+            "id": self._id(), "name": name,
+            "ruc": f"{rng.randrange(1, 25):02d}{rng.randrange(10 ** 8):08d}001" if rng.random() < 0.9 else None,
+            "email": email, "phone": self._phone() if rng.random() < 0.8 else None,
+            "address": f"Av. {rng.choice(STREETS)} N{rng.randrange(1, 80)}-{rng.randrange(1, 300)}, {rng.choice(CITIES)}",
+            "owner_id": owner_id, "enabled_products": enabled, "is_active": rng.random() < 0.95,
+            "created_at": self._between(user_created, user_created + timedelta(days=30)).isoformat(),
+        }
+
+    def _subscriptions(self, user_id: str, name: str, email: str, user_created: datetime) -> list:
+        count = min(self._choice(self.subscriptions_per_user), len(self.products))
+        chosen = []
+        # distinct products, so the open (user_id, product_id) index holds
+        while len(chosen) < count:
+            index = self.rng.choices(range(len(self.products)), self.product_weights)[0]
+            if index not in chosen:
+                chosen.append(index)
+        return [self._subscription(user_id, name, email, user_created, index) for index in chosen]
+
+    def _subscription(self, user_id: str, name: str, email: str, user_created: datetime, index: int) -> dict:
+        product = self.products[index]
+        plan = self.rng.choices(product["plans"], self.plan_weights[index])[0]
+        status = self._choice(self.statuses)
+        cycle = self._choice(self.cycles)
+        sub = {
+            "id": self._id(), "user_id": user_id, "user_email": email, "user_name": name, "company_name": None,
+            "product_id": product["id"], "product_name": product["name"], "plan_name": plan["name"],
+            "billing_cycle": cycle, "is_enabled": status == "active", "status": status,
+            "enabled_at": None, "enabled_by": None, "current_period_end": None, "reminder_sent_at": None,
+        }
+        if status == "pending":
+            # the scheduler expires pending requests after a few weeks
+            created = self._between(max(user_created, self.now - timedelta(days=25)), self.now)
+            sub["created_at"] = created.isoformat()
+            return sub
+        created = self._between(user_created, self.now - timedelta(days=1))
+        enabled_at = self._between(created, min(created + timedelta(days=3), self.now))
+        sub.update(created_at=created.isoformat(), enabled_at=enabled_at.isoformat(), enabled_by=SEED_ADMIN)
+        end = self._period_end(enabled_at, BILLING_CYCLE_MONTHS[cycle])
+        if status == "active":
+            sub["current_period_end"] = end.isoformat()
+            if end <= self.now + timedelta(days=RENEWAL_REMINDER_DAYS):
+                # already reminded, or the first scheduler run mails every seeded user at once
+                sub["reminder_sent_at"] = (self.now - timedelta(days=1)).isoformat()
+        else:
+            # lapsed: the period that ended before now
+            previous = add_months(end, -BILLING_CYCLE_MONTHS[cycle])
+            sub["current_period_end"] = max(previous, enabled_at).isoformat()
+        return sub
+
+    def _period_end(self, enabled_at: datetime, months: int) -> datetime:
+        """First end of a billing period after now, for a subscription renewed since enabled_at."""
+        elapsed = (self.now.year - enabled_at.year) * 12 + self.now.month - enabled_at.month
+        end = add_months(enabled_at, max(0, elapsed // months) * months)
+        while end <= self.now:
+            end = add_months(end, months)
+        return end
+
+    def message(self, i: int) -> dict:
+        rng = self.rng
+        product = rng.choices(self.products, self.product_weights)[0]
+        if rng.random() < 1 / 3:
+            j = rng.randrange(self.users)
+            name, email = user_name(j), user_email(j)
+            created = self._between(self.signed_up(j), self.now)
+        else:
+            # a prospect pool smaller than the message count: some write again
+            j = rng.randrange(max(1, self.messages * 4 // 5))
+            name, email = user_name(self.users + j), f"prospecto{j:07d}@{SEED_DOMAIN}"
+            created = self.start + timedelta(seconds=self.span * rng.random() ** (1 / GROWTH))
+        age = self.now - created
+        return {
+            "id": self._id(), "name": name, "email": email,
+            "phone": self._phone() if rng.random() < 0.6 else None,
+            "company": f"{rng.choice(COMPANY_KINDS)} {name.split()[-1]}" if rng.random() < 0.5 else None,
+            "message": rng.choice(MESSAGES).format(product=product["name"]),
+            "product_interest": product["name"] if rng.random() < 0.8 else None,
+            "is_read": rng.random() < (0.85 if age > timedelta(days=7) else 0.3),
+            "created_at": created.isoformat(),
+        }
+
+
+# ============== WRITERS ==============
+
+class SQLiteWriter:
+    def __init__(self, conn):
+        self.conn = conn
+        # a rebuildable test dataset does not need every batch on disk before the next
+        self.conn.execute("PRAGMA synchronous=OFF")
+
+    def write(self, table: str, columns: tuple, rows: list):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        values = [tuple(json.dumps(row[c]) if isinstance(row[c], list) else row[c] for c in columns) for row in rows]
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(sql, values)
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def execute(self, sql: str):
+        return self.conn.execute(sql)
+
+
+class PostgresWriter:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def write(self, table: str, columns: tuple, rows: list):
+        with self.conn.transaction():
+            with self.conn.cursor() as cursor:
+                with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(tuple(row[c] for c in columns))
+
+    def execute(self, sql: str):
+        return self.conn.execute(sql)
+
+
+def seeded(writer) -> bool:
+    return writer.execute(f"SELECT 1 FROM users WHERE email LIKE '%@{SEED_DOMAIN}' LIMIT 1").fetchone() is not None
+
+
+def purge(writer):
+    seeded_companies = f"SELECT id FROM companies WHERE email LIKE '%@{SEED_DOMAIN}'"
+    seeded_subscriptions = f"SELECT id FROM subscriptions WHERE user_email LIKE '%@{SEED_DOMAIN}'"
+    for sql in (
+        f"DELETE FROM sync_chunks WHERE company_id IN ({seeded_companies})",
+        f"DELETE FROM sync_records WHERE company_id IN ({seeded_companies})",
+        f"DELETE FROM subscription_events WHERE subscription_id IN ({seeded_subscriptions})",
+        f"DELETE FROM subscriptions WHERE user_email LIKE '%@{SEED_DOMAIN}'",
+        f"DELETE FROM companies WHERE email LIKE '%@{SEED_DOMAIN}'",
+        f"DELETE FROM contact_messages WHERE email LIKE '%@{SEED_DOMAIN}'",
+        f"DELETE FROM users WHERE email LIKE '%@{SEED_DOMAIN}'",
+    ):
+        writer.execute(sql)
+
+
+def load(writer, generator: SeedGenerator, batch: int):
+    buffers = {table: [] for table, _columns in TABLES}
+    written = {table: 0 for table, _columns in TABLES}
+    started = time.perf_counter()
+
+    def flush():
+        for table, columns in TABLES:
+            if buffers[table]:
+                writer.write(table, columns, buffers[table])
+                written[table] += len(buffers[table])
+                buffers[table] = []
+
+    def progress():
+        rate = sum(written.values()) / max(time.perf_counter() - started, 1e-9)
+        print("  " + ", ".join(f"{table} {count}" for table, count in written.items()) + f"  ({rate:,.0f} filas/s)")
+
+    for i in range(generator.users):
+        for table, rows in generator.user(i).items():
+            buffers[table].extend(rows)
+        if len(buffers["users"]) >= batch:
+            flush()
+            if (i + 1) % (batch * 20) == 0:
+                progress()
+    for i in range(generator.messages):
+        buffers["contact_messages"].append(generator.message(i))
+        if len(buffers["contact_messages"]) >= batch:
+            flush()
+    flush()
+    progress()
+
+
+def main():
+    from pathlib import Path
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+    from db import DATA_BACKEND
+
+    parser = argparse.ArgumentParser(description="Datos sintéticos deterministas para pruebas de escala")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--messages", type=int, help="por defecto, un tercio de --users")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, default=datetime.now(timezone.utc).date())
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--purge", action="store_true", help="borra los datos sembrados y termina")
+    parser.add_argument("--dialect", choices=["postgres", "sqlite"],
+                        default="sqlite" if DATA_BACKEND == "sqlite" else "postgres")
+    args = parser.parse_args()
+    from products import PRODUCTS
+
+    migrator = connect(args.dialect)
+    if pending(migrator, load_migrations(args.dialect)):
+        raise SystemExit("Hay migraciones pendientes: corra python migrate.py up primero")
+    writer = SQLiteWriter(migrator.conn) if args.dialect == "sqlite" else PostgresWriter(migrator.conn)
+    if args.purge:
+        purge(writer)
+        print("Datos sembrados borrados; corra python analytics.py rebuild si usa la analítica")
+        return
+    if seeded(writer):
+        raise SystemExit("Ya hay datos sembrados: use --purge antes de sembrar otra vez")
+
+    messages = args.users // 3 if args.messages is None else args.messages
+    generator = SeedGenerator(args.seed, args.users, messages, args.today, args.years, PRODUCTS)
+    print(f"dialect={args.dialect} users={args.users} messages={messages} seed={args.seed} today={args.today}")
+    load(writer, generator, args.batch)
+    print(f"Contraseña de los usuarios sembrados: {SEED_PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Production entry point: uvicorn with the fastest available event loop and HTTP parser.
+
+    python serve.py                      # PORT, WEB_CONCURRENCY, ... from the environment
+
+uvloop and httptools come with uvicorn[standard]; without them it falls back
+to asyncio and h11. Uvicorn only speaks HTTP/1.1, so HTTP/2 (and brotli to
+browsers) is negotiated by the platform's edge proxy, which keeps pooled
+HTTP/1.1 connections to this process. KEEP_ALIVE_TIMEOUT must stay above the
+proxy's idle timeout, otherwise the proxy reuses sockets uvicorn already closed
+and clients see sporadic 502s.
+
+request.client and the scheme come from X-Forwarded-For/-Proto only when the
+peer is in FORWARDED_ALLOW_IPS; anyone else could spoof them. The Railway
+config trusts every peer because the service is only reachable through
+Railway's edge; elsewhere list the proxy's addresses.
+"""
+import importlib.util
+import os
+
+import uvicorn
+
+SERVER_LOOP = os.environ.get('SERVER_LOOP', 'auto').lower()
+SERVER_HTTP = os.environ.get('SERVER_HTTP', 'auto').lower()
+KEEP_ALIVE_TIMEOUT = int(os.environ.get('KEEP_ALIVE_TIMEOUT', '75'))
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+BACKLOG = int(os.environ.get('BACKLOG', '2048'))
+# bounds memory under a burst; uvicorn answers 503 beyond this
+LIMIT_CONCURRENCY = int(os.environ.get('LIMIT_CONCURRENCY', '0')) or None
+FORWARDED_ALLOW_IPS = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def server_options() -> dict:
+    loop = SERVER_LOOP if SERVER_LOOP != 'auto' else ('uvloop' if _installed('uvloop') else 'asyncio')
+    http = SERVER_HTTP if SERVER_HTTP != 'auto' else ('httptools' if _installed('httptools') else 'h11')
+    return {
+        "host": os.environ.get('HOST', '0.0.0.0'),
+        "port": int(os.environ.get('PORT', '8000')),
+        "loop": loop,
+        "http": http,
+        "workers": WEB_CONCURRENCY,
+        "timeout_keep_alive": KEEP_ALIVE_TIMEOUT,
+        "backlog": BACKLOG,
+        "limit_concurrency": LIMIT_CONCURRENCY,
+        "proxy_headers": True,
+        "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+        "server_header": False,
+        "access_log": os.environ.get('ACCESS_LOG', 'true').lower() == 'true',
+    }
+
+
+def main():
+    options = server_options()
+    print(f"serve: loop={options['loop']} http={options['http']} workers={options['workers']} "
+          f"keep-alive={options['timeout_keep_alive']}s")
+    uvicorn.run("server:app", **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,76 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from dotenv import load_dotenv
-from starlette.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 import uuid
+import re
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
-from supabase import create_client, Client
+from dotenv import load_dotenv
 
 ROOT_DIR = Path(__file__).parent
+# Loaded before the local modules below, which read their settings at import
 load_dotenv(ROOT_DIR / '.env')
 
-# ============== SUPABASE CLIENT ==============
-SUPABASE_URL = os.environ['SUPABASE_URL']
-SUPABASE_KEY = os.environ['SUPABASE_KEY']
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# JWT Configuration
-JWT_SECRET = os.environ.get('JWT_SECRET', 'billennium-secret-key-2024-ecuador')
-JWT_ALGORITHM = "HS256"
+from db import DATA_BACKEND, create_data_client, is_unique_violation
+from search import SEARCH_KINDS, run_search, index_row, user_lookup
+import metrics
+from scheduler import SCHEDULER_ENABLED, Scheduler, emit_lifecycle, next_period_end
+import events
+from notifications import NOTIFICATIONS_ENABLED, NotificationDispatcher, register_listeners
+from leads import LEADS_ENABLED, LeadPipeline, LeadSummary
+import analytics
+from analytics import AnalyticsRecorder
+from audit import create_audit_log, diff
+from idempotency import IdempotencyMiddleware, create_store
+from ratelimit import RateLimited, client_ip, contact_guard, login_guard, register_guard
+from tenancy import TenantMiddleware
+from compression import CompressionMiddleware
+from cors import CORSLayer
+from sync import (
+    SYNC_MAX_COMPRESSED_BYTES, QueueResult, SyncPayloadError, SyncResult, apply_batch, apply_queue, decode_body,
+    parse_queue, parse_records,
+)
+from snapshots import SnapshotManifest, SnapshotStore
+import fieldsets
+import profiling
+import streaming
+import resilience
+from resilience import DataUnavailable, LoadShedMiddleware, ReadCache
+from streaming import ADMIN_STREAMING
+from profiling import PROFILING_ENABLED, ProfilingMiddleware
+from fieldsets import FieldsetError, Relation, Resource
+from tokens import create_token_service
+from products import PRODUCTS
+
+# ============== DATA CLIENT ==============
+# Supabase by default; DATA_BACKEND=sqlite swaps in the embedded client, which
+# implements the same query-builder calls used below. Every call goes through the
+# circuit breaker and timeouts in resilience.py; PROFILING_ENABLED also wraps it
+# to time each call into the request profile
+supabase = profiling.instrument(resilience.guard(create_data_client(), DATA_BACKEND))
+
+# Last good results of the main read endpoints, served stale while the data layer is down
+read_cache = ReadCache()
+
+# Admin audit trail, buffered in memory and flushed by a background task
+audit_log = create_audit_log(supabase)
+
+# Offline snapshots of the sync records, chunked and cached per company
+snapshot_store = SnapshotStore(supabase)
+
+# JWT Configuration: HS256 with JWT_SECRET, or rotating EdDSA/ES256 keys from JWT_KEYS_DIR
+token_service = create_token_service()
 JWT_EXPIRATION_HOURS = 24
 
 # Create the main app
@@ -111,6 +158,10 @@ class ContactMessage(BaseModel):
     product_interest: Optional[str] = None
     is_read: bool = False
     created_at: datetime
+    lead_id: Optional[str] = None
+    lead_score: Optional[int] = None
+    user_id: Optional[str] = None
+    company_id: Optional[str] = None
 
 class ContactMessageCreate(BaseModel):
     name: str
@@ -154,267 +205,110 @@ class AdminSubscriptionCreate(BaseModel):
     product_id: str
     plan_name: str
 
-# ============== PRODUCTS DATA ==============
-
-PRODUCTS = [
-    {
-        "id": "restoflow",
-        "name": "RestoFlow",
-        "slug": "restoflow",
-        "description": "Software SaaS para gestión integral de restaurantes con facturación electrónica SRI",
-        "icon": "UtensilsCrossed",
-        "features": [
-            "Gestión de mesas en tiempo real",
-            "Comandas a cocina automáticas",
-            "Facturación electrónica SRI",
-            "Control de inventario",
-            "Cierre de caja por turnos",
-            "División de cuentas"
-        ],
-        "plans": [
-            {
-                "name": "Emprendedor",
-                "price_before": 40,
-                "price_now": 20,
-                "billing": "mensual",
-                "features": ["1 local", "1 usuario administrador", "3 usuarios meseros", "Facturación electrónica básica", "Reportes estándar", "Soporte básico"]
-            },
-            {
-                "name": "Empresarial",
-                "price_before": 80,
-                "price_now": 50,
-                "billing": "mensual",
-                "popular": True,
-                "features": ["1 local", "Usuarios ilimitados", "Inventario con Kardex", "Control de cajas", "Facturación electrónica completa", "Dividir cuenta de clientes", "Soporte prioritario"]
-            },
-            {
-                "name": "Corporativo",
-                "price_before": 120,
-                "price_now": 80,
-                "billing": "mensual",
-                "features": ["Multiempresa", "Multi local", "Usuarios ilimitados", "Inventario con Kardex", "Control de cajas", "Facturación electrónica", "Acompañamiento en implementación", "Dividir cuenta de clientes", "Recetas y costo por plato"]
-            }
-        ]
-    },
-    {
-        "id": "sentinel",
-        "name": "Pedidos Sentinel",
-        "slug": "pedidos-sentinel",
-        "description": "Aplicación de toma de pedidos enlazada a ERP Billennium para equipos de ventas",
-        "icon": "Smartphone",
-        "features": [
-            "Multi-empresa",
-            "Sincronización con ERP",
-            "Trabajo offline/online",
-            "Generación de proformas PDF",
-            "Dashboard de ventas",
-            "Control de cartera"
-        ],
-        "plans": [
-            {
-                "name": "Básico",
-                "price_before": 60,
-                "price_now": 30,
-                "billing": "mensual",
-                "features": ["1 vendedor", "1 empresa", "Pedidos y proformas", "Catálogo actualizado diario", "Envío por email/WhatsApp", "Trabajo offline/online", "Sincronización automática con ERP", "Soporte básico"]
-            },
-            {
-                "name": "Profesional",
-                "price_before": 120,
-                "price_now": 60,
-                "billing": "mensual",
-                "popular": True,
-                "features": ["Hasta 5 vendedores", "Hasta 3 empresas", "Todo lo del Plan Básico", "Cartera (cobranza en ruta)", "Bancos y formas de pago", "Administración de documentos", "Autorización proforma→pedido", "Soporte profesional", "Reportes en PDF/Excel"]
-            },
-            {
-                "name": "Corporativo",
-                "price_before": 250,
-                "price_now": 125,
-                "billing": "mensual",
-                "features": ["Hasta 20 vendedores", "Hasta 10 empresas", "Todo lo del Plan Profesional", "Dashboard avanzado de ventas y costos", "Por vendedor, empresa y periodo", "Configuración avanzada de parámetros", "Soporte prioritario"]
-            }
-        ]
-    },
-    {
-        "id": "importaciones",
-        "name": "Módulo de Importaciones",
-        "slug": "modulo-importaciones",
-        "description": "Control completo de procesos de importación, costos y órdenes de compra internacionales",
-        "icon": "Ship",
-        "features": [
-            "Control de órdenes de compra",
-            "Seguimiento de embarques",
-            "Cálculo de costos de importación",
-            "Gestión de proveedores internacionales",
-            "Reportes de costeo",
-            "Integración con ERP"
-        ],
-        "plans": [
-            {
-                "name": "Estándar",
-                "price_before": 80,
-                "price_now": 45,
-                "billing": "mensual",
-                "features": ["Hasta 50 importaciones/mes", "1 usuario", "Control de órdenes de compra", "Seguimiento de embarques", "Cálculo de costos básico", "Reportes estándar"]
-            },
-            {
-                "name": "Profesional",
-                "price_before": 150,
-                "price_now": 85,
-                "billing": "mensual",
-                "popular": True,
-                "features": ["Importaciones ilimitadas", "Hasta 5 usuarios", "Todo lo del Plan Estándar", "Gestión de proveedores", "Reportes avanzados de costeo", "Integración con ERP", "Soporte prioritario"]
-            }
-        ]
-    },
-    {
-        "id": "lopdp",
-        "name": "LOPDP",
-        "slug": "lopdp",
-        "description": "Solución para cumplir la Ley Orgánica de Protección de Datos Personales en Ecuador",
-        "icon": "ShieldCheck",
-        "features": [
-            "Inventario de datos personales",
-            "Gestión de consentimientos",
-            "Registro de tratamientos",
-            "Portal de derechos ARCO",
-            "Alertas de cumplimiento",
-            "Documentación legal automatizada"
-        ],
-        "plans": [
-            {
-                "name": "PYME",
-                "price_before": 60,
-                "price_now": 35,
-                "billing": "mensual",
-                "features": ["Hasta 500 registros", "1 usuario administrador", "Inventario de datos", "Gestión de consentimientos básica", "Portal ARCO", "Documentación legal básica"]
-            },
-            {
-                "name": "Empresarial",
-                "price_before": 120,
-                "price_now": 70,
-                "billing": "mensual",
-                "popular": True,
-                "features": ["Registros ilimitados", "Hasta 5 usuarios", "Todo lo del Plan PYME", "Registro de tratamientos completo", "Alertas de cumplimiento", "Reportes de auditoría", "Soporte prioritario"]
-            }
-        ]
-    },
-    {
-        "id": "facturacion",
-        "name": "Facturación Electrónica",
-        "slug": "facturacion-electronica",
-        "description": "Sistema en la nube para emitir comprobantes electrónicos cumpliendo normativa SRI",
-        "icon": "FileText",
-        "features": [
-            "Facturas electrónicas",
-            "Notas de crédito/débito",
-            "Retenciones",
-            "Guías de remisión",
-            "Liquidaciones de compra",
-            "Reportes para declaraciones"
-        ],
-        "plans": [
-            {
-                "name": "Básico",
-                "price_before": 25,
-                "price_now": 15,
-                "billing": "mensual",
-                "features": ["Hasta 100 documentos/mes", "1 usuario", "Facturas y notas de crédito", "Envío automático al SRI", "Portal de consulta", "Soporte por email"]
-            },
-            {
-                "name": "Profesional",
-                "price_before": 50,
-                "price_now": 30,
-                "billing": "mensual",
-                "popular": True,
-                "features": ["Hasta 500 documentos/mes", "Hasta 3 usuarios", "Todos los tipos de comprobantes", "Retenciones automáticas", "Reportes para declaraciones", "Soporte prioritario"]
-            },
-            {
-                "name": "Empresarial",
-                "price_before": 100,
-                "price_now": 60,
-                "billing": "mensual",
-                "features": ["Documentos ilimitados", "Usuarios ilimitados", "Todo lo del Plan Profesional", "API de integración", "Múltiples puntos de emisión", "Soporte dedicado"]
-            }
-        ]
-    },
-    {
-        "id": "dashboard",
-        "name": "Dashboard Empresarial",
-        "slug": "dashboard-empresarial",
-        "description": "Dashboard comercial y financiero para empresas enlazado a su propio ERP",
-        "icon": "BarChart3",
-        "features": [
-            "KPIs en tiempo real",
-            "Análisis de ventas",
-            "Control de cartera",
-            "Indicadores financieros",
-            "Reportes personalizados",
-            "Integración con ERP"
-        ],
-        "plans": [
-            {
-                "name": "Básico",
-                "price_before": 250,
-                "price_now": 150,
-                "billing": "mensual",
-                "features": [
-                    "Dashboard principal con KPIs básicos",
-                    "Ventas, compras y cobros del día anterior",
-                    "Top 10 clientes y productos",
-                    "Hasta 3 usuarios",
-                    "Exportación a Excel",
-                    "Soporte estándar"
-                ]
-            },
-            {
-                "name": "Profesional",
-                "price_before": 400,
-                "price_now": 250,
-                "billing": "mensual",
-                "popular": True,
-                "features": [
-                    "Todo lo del Plan Básico",
-                    "Datos en tiempo real",
-                    "Dashboard de cartera y vencimientos",
-                    "Rentabilidad por producto, vendedor y cliente",
-                    "Hasta 10 usuarios",
-                    "Alertas configurables por indicador",
-                    "Reportes personalizados en PDF/Excel",
-                    "Integración total con ERP Billennium",
-                    "Soporte prioritario"
-                ]
-            }
-        ]
-    },
-    {
-        "id": "plataforma-ferias",
-        "name": "Plataforma Móvil para Ferias",
-        "slug": "plataforma-ferias",
-        "description": "App móvil instalable + panel web de administración para gestionar ferias y exposiciones de forma profesional.",
-        "icon": "Ticket",
-        "features": [
-            "Registro de visitantes con credencial digital QR",
-            "Mapa del recinto con ubicación de stands",
-            "Catálogo de expositores con búsqueda por nombre y rubro",
-            "Captura de leads mediante escaneo de QR",
-            "Clasificación de leads (frío/tibio/caliente)",
-            "Exportación de leads a Excel/CSV",
-            "Notificaciones generales a visitantes",
-            "Cumplimiento LOPDP (consentimiento explícito)"
-        ],
-        "external_link": "https://proyecto-ferias2026.vercel.app/",
-        "plans": []
-    }
-]
+class Entitlements(BaseModel):
+    products: List[str]
+
+class DashboardData(BaseModel):
+    user: UserResponse
+    subscriptions: List[Subscription]
+    companies: List[Company]
+
+class CatalogProduct(BaseModel):
+    id: str
+    name: str
+    plans: List[str]
+
+class AdminSubscriptionsData(BaseModel):
+    subscriptions: List[Subscription]
+    catalog: List[CatalogProduct]
+
+class UserSummary(BaseModel):
+    id: str
+    email: str
+    name: str
+    company_name: Optional[str] = None
+    phone: Optional[str] = None
+
+# ?fields= / ?include= on list endpoints; embeds use the FKs from migrations/postgres/0007
+SUBSCRIPTION_RESOURCE = Resource("subscription", Subscription, [
+    Relation("user", "users", "subscriptions_user_id_fkey", UserSummary),
+])
+COMPANY_RESOURCE = Resource("company", Company, [
+    Relation("owner", "users", "companies_owner_id_fkey", UserSummary),
+])
+
+class AuditEntry(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    actor_id: Optional[str] = None
+    actor_email: Optional[str] = None
+    action: str
+    target_type: str
+    target_id: str
+    diff: dict = {}
+    created_at: datetime
+
+class AuditPage(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    entries: List[AuditEntry]
+
+class SearchHit(BaseModel):
+    kind: str
+    id: str
+    title: str
+    subtitle: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+    created_at: Optional[datetime] = None
+
+class SearchResults(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    hits: List[SearchHit]
+
+class AnalyticsPoint(BaseModel):
+    bucket: str
+    new: int
+    activated: int
+    suspended: int
+    cancelled: int
+    mrr: float
+    mrr_by_product: Dict[str, float]
+
+class AnalyticsSeries(BaseModel):
+    granularity: str
+    start: str
+    end: str
+    product_id: Optional[str] = None
+    points: List[AnalyticsPoint]
+    mrr_by_plan: Dict[str, Dict[str, float]]
+
+class Lead(BaseModel):
+    lead_id: str
+    name: str
+    email: str
+    phone: Optional[str] = None
+    company: Optional[str] = None
+    user_id: Optional[str] = None
+    company_id: Optional[str] = None
+    score: int
+    products: Dict[str, int]
+    messages: int
+    unread: int
+    last_message_at: datetime
 
 # ============== HELPERS ==============
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    with profiling.span("bcrypt"):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    with profiling.span("bcrypt"):
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def create_token(user_id: str, email: str, role: str) -> str:
     payload = {
@@ -423,30 +317,169 @@ def create_token(user_id: str, email: str, role: str) -> str:
         "role": role,
         "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return token_service.issue(payload)
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        result = supabase.table("users").select("*").eq("id", payload["user_id"]).execute()
-        if not result.data:
-            raise HTTPException(status_code=401, detail="Usuario no encontrado")
-        return result.data[0]
+        return token_service.verify(credentials.credentials)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token inválido")
 
+def _load_user(user_id: str) -> dict:
+    result = supabase.table("users").select("*").eq("id", user_id).execute()
+    if not result.data:
+        raise HTTPException(status_code=401, detail="Usuario no encontrado")
+    return result.data[0]
+
+class RequestContext:
+    """Who is calling, loaded at most once per request.
+
+    FastAPI resolves request_context once per request and hands the same
+    instance to every dependency and route that asks for it, so the user,
+    companies and entitlements behind the token are each fetched on first use
+    only, however many of them read them.
+    """
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.user_id = payload["user_id"]
+        self._loaded = {}
+
+    def _get(self, key, load):
+        if key not in self._loaded:
+            self._loaded[key] = load()
+        return self._loaded[key]
+
+    @property
+    def user(self) -> dict:
+        return self._get("user", lambda: _load_user(self.user_id))
+
+    @user.setter
+    def user(self, value: dict):
+        self._loaded["user"] = value
+
+    @property
+    def is_admin(self) -> bool:
+        return self.user.get("role") == "admin"
+
+    def company(self, company_id: str) -> dict:
+        """The company, if the caller owns it or is an admin."""
+        user = self.user
+        company = self._get(("company", company_id), lambda: _load_company(company_id))
+        if company["owner_id"] != user["id"] and not self.is_admin:
+            raise HTTPException(status_code=403, detail="No tiene acceso a esta empresa")
+        return company
+
+    @property
+    def entitlements(self) -> frozenset:
+        """Ids of the products the caller may use: enabled, active subscriptions."""
+        return self._get("entitlements", lambda: frozenset(
+            s["product_id"] for s in supabase.table("subscriptions").select("product_id")
+            .eq("user_id", self.user_id).eq("status", "active").eq("is_enabled", True).execute().data
+        ))
+
+    def with_users(self, *user_ids: str) -> dict:
+        """id -> row for user_ids and the caller, fetched together if the caller is not loaded yet."""
+        wanted = set(user_ids) | ({self.user_id} if "user" not in self._loaded else set())
+        rows = {u["id"]: u for u in supabase.table("users").select("*").in_("id", sorted(wanted)).execute().data}
+        if "user" not in self._loaded:
+            if self.user_id not in rows:
+                raise HTTPException(status_code=401, detail="Usuario no encontrado")
+            self.user = rows[self.user_id]
+        rows[self.user_id] = self.user
+        return rows
+
+def _load_company(company_id: str) -> dict:
+    result = supabase.table("companies").select("id, owner_id").eq("id", company_id).execute()
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Empresa no encontrada")
+    return result.data[0]
+
+def request_context(payload: dict = Depends(decode_token)) -> RequestContext:
+    return RequestContext(payload)
+
+def get_current_user(ctx: RequestContext = Depends(request_context)):
+    return ctx.user
+
+def get_company(company_id: str, ctx: RequestContext = Depends(request_context)):
+    return ctx.company(company_id)
+
+def cached_read(response: Response, key: tuple, load, fresh: float = 0, revalidate: float = 0, max_stale: float = None):
+    """load() through the read cache; a stale value marks the response with Age and Warning."""
+    value, age = read_cache.get(key, load, fresh, revalidate, max_stale)
+    if age is not None:
+        resilience.mark_stale(response, age)
+    return value
+
+def get_cached_user(response: Response, ctx: RequestContext = Depends(request_context)):
+    # get_current_user for the cached read endpoints: the last known user during a short
+    # outage, which the rest of the request then sees too. Its role gates admin routes,
+    # so it is not served stale for long
+    ctx.user = cached_read(response, ("user", ctx.user_id), lambda: ctx.user,
+                           max_stale=resilience.AUTH_STALE_MAX_SECONDS)
+    return ctx.user
+
+# Shared pool for fanning out independent Supabase queries within one request
+_fanout_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('FANOUT_WORKERS', '16')), thread_name_prefix="fanout")
+
+def run_concurrently(*calls):
+    """Run independent blocking calls in parallel, returning results in order."""
+    futures = [_fanout_pool.submit(contextvars.copy_context().run, call) for call in calls]
+    return [f.result() for f in futures]
+
 def get_admin_user(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Acceso denegado. Se requiere rol de administrador")
     return current_user
 
+def get_cached_admin(current_user: dict = Depends(get_cached_user)):
+    return get_admin_user(current_user)
+
+def sparse_fieldset(resource: Resource):
+    def dependency(
+        fields: Optional[str] = Query(None, description="Campos separados por coma, p. ej. id,status,user.email"),
+        include: Optional[str] = Query(None, description="Relaciones a incluir, p. ej. user"),
+    ):
+        try:
+            return fieldsets.parse(resource, fields, include)
+        except FieldsetError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return dependency
+
+def list_response(resource: Resource, fieldset, rows: list, parse, headers: dict = None):
+    # Sparse requests skip the full models and encode straight from the cached adapter
+    if fieldset is None:
+        return [parse(r) for r in rows]
+    return Response(content=fieldsets.render(resource, fieldset, rows), media_type="application/json", headers=headers)
+
+def admin_list(query, model, parse, resource: Resource = None, fieldset=None):
+    """Whole-table admin lists; `query()` builds a fresh, totally ordered select for each page."""
+    if not ADMIN_STREAMING:
+        return list_response(resource, fieldset, query().execute().data, parse)
+    if fieldset is None:
+        encode = streaming.model_encoder(model, parse)
+    else:
+        encode = lambda rows: fieldsets.render(resource, fieldset, rows)
+    return streaming.json_array(query, encode)
+
 # ============== AUTH ROUTES ==============
 
+def enforce_rate_limit(guard, ip: str, email: str):
+    try:
+        guard.check(ip, email)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados intentos. Intente de nuevo más tarde",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
 @api_router.post("/auth/register", response_model=TokenResponse)
-def register(user_data: UserCreate):
+def register(user_data: UserCreate, request: Request):
+    enforce_rate_limit(register_guard, client_ip(request), user_data.email)
+
     # Check if email already exists
     existing = supabase.table("users").select("id").eq("email", user_data.email).execute()
     if existing.data:
@@ -464,6 +497,8 @@ def register(user_data: UserCreate):
 
     result = supabase.table("users").insert(new_user).execute()
     user = result.data[0]
+    index_row("user", user)
+    events.emit("user.registered", {k: v for k, v in user.items() if k != "password_hash"})
 
     token = create_token(user["id"], user["email"], user["role"])
 
@@ -481,16 +516,23 @@ def register(user_data: UserCreate):
     )
 
 @api_router.post("/auth/login", response_model=TokenResponse)
-def login(credentials: UserLogin):
+def login(credentials: UserLogin, request: Request):
+    ip = client_ip(request)
+    enforce_rate_limit(login_guard, ip, credentials.email)
+
     result = supabase.table("users").select("*").eq("email", credentials.email).execute()
     if not result.data:
+        login_guard.record_failure(ip, credentials.email)
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
     user = result.data[0]
 
     if not verify_password(credentials.password, user.get("password_hash", "")):
+        login_guard.record_failure(ip, credentials.email)
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
+    login_guard.record_success(ip, credentials.email)
+
     if not user.get("is_active", True):
         raise HTTPException(status_code=401, detail="Usuario desactivado")
 
@@ -510,7 +552,7 @@ def login(credentials: UserLogin):
     )
 
 @api_router.get("/auth/me", response_model=UserResponse)
-def get_me(current_user: dict = Depends(get_current_user)):
+def get_me(current_user: dict = Depends(get_cached_user)):
     return UserResponse(
         id=current_user["id"],
         email=current_user["email"],
@@ -521,6 +563,18 @@ def get_me(current_user: dict = Depends(get_current_user)):
         is_active=current_user.get("is_active", True)
     )
 
+@api_router.get("/auth/entitlements", response_model=Entitlements)
+def get_entitlements(ctx: RequestContext = Depends(request_context)):
+    # For the product apps, which verify our tokens locally and then ask what the user may open
+    _user, products = run_concurrently(lambda: ctx.user, lambda: ctx.entitlements)
+    return Entitlements(products=sorted(products))
+
+@api_router.get("/.well-known/jwks.json")
+def get_jwks(response: Response):
+    # Public keys for verifying our tokens elsewhere; empty while tokens are HS256
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return token_service.jwks()
+
 # ============== PRODUCTS ROUTES ==============
 
 @api_router.get("/products", response_model=List[Product])
@@ -536,6 +590,16 @@ def get_product(product_id: str):
 
 # ============== SUBSCRIPTIONS ROUTES ==============
 
+def insert_subscription(new_sub: dict, duplicate_detail: str) -> dict:
+    # The unique index on open (user_id, product_id) is the duplicate check: no
+    # round trip before the insert, and no race between check and insert
+    try:
+        return supabase.table("subscriptions").insert(new_sub).execute().data[0]
+    except Exception as e:
+        if is_unique_violation(e):
+            raise HTTPException(status_code=400, detail=duplicate_detail)
+        raise
+
 @api_router.post("/subscriptions", response_model=Subscription)
 def create_subscription(sub_data: SubscriptionCreate, current_user: dict = Depends(get_current_user)):
     # Find product
@@ -548,14 +612,6 @@ def create_subscription(sub_data: SubscriptionCreate, current_user: dict = Depen
     if not product:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
 
-    # Check if already subscribed
-    existing = supabase.table("subscriptions").select("id").eq(
-        "user_id", current_user["id"]
-    ).eq("product_id", sub_data.product_id).neq("status", "cancelled").execute()
-
-    if existing.data:
-        raise HTTPException(status_code=400, detail="Ya tienes una suscripción activa a este producto")
-
     new_sub = {
         "user_id": current_user["id"],
         "user_email": current_user["email"],
@@ -569,44 +625,112 @@ def create_subscription(sub_data: SubscriptionCreate, current_user: dict = Depen
         "status": "pending",
     }
 
-    result = supabase.table("subscriptions").insert(new_sub).execute()
-    sub = result.data[0]
+    sub = insert_subscription(new_sub, "Ya tienes una suscripción activa a este producto")
+    emit_lifecycle("subscription.requested", sub)
     return _parse_subscription(sub)
 
 @api_router.get("/subscriptions/my", response_model=List[Subscription])
-def get_my_subscriptions(current_user: dict = Depends(get_current_user)):
-    result = supabase.table("subscriptions").select("*").eq("user_id", current_user["id"]).execute()
-    return [_parse_subscription(s) for s in result.data]
+def get_my_subscriptions(
+    response: Response,
+    fieldset=Depends(sparse_fieldset(SUBSCRIPTION_RESOURCE)),
+    current_user: dict = Depends(get_cached_user),
+):
+    columns = fieldsets.select_clause(SUBSCRIPTION_RESOURCE, fieldset)
+    rows = cached_read(
+        response, ("subscriptions/my", current_user["id"], columns),
+        lambda: supabase.table("subscriptions").select(columns).eq("user_id", current_user["id"]).execute().data,
+    )
+    return list_response(SUBSCRIPTION_RESOURCE, fieldset, rows, _parse_subscription, resilience.stale_headers(response))
 
 @api_router.get("/admin/subscriptions", response_model=List[Subscription])
-def get_all_subscriptions(admin: dict = Depends(get_admin_user)):
-    result = supabase.table("subscriptions").select("*").order("created_at", desc=True).execute()
-    return [_parse_subscription(s) for s in result.data]
+def get_all_subscriptions(
+    fieldset=Depends(sparse_fieldset(SUBSCRIPTION_RESOURCE)),
+    admin: dict = Depends(get_admin_user),
+):
+    query = lambda: supabase.table("subscriptions").select(
+        fieldsets.select_clause(SUBSCRIPTION_RESOURCE, fieldset)
+    ).order("created_at", desc=True).order("id", desc=True)
+    return admin_list(query, Subscription, _parse_subscription, SUBSCRIPTION_RESOURCE, fieldset)
 
 @api_router.put("/admin/subscriptions/{subscription_id}")
 def update_subscription(subscription_id: str, update_data: SubscriptionUpdate, admin: dict = Depends(get_admin_user)):
-    existing = supabase.table("subscriptions").select("id").eq("id", subscription_id).execute()
+    existing = supabase.table("subscriptions").select(
+        "id, billing_cycle, is_enabled, status, enabled_at, enabled_by, current_period_end, reminder_sent_at"
+    ).eq("id", subscription_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Suscripción no encontrada")
 
     update_fields = {"is_enabled": update_data.is_enabled}
 
     if update_data.is_enabled:
+        # Enabling (again) starts a new billing period
         update_fields["status"] = "active"
         update_fields["enabled_at"] = datetime.now(timezone.utc).isoformat()
         update_fields["enabled_by"] = admin["email"]
+        update_fields["current_period_end"] = next_period_end(existing.data[0].get("billing_cycle")).isoformat()
+        update_fields["reminder_sent_at"] = None
     else:
         update_fields["status"] = update_data.status or "suspended"
 
-    supabase.table("subscriptions").update(update_fields).eq("id", subscription_id).execute()
+    try:
+        result = supabase.table("subscriptions").update(update_fields).eq("id", subscription_id).execute()
+    except Exception as e:
+        # Reopening a cancelled subscription while the user has another one open
+        if is_unique_violation(e):
+            raise HTTPException(status_code=400, detail="El usuario ya tiene este producto asignado")
+        raise
+    audit_log.record(admin, "subscription.update", "subscription", subscription_id, diff(existing.data[0], update_fields))
+    if result.data:
+        emit_lifecycle(
+            f"subscription.{'activated' if update_data.is_enabled else update_fields['status']}",
+            result.data[0], previous_status=existing.data[0]["status"],
+        )
     return {"message": "Suscripción actualizada correctamente"}
 
+@api_router.post("/admin/subscriptions/{subscription_id}/renew")
+def renew_subscription(subscription_id: str, admin: dict = Depends(get_admin_user)):
+    # Records a paid period: an active subscription is extended from its current end,
+    # a suspended one is reactivated with a period starting now
+    existing = supabase.table("subscriptions").select(
+        "id, billing_cycle, is_enabled, status, current_period_end, reminder_sent_at"
+    ).eq("id", subscription_id).execute()
+    if not existing.data:
+        raise HTTPException(status_code=404, detail="Suscripción no encontrada")
+    sub = existing.data[0]
+    if sub["status"] not in ("active", "suspended"):
+        raise HTTPException(status_code=400, detail="Solo se pueden renovar suscripciones activas o suspendidas")
+
+    now = datetime.now(timezone.utc)
+    start = now
+    if sub["status"] == "active" and sub.get("current_period_end"):
+        start = max(now, datetime.fromisoformat(sub["current_period_end"]))
+    update_fields = {
+        "current_period_end": next_period_end(sub.get("billing_cycle"), start).isoformat(),
+        "reminder_sent_at": None,
+    }
+    if sub["status"] == "suspended":
+        update_fields.update({"status": "active", "is_enabled": True})
+
+    # Conditional on the status read above, so a sweep that suspended it meanwhile is not undone
+    result = supabase.table("subscriptions").update(update_fields).eq("id", subscription_id).eq(
+        "status", sub["status"]
+    ).execute()
+    if not result.data:
+        raise HTTPException(status_code=409, detail="La suscripción cambió mientras se renovaba; intente de nuevo")
+    audit_log.record(admin, "subscription.renew", "subscription", subscription_id, diff(sub, update_fields))
+    emit_lifecycle(
+        "subscription.activated" if sub["status"] == "suspended" else "subscription.renewed",
+        result.data[0], previous_status=sub["status"],
+    )
+    return {"message": "Suscripción renovada correctamente", "current_period_end": update_fields["current_period_end"]}
+
 @api_router.post("/admin/subscriptions/create")
-def admin_create_subscription(sub_data: AdminSubscriptionCreate, admin: dict = Depends(get_admin_user)):
-    user_result = supabase.table("users").select("*").eq("id", sub_data.user_id).execute()
-    if not user_result.data:
+def admin_create_subscription(sub_data: AdminSubscriptionCreate, ctx: RequestContext = Depends(request_context)):
+    # The admin and the target user come back in one round trip
+    user = ctx.with_users(sub_data.user_id).get(sub_data.user_id)
+    admin = get_admin_user(ctx.user)
+    if user is None:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    user = user_result.data[0]
 
     product = None
     for p in PRODUCTS:
@@ -617,13 +741,6 @@ def admin_create_subscription(sub_data: AdminSubscriptionCreate, admin: dict = D
     if not product:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
 
-    existing = supabase.table("subscriptions").select("id").eq(
-        "user_id", sub_data.user_id
-    ).eq("product_id", sub_data.product_id).neq("status", "cancelled").execute()
-
-    if existing.data:
-        raise HTTPException(status_code=400, detail="El usuario ya tiene este producto asignado")
-
     new_sub = {
         "user_id": user["id"],
         "user_email": user["email"],
@@ -637,15 +754,20 @@ def admin_create_subscription(sub_data: AdminSubscriptionCreate, admin: dict = D
         "status": "active",
         "enabled_at": datetime.now(timezone.utc).isoformat(),
         "enabled_by": admin["email"],
+        "current_period_end": next_period_end("monthly").isoformat(),
     }
 
-    supabase.table("subscriptions").insert(new_sub).execute()
+    sub = insert_subscription(new_sub, "El usuario ya tiene este producto asignado")
+    audit_log.record(admin, "subscription.create", "subscription", sub["id"], diff({}, new_sub))
+    emit_lifecycle("subscription.activated", sub)
     return {"message": "Producto agregado correctamente"}
 
 # ============== CONTACT ROUTES ==============
 
 @api_router.post("/contact", response_model=ContactMessage)
-def create_contact_message(message_data: ContactMessageCreate):
+def create_contact_message(message_data: ContactMessageCreate, request: Request):
+    # anonymous, and every message mails the sender and the admins
+    enforce_rate_limit(contact_guard, client_ip(request), message_data.email)
     new_msg = {
         "name": message_data.name,
         "email": message_data.email,
@@ -658,20 +780,49 @@ def create_contact_message(message_data: ContactMessageCreate):
 
     result = supabase.table("contact_messages").insert(new_msg).execute()
     msg = result.data[0]
+    index_row("message", msg)
+    events.emit("contact.created", msg)
     return _parse_message(msg)
 
 @api_router.get("/admin/messages", response_model=List[ContactMessage])
 def get_contact_messages(admin: dict = Depends(get_admin_user)):
-    result = supabase.table("contact_messages").select("*").order("created_at", desc=True).execute()
-    return [_parse_message(m) for m in result.data]
+    query = lambda: supabase.table("contact_messages").select("*").order("created_at", desc=True).order("id", desc=True)
+    return admin_list(query, ContactMessage, _parse_message)
 
 @api_router.put("/admin/messages/{message_id}/read")
 def mark_message_read(message_id: str, admin: dict = Depends(get_admin_user)):
     result = supabase.table("contact_messages").update({"is_read": True}).eq("id", message_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    audit_log.record(admin, "message.mark_read", "contact_message", message_id, {"is_read": [None, True]})
     return {"message": "Mensaje marcado como leído"}
 
+@api_router.get("/admin/leads", response_model=List[Lead])
+def get_leads(
+    min_score: int = Query(0, ge=0, le=100),
+    product: Optional[str] = None,
+    admin: dict = Depends(get_admin_user),
+):
+    # Messages the lead pipeline has not scored yet have lead_score NULL and are left out
+    def query():
+        q = supabase.table("contact_messages").select(
+            "id, name, email, phone, company, product_interest, is_read, created_at, lead_id, lead_score, user_id, company_id"
+        ).gte("lead_score", min_score)
+        if product:
+            q = q.eq("product_interest", product)
+        return q.order("created_at", desc=True).order("id", desc=True)
+
+    # folded a page at a time; only one LeadSummary per lead outlives its page
+    leads = {}
+    for page in streaming.pages(query):
+        for m in page:
+            lead = leads.get(m["lead_id"])
+            if lead is None:
+                lead = leads[m["lead_id"]] = LeadSummary(m)
+            lead.add(m)
+    ranked = sorted(leads.values(), key=lambda l: (l.score, str(l.last_message_at)), reverse=True)
+    return [l.as_dict() for l in ranked]
+
 # ============== COMPANIES ROUTES ==============
 
 @api_router.post("/companies", response_model=Company)
@@ -685,38 +836,133 @@ def create_company(company_data: CompanyCreate, current_user: dict = Depends(get
 
     result = supabase.table("companies").insert(new_company).execute()
     comp = result.data[0]
+    index_row("company", comp)
     return _parse_company(comp)
 
 @api_router.get("/companies/my", response_model=List[Company])
-def get_my_companies(current_user: dict = Depends(get_current_user)):
-    result = supabase.table("companies").select("*").eq("owner_id", current_user["id"]).execute()
-    return [_parse_company(c) for c in result.data]
+def get_my_companies(
+    response: Response,
+    fieldset=Depends(sparse_fieldset(COMPANY_RESOURCE)),
+    current_user: dict = Depends(get_cached_user),
+):
+    columns = fieldsets.select_clause(COMPANY_RESOURCE, fieldset)
+    rows = cached_read(
+        response, ("companies/my", current_user["id"], columns),
+        lambda: supabase.table("companies").select(columns).eq("owner_id", current_user["id"]).execute().data,
+    )
+    return list_response(COMPANY_RESOURCE, fieldset, rows, _parse_company, resilience.stale_headers(response))
 
 @api_router.get("/admin/companies", response_model=List[Company])
-def get_all_companies(admin: dict = Depends(get_admin_user)):
-    result = supabase.table("companies").select("*").execute()
-    return [_parse_company(c) for c in result.data]
+def get_all_companies(
+    fieldset=Depends(sparse_fieldset(COMPANY_RESOURCE)),
+    admin: dict = Depends(get_admin_user),
+):
+    query = lambda: supabase.table("companies").select(fieldsets.select_clause(COMPANY_RESOURCE, fieldset)).order("id")
+    return admin_list(query, Company, _parse_company, COMPANY_RESOURCE, fieldset)
 
 @api_router.put("/admin/companies/{company_id}")
 def update_company(company_id: str, update_data: CompanyUpdate, admin: dict = Depends(get_admin_user)):
-    existing = supabase.table("companies").select("id").eq("id", company_id).execute()
+    existing = supabase.table("companies").select("*").eq("id", company_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
 
     update_fields = {k: v for k, v in update_data.model_dump().items() if v is not None}
+    changes = diff(existing.data[0], update_fields)
     if update_fields:
-        supabase.table("companies").update(update_fields).eq("id", company_id).execute()
+        result = supabase.table("companies").update(update_fields).eq("id", company_id).execute()
+        if result.data:
+            index_row("company", result.data[0])
+    # only once the update went through: the audit log is append-only
+    if changes:
+        audit_log.record(admin, "company.update", "company", company_id, changes)
 
     return {"message": "Empresa actualizada correctamente"}
 
+# ============== SYNC ROUTES ==============
+
+async def _sync_body(request: Request) -> bytes:
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > SYNC_MAX_COMPRESSED_BYTES:
+            raise HTTPException(status_code=413, detail="Lote demasiado grande")
+    return bytes(body)
+
+@api_router.post("/sync/{company_id}", response_model=SyncResult)
+async def sync_company(
+    request: Request,
+    cursor: int = Query(0, ge=0),
+    company: dict = Depends(get_company),
+):
+    body = await _sync_body(request)
+
+    def run():
+        records = parse_records(decode_body(body, request.headers.get("content-encoding")))
+        return apply_batch(supabase, company, records, cursor)
+
+    try:
+        content = await run_in_threadpool(run)
+    except SyncPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(content=content, media_type="application/json")
+
+@api_router.post("/sync/{company_id}/queue", response_model=QueueResult)
+async def sync_queue(
+    request: Request,
+    cursor: int = Query(0, ge=0),
+    company: dict = Depends(get_company),
+):
+    body = await _sync_body(request)
+
+    def run():
+        writes = parse_queue(decode_body(body, request.headers.get("content-encoding")))
+        return apply_queue(supabase, company, writes, cursor)
+
+    try:
+        content = await run_in_threadpool(run)
+    except SyncPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(content=content, media_type="application/json")
+
+@api_router.get("/sync/{company_id}/snapshot", response_model=SnapshotManifest)
+def sync_snapshot(request: Request, company: dict = Depends(get_company)):
+    manifest = snapshot_store.manifest(company)
+    digest = hashlib.sha256("".join(c["hash"] for c in manifest["chunks"]).encode()).hexdigest()[:32]
+    etag = f'"{manifest["cursor"]}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    content = SnapshotManifest.model_validate(manifest).model_dump_json()
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@api_router.get("/sync/{company_id}/chunks/{digest}")
+def sync_chunk(digest: str, request: Request, company: dict = Depends(get_company)):
+    body = snapshot_store.chunk(company, digest) if re.fullmatch(r"[0-9a-f]{64}", digest) else None
+    if body is None:
+        raise HTTPException(status_code=404, detail="Fragmento no encontrado")
+    # content-addressed: a hash never changes meaning, so clients and proxies may keep it forever
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/x-ndjson", headers={**headers, "Content-Encoding": "gzip"})
+
 # ============== ADMIN USERS ROUTES ==============
 
 @api_router.get("/admin/users", response_model=List[UserResponse])
 def get_all_users(admin: dict = Depends(get_admin_user)):
-    result = supabase.table("users").select(
+    query = lambda: supabase.table("users").select(
         "id, email, name, company_name, phone, role, is_active"
-    ).execute()
-    return [UserResponse(**u) for u in result.data]
+    ).order("id")
+    return admin_list(query, UserResponse, lambda u: UserResponse(**u))
+
+@api_router.get("/admin/users/search", response_model=List[UserResponse])
+def search_users(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    role: Optional[str] = None,
+    admin: dict = Depends(get_admin_user),
+):
+    return [UserResponse(**u) for u in user_lookup.lookup(supabase, q, limit, role)]
 
 @api_router.put("/admin/users/{user_id}/toggle-active")
 def toggle_user_active(user_id: str, admin: dict = Depends(get_admin_user)):
@@ -726,13 +972,124 @@ def toggle_user_active(user_id: str, admin: dict = Depends(get_admin_user)):
 
     new_status = not existing.data[0]["is_active"]
     supabase.table("users").update({"is_active": new_status}).eq("id", user_id).execute()
+    read_cache.discard(("user", user_id))
+    user_lookup.upsert({"id": user_id, "is_active": new_status})
+    audit_log.record(admin, "user.toggle_active", "user", user_id, {"is_active": [not new_status, new_status]})
 
     return {"message": f"Usuario {'activado' if new_status else 'desactivado'} correctamente"}
 
+# ============== BFF ROUTES ==============
+# One request per screen: the user lookup runs alongside the screen's own
+# queries instead of before them (the user id comes from the token).
+
+@api_router.get("/bff/dashboard", response_model=DashboardData)
+def bff_dashboard(response: Response, ctx: RequestContext = Depends(request_context)):
+    # The SPA's only read after login: the three lookups go through the read cache
+    # like get_cached_user and the /my routes, so an outage serves them stale
+    # instead of a 503 that would log the user out
+    (user, user_age), (subs, subs_age), (companies, companies_age) = run_concurrently(
+        lambda: read_cache.get(("user", ctx.user_id), lambda: ctx.user,
+                               max_stale=resilience.AUTH_STALE_MAX_SECONDS),
+        lambda: read_cache.get(("subscriptions/my", ctx.user_id, "*"), lambda: supabase.table(
+            "subscriptions").select("*").eq("user_id", ctx.user_id).execute().data),
+        lambda: read_cache.get(("companies/my", ctx.user_id, "*"), lambda: supabase.table(
+            "companies").select("*").eq("owner_id", ctx.user_id).execute().data),
+    )
+    ctx.user = user
+    for age in (user_age, subs_age, companies_age):
+        if age is not None:
+            resilience.mark_stale(response, age)
+
+    return DashboardData(
+        user=_parse_user(user),
+        subscriptions=[_parse_subscription(s) for s in subs],
+        companies=[_parse_company(c) for c in companies],
+    )
+
+@api_router.get("/bff/admin/subscriptions", response_model=AdminSubscriptionsData)
+def bff_admin_subscriptions(ctx: RequestContext = Depends(request_context)):
+    # The role claim only gates the fan-out; the stored role is checked below
+    if ctx.payload.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado. Se requiere rol de administrador")
+
+    # the first page is read alongside the user; the rest are paged like /admin/subscriptions
+    query = lambda: supabase.table("subscriptions").select("*").order("created_at", desc=True).order("id", desc=True)
+    _user, first = run_concurrently(
+        lambda: ctx.user,
+        lambda: query().range(0, streaming.ADMIN_PAGE_SIZE - 1).execute().data,
+    )
+    get_admin_user(ctx.user)
+
+    catalog = [
+        CatalogProduct(id=p["id"], name=p["name"], plans=[plan["name"] for plan in p["plans"]])
+        for p in PRODUCTS
+    ]
+    pages = streaming.pages(query, first=first)
+    if not ADMIN_STREAMING:
+        return AdminSubscriptionsData(
+            subscriptions=[_parse_subscription(s) for page in pages for s in page], catalog=catalog,
+        )
+    encode = streaming.model_encoder(Subscription, _parse_subscription)
+    return streaming.json_object(
+        {"catalog": [c.model_dump() for c in catalog]}, "subscriptions", (encode(rows) for rows in pages),
+    )
+
+# ============== AUDIT ROUTES ==============
+
+@api_router.get("/admin/audit", response_model=AuditPage)
+def get_audit_log(
+    actor_email: Optional[str] = None,
+    action: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    admin: dict = Depends(get_admin_user),
+):
+    filters = {"actor_email": actor_email, "action": action, "target_type": target_type, "target_id": target_id}
+    total, entries = audit_log.query(filters, page, page_size)
+    return AuditPage(
+        total=total,
+        page=page,
+        page_size=page_size,
+        entries=[AuditEntry(**e) for e in entries],
+    )
+
+# ============== SEARCH ROUTES ==============
+
+@api_router.get("/admin/search", response_model=SearchResults)
+def admin_search(
+    q: str = Query(..., min_length=2, max_length=100),
+    kind: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    admin: dict = Depends(get_admin_user),
+):
+    kinds = tuple(k.strip() for k in kind.split(",") if k.strip()) if kind else SEARCH_KINDS
+    invalid = [k for k in kinds if k not in SEARCH_KINDS]
+    if invalid or not kinds:
+        raise HTTPException(status_code=400, detail=f"Tipo de búsqueda inválido: {', '.join(invalid)}")
+
+    total, hits = run_search(supabase, q, kinds, limit=page_size, offset=(page - 1) * page_size)
+    return SearchResults(
+        total=total,
+        page=page,
+        page_size=page_size,
+        hits=[SearchHit(**h) for h in hits],
+    )
+
 # ============== STATS ROUTES ==============
 
+# The dashboard reads whole tables: it is served from memory while fresh, and for
+# ADMIN_STATS_REVALIDATE_SECONDS more while one background refresh runs
+ADMIN_STATS_FRESH_SECONDS = float(os.environ.get('ADMIN_STATS_FRESH_SECONDS', '30'))
+ADMIN_STATS_REVALIDATE_SECONDS = float(os.environ.get('ADMIN_STATS_REVALIDATE_SECONDS', '300'))
+
 @api_router.get("/admin/stats")
-def get_admin_stats(admin: dict = Depends(get_admin_user)):
+def get_admin_stats(response: Response, admin: dict = Depends(get_cached_admin)):
+    return cached_read(response, ("admin/stats",), _admin_stats, ADMIN_STATS_FRESH_SECONDS, ADMIN_STATS_REVALIDATE_SECONDS)
+
+def _admin_stats() -> dict:
     total_users = len(supabase.table("users").select("id", count="exact").execute().data)
     subs_all = supabase.table("subscriptions").select("id, is_enabled, status").execute().data
     msgs_all = supabase.table("contact_messages").select("id, is_read").execute().data
@@ -748,14 +1105,89 @@ def get_admin_stats(admin: dict = Depends(get_admin_user)):
         "total_companies": total_companies,
     }
 
+ANALYTICS_BUCKET_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+ANALYTICS_MAX_BUCKETS = {"day": 366, "month": 120}
+
+@api_router.get("/admin/analytics", response_model=AnalyticsSeries)
+def get_admin_analytics(
+    granularity: str = Query("month", pattern="^(day|month)$"),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    product_id: Optional[str] = None,
+    admin: dict = Depends(get_admin_user),
+):
+    default_start, default_end = analytics.default_range(granularity)
+    start, end = start or default_start, end or default_end
+    try:
+        first = datetime.strptime(start, ANALYTICS_BUCKET_FORMATS[granularity])
+        last = datetime.strptime(end, ANALYTICS_BUCKET_FORMATS[granularity])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"start y end deben tener el formato {ANALYTICS_BUCKET_FORMATS[granularity]}")
+    span = (last - first).days if granularity == "day" else (last.year - first.year) * 12 + last.month - first.month
+    if span < 0 or span >= ANALYTICS_MAX_BUCKETS[granularity]:
+        raise HTTPException(status_code=400, detail="Rango de fechas inválido")
+    return analytics.series(supabase, granularity, start, end, product_id)
+
+@api_router.get("/admin/metrics")
+def get_metrics(admin: dict = Depends(get_admin_user)):
+    return metrics.snapshot()
+
+def _profile_or_404(profile_id: str):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="El perfilado está deshabilitado (PROFILING_ENABLED)")
+    profile = profiling.store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return profile
+
+@api_router.get("/admin/profiles")
+def get_profiles(admin: dict = Depends(get_admin_user)):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="El perfilado está deshabilitado (PROFILING_ENABLED)")
+    return {
+        "slow_ms": profiling.PROFILE_SLOW_MS,
+        "slowest": [p.summary() for p in profiling.store.slowest_profiles()],
+        "requested": [p.summary() for p in profiling.store.explicit_profiles()],
+    }
+
+@api_router.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, admin: dict = Depends(get_admin_user)):
+    return _profile_or_404(profile_id).summary()
+
+@api_router.get("/admin/profiles/{profile_id}/folded")
+def download_profile(profile_id: str, admin: dict = Depends(get_admin_user)):
+    profile = _profile_or_404(profile_id)
+    if not profile.stacks:
+        raise HTTPException(status_code=404, detail="Este perfil no tiene muestras de pila")
+    return Response(
+        content=profile.folded(), media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'},
+    )
+
+@api_router.get("/admin/scheduler/jobs")
+def get_scheduler_jobs(admin: dict = Depends(get_admin_user)):
+    result = supabase.table("scheduler_jobs").select("*").order("name").execute()
+    return {"leader": scheduler.is_leader if scheduler else False, "jobs": result.data}
+
 # ============== ROOT ==============
 
 @api_router.get("/")
 def root():
-    return {"message": "Billennium System API v1.0", "status": "running", "db": "Supabase"}
+    return {"message": "Billennium System API v1.0", "status": "running", "db": "SQLite" if DATA_BACKEND == "sqlite" else "Supabase"}
 
 # ============== PARSE HELPERS ==============
 
+def _parse_user(u: dict) -> UserResponse:
+    return UserResponse(
+        id=u["id"],
+        email=u["email"],
+        name=u["name"],
+        company_name=u.get("company_name"),
+        phone=u.get("phone"),
+        role=u.get("role", "user"),
+        is_active=u.get("is_active", True),
+    )
+
 def _parse_subscription(s: dict) -> Subscription:
     return Subscription(
         id=s["id"],
@@ -785,6 +1217,10 @@ def _parse_message(m: dict) -> ContactMessage:
         product_interest=m.get("product_interest"),
         is_read=m["is_read"],
         created_at=datetime.fromisoformat(m["created_at"]) if isinstance(m["created_at"], str) else m["created_at"],
+        lead_id=m.get("lead_id"),
+        lead_score=m.get("lead_score"),
+        user_id=m.get("user_id"),
+        company_id=m.get("company_id"),
     )
 
 def _parse_company(c: dict) -> Company:
@@ -805,13 +1241,45 @@ def _parse_company(c: dict) -> Company:
 
 app.include_router(api_router)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@app.exception_handler(DataUnavailable)
+async def data_unavailable_handler(request: Request, exc: DataUnavailable):
+    logger.warning(f"Data layer unavailable on {request.url.path}: {exc.reason}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servicio temporalmente no disponible. Intente de nuevo en unos segundos"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Replays responses for retried POSTs carrying an Idempotency-Key header
+app.add_middleware(IdempotencyMiddleware, store_factory=lambda: create_store(supabase))
+
+def _tenant_from_token(token: str):
+    # Admins act across tenants, so their queries fan out to every shard
+    try:
+        payload = token_service.verify(token)
+    except jwt.InvalidTokenError:
+        return None
+    return None if payload.get("role") == "admin" else payload.get("user_id")
+
+app.add_middleware(TenantMiddleware, resolve=_tenant_from_token)
+
+app.add_middleware(CompressionMiddleware)
+
+def _is_admin_token(token: str) -> bool:
+    try:
+        return token_service.verify(token).get("role") == "admin"
+    except jwt.InvalidTokenError:
+        return False
+
+# Only installed when enabled, so it costs nothing otherwise
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, is_admin=_is_admin_token)
+
+# Sheds excess load before any other work; inside CORS, so browsers can read the 503
+app.add_middleware(LoadShedMiddleware)
+
+# Outermost, so preflights are answered before any other middleware or route runs
+app.add_middleware(CORSLayer)
 
 # Configure logging
 logging.basicConfig(
@@ -820,25 +1288,78 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-def startup_event():
+scheduler: Optional[Scheduler] = None
+dispatcher: Optional[NotificationDispatcher] = None
+lead_pipeline: Optional[LeadPipeline] = None
+analytics_recorder = AnalyticsRecorder(supabase, analytics.plan_prices(PRODUCTS))
+analytics.register_listeners(analytics_recorder)
+
+seed_task: Optional[asyncio.Task] = None
+
+def seed_admins():
     """Create default admin users if not exists."""
     admins = [
         {"email": "facturacion@billenniumsystem.com", "name": "Administrador Billennium"},
     ]
+    for admin_data in admins:
+        existing = supabase.table("users").select("id").eq("email", admin_data["email"]).execute()
+        if not existing.data:
+            supabase.table("users").insert({
+                "email": admin_data["email"],
+                "name": admin_data["name"],
+                "password_hash": hash_password("Admin2024!"),
+                "role": "admin",
+                "is_active": True,
+            }).execute()
+            logger.info(f"Admin user created: {admin_data['email']}")
+        else:
+            logger.info(f"Admin already exists: {admin_data['email']}")
+
+async def _retry_seeding():
+    delay = 5
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            return await run_in_threadpool(seed_admins)
+        except Exception as e:
+            delay = min(delay * 2, 300)
+            logger.warning(f"Admin seeding failed again, retrying in {delay}s: {e}")
+
+@app.on_event("startup")
+async def startup_event():
+    # The API starts even if the data layer is down; seeding then retries with backoff
+    global seed_task
     try:
-        for admin_data in admins:
-            existing = supabase.table("users").select("id").eq("email", admin_data["email"]).execute()
-            if not existing.data:
-                supabase.table("users").insert({
-                    "email": admin_data["email"],
-                    "name": admin_data["name"],
-                    "password_hash": hash_password("Admin2024!"),
-                    "role": "admin",
-                    "is_active": True,
-                }).execute()
-                logger.info(f"Admin user created: {admin_data['email']}")
-            else:
-                logger.info(f"Admin already exists: {admin_data['email']}")
+        await run_in_threadpool(seed_admins)
     except Exception as e:
         logger.error(f"Error during startup: {e}")
+        seed_task = asyncio.create_task(_retry_seeding())
+
+@app.on_event("startup")
+async def start_background_workers():
+    global scheduler, dispatcher, lead_pipeline
+    audit_log.start()
+    analytics_recorder.start()
+    if SCHEDULER_ENABLED:
+        scheduler = Scheduler(supabase)
+        scheduler.start()
+    if NOTIFICATIONS_ENABLED:
+        dispatcher = NotificationDispatcher(supabase)
+        register_listeners(dispatcher)
+        dispatcher.start()
+    if LEADS_ENABLED:
+        lead_pipeline = LeadPipeline(supabase, PRODUCTS)
+        lead_pipeline.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    if seed_task:
+        seed_task.cancel()
+    if scheduler:
+        await scheduler.stop()
+    if dispatcher:
+        await dispatcher.stop()
+    if lead_pipeline:
+        await lead_pipeline.stop()
+    await analytics_recorder.stop()
+    await audit_log.stop()
@@ -0,0 +1,60 @@
+"""Local SMTP sink for developing and load-testing notifications.
+
+Accepts every message and prints a one-line summary plus the running
+delivery rate. Usage: python smtp_sink.py [port]  (default 1025)
+"""
+import asyncio
+import sys
+import time
+from email import message_from_bytes
+
+received = 0
+started = time.monotonic()
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    global received
+
+    async def reply(line: str):
+        writer.write(f"{line}\r\n".encode())
+        await writer.drain()
+
+    await reply("220 billennium-sink ESMTP")
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        command = line.decode(errors="replace").strip().upper()
+        if command.startswith(("EHLO", "HELO")):
+            await reply("250 billennium-sink")
+        elif command == "DATA":
+            await reply("354 End data with <CR><LF>.<CR><LF>")
+            data = bytearray()
+            while True:
+                chunk = await reader.readline()
+                if chunk in (b".\r\n", b".\n", b""):
+                    break
+                data += chunk[1:] if chunk.startswith(b"..") else chunk
+            received += 1
+            message = message_from_bytes(bytes(data))
+            rate = received / max(time.monotonic() - started, 1e-6)
+            print(f"[{received}] {message['To']} | {message['Subject']} ({rate:.1f} msg/s)")
+            await reply("250 OK queued")
+        elif command == "QUIT":
+            await reply("221 Bye")
+            break
+        else:
+            # MAIL FROM, RCPT TO, RSET, NOOP...
+            await reply("250 OK")
+    writer.close()
+
+
+async def main(port: int):
+    server = await asyncio.start_server(handle, "localhost", port)
+    print(f"SMTP sink listening on localhost:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1025))
@@ -0,0 +1,239 @@
+"""Chunked, content-addressed snapshots of a company's sync records.
+
+A device back after days offline would otherwise replay every change since
+its cursor through /sync. Instead it fetches a manifest from
+GET /sync/{company_id}/snapshot, with the cursor the snapshot is valid at and
+the chunks of every collection (hash, records, bytes).
+
+1. It downloads only the chunks whose hash it does not hold yet, from
+   GET /sync/{company_id}/chunks/{hash}: gzip NDJSON in the /sync record
+   format, immutable and cacheable forever.
+2. It drops the chunks that are no longer listed.
+3. It continues with /sync from the manifest cursor.
+
+Push the write queue before resyncing, so the snapshot already includes
+those writes.
+
+Chunk boundaries are content-defined: a record whose id hashes to 0 modulo
+SNAPSHOT_CHUNK_RECORDS starts a new chunk. Each chunk is the id range up to
+the next boundary, so a change touches one chunk and leaves every other hash
+as it was. Deleted records stay in the table as boundaries but are left out
+of the chunk contents.
+
+Chunks are stored in sync_chunks and rebuilt lazily when a manifest is
+requested: only the ranges holding a record written since the last build are
+read again. Ranges only ever split, so a new SNAPSHOT_CHUNK_RECORDS applies
+as ranges are rebuilt; delete a company's sync_chunks rows to re-chunk it
+from scratch. A manifest can outlive its chunks; a 404 on a chunk means
+"fetch the manifest again".
+"""
+import base64
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import List
+
+from pydantic import BaseModel
+
+import metrics
+from streaming import pages
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_CHUNK_RECORDS = int(os.environ.get('SNAPSHOT_CHUNK_RECORDS', '256'))
+SNAPSHOT_PAGE_SIZE = 1000
+# chunk rows carry their body, so they are upserted in smaller batches
+SNAPSHOT_WRITE_BATCH = 50
+# decoded chunk bodies kept in memory, by (company, hash)
+SNAPSHOT_CACHE_BYTES = int(os.environ.get('SNAPSHOT_CACHE_BYTES', str(64 * 1024 * 1024)))
+CHUNK_COLUMNS = "collection, start_id, hash, records, bytes, cursor"
+RECORD_COLUMNS = "collection, record_id, data, version, deleted"
+
+chunks_built = metrics.counter("snapshot_chunks_built_total", "Snapshot chunks rebuilt after a change")
+build_duration = metrics.histogram("snapshot_build_duration_ms", "Time to bring a company's snapshot up to date")
+chunk_downloads = metrics.counter("snapshot_chunk_downloads_total", "Chunk downloads, by cache outcome")
+
+
+class SnapshotChunk(BaseModel):
+    collection: str
+    start: str
+    hash: str
+    records: int
+    bytes: int
+
+
+class SnapshotManifest(BaseModel):
+    format: int
+    cursor: int
+    chunks: List[SnapshotChunk]
+
+
+def is_boundary(record_id: str) -> bool:
+    digest = hashlib.sha1(record_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % SNAPSHOT_CHUNK_RECORDS == 0
+
+
+def _line(row: dict) -> bytes:
+    # sorted keys: the same record always encodes, and so hashes, the same way
+    return json.dumps(
+        {"collection": row["collection"], "id": row["record_id"], "data": row.get("data") or {},
+         "version": row.get("version") or {}},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    ).encode("utf-8") + b"\n"
+
+
+def _scoped(query, company: dict):
+    return query.eq("owner_id", company["owner_id"]).eq("company_id", company["id"])
+
+
+class ChunkCache:
+    def __init__(self, max_bytes: int = SNAPSHOT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._bodies = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._bodies:
+                return
+            self._bodies[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _key, evicted = self._bodies.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class SnapshotStore:
+    def __init__(self, client):
+        self.client = client
+        self.cache = ChunkCache()
+        # one build per company at a time in this process; builds are deterministic,
+        # so two workers racing write the same chunks
+        self._locks = defaultdict(threading.Lock)
+
+    def manifest(self, company: dict) -> dict:
+        with self._locks[company["id"]]:
+            cursor, chunks = self._refresh(company)
+        listed = [c for c in chunks if c["records"]]
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "cursor": cursor,
+            "chunks": [
+                {"collection": c["collection"], "start": c["start_id"], "hash": c["hash"],
+                 "records": c["records"], "bytes": c["bytes"]}
+                for c in listed
+            ],
+        }
+
+    def chunk(self, company: dict, digest: str):
+        """Decoded gzip body of one of the company's chunks, or None."""
+        key = (company["id"], digest)
+        body = self.cache.get(key)
+        if body is not None:
+            chunk_downloads.inc(cache="hit")
+            return body
+        rows = _scoped(self.client.table("sync_chunks").select("body"), company).eq("hash", digest).limit(1).execute().data
+        if not rows:
+            return None
+        chunk_downloads.inc(cache="miss")
+        body = base64.b64decode(rows[0]["body"])
+        self.cache.put(key, body)
+        return body
+
+    def _refresh(self, company: dict):
+        started = time.perf_counter()
+        stored = [
+            row for page in pages(
+                lambda: _scoped(self.client.table("sync_chunks").select(CHUNK_COLUMNS), company).order(
+                    "collection"
+                ).order("start_id"),
+                SNAPSHOT_PAGE_SIZE,
+            ) for row in page
+        ]
+        cursor = max((row["cursor"] for row in stored), default=0)
+        changed, new_cursor = self._changed(company, cursor)
+        if not changed:
+            return cursor, stored
+
+        starts = defaultdict(list)
+        for row in stored:
+            starts[row["collection"]].append(row["start_id"])
+        built = []
+        for collection, ids in changed.items():
+            # "" starts the first range of every collection, so each id falls in one
+            bounds = sorted(starts.get(collection) or [""])
+            for index in sorted({bisect.bisect_right(bounds, record_id) - 1 for record_id in ids}):
+                end = bounds[index + 1] if index + 1 < len(bounds) else None
+                built.extend(self._build(company, collection, bounds[index], end, new_cursor))
+        for i in range(0, len(built), SNAPSHOT_WRITE_BATCH):
+            self.client.table("sync_chunks").upsert(
+                built[i:i + SNAPSHOT_WRITE_BATCH], on_conflict="company_id,collection,start_id"
+            ).execute()
+
+        chunks_built.inc(len(built))
+        build_duration.observe((time.perf_counter() - started) * 1000)
+        merged = {(row["collection"], row["start_id"]): row for row in stored}
+        merged.update({(row["collection"], row["start_id"]): row for row in built})
+        return new_cursor, [merged[key] for key in sorted(merged)]
+
+    def _changed(self, company: dict, cursor: int):
+        """collection -> ids written after cursor, and the last seq seen."""
+        changed = defaultdict(set)
+        while True:
+            # keyset on seq: a row rewritten meanwhile moves to the end instead of shifting a page
+            page = _scoped(self.client.table("sync_records").select("collection, record_id, seq"), company).gt(
+                "seq", cursor
+            ).order("seq").limit(SNAPSHOT_PAGE_SIZE).execute().data
+            for row in page:
+                changed[row["collection"]].add(row["record_id"])
+            if page:
+                cursor = page[-1]["seq"]
+            if len(page) < SNAPSHOT_PAGE_SIZE:
+                return changed, cursor
+
+    def _build(self, company: dict, collection: str, start: str, end, cursor: int) -> list:
+        """Chunk rows for the ids in [start, end); the first one always keeps `start`."""
+        chunks, current, lines, last = [], start, [], None
+        while True:
+            query = _scoped(self.client.table("sync_records").select(RECORD_COLUMNS), company).eq("collection", collection)
+            query = query.gte("record_id", start) if last is None else query.gt("record_id", last)
+            if end is not None:
+                query = query.lt("record_id", end)
+            page = query.order("record_id").limit(SNAPSHOT_PAGE_SIZE).execute().data
+            for row in page:
+                if row["record_id"] != current and is_boundary(row["record_id"]):
+                    chunks.append(self._chunk(company, collection, current, lines, cursor))
+                    current, lines = row["record_id"], []
+                if not row.get("deleted"):
+                    lines.append(_line(row))
+            if len(page) < SNAPSHOT_PAGE_SIZE:
+                break
+            last = page[-1]["record_id"]
+        chunks.append(self._chunk(company, collection, current, lines, cursor))
+        return chunks
+
+    def _chunk(self, company: dict, collection: str, start: str, lines: list, cursor: int) -> dict:
+        content = b"".join(lines)
+        # mtime=0 keeps the compressed bytes stable too
+        body = gzip.compress(content, mtime=0)
+        return {
+            "company_id": company["id"], "owner_id": company["owner_id"], "collection": collection,
+            "start_id": start, "hash": hashlib.sha256(content).hexdigest(), "records": len(lines),
+            "bytes": len(body), "body": base64.b64encode(body).decode("ascii"), "cursor": cursor,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+        }
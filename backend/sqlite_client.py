@@ -0,0 +1,368 @@
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime, timezone
+
+from migrate import SQLiteMigrator, load_migrations, migrate
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# alias:table!fkey(columns) or table(columns), as in PostgREST embedding
+_EMBED = re.compile(r"^(?:(\w+):)?(\w+)(?:!(\w+))?\((.*)\)$", re.S)
+# Columns that default to NOW() in the Postgres schema; filled in Python so they
+# share the isoformat() layout the backend compares against
+_NOW_COLUMNS = ("created_at", "next_attempt_at")
+
+
+class APIResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _split_columns(columns: str) -> list:
+    """Split a select list on top-level commas, keeping embedded (...) groups whole."""
+    parts, depth, current = [], 0, []
+    for ch in columns:
+        if ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current.append(ch)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def _encode(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class SQLiteQuery:
+    """The subset of supabase-py's query builder the backend uses, on top of sqlite3."""
+
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = client._check_table(table)
+        self._op = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._filters = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+
+    # ---- operations ----
+
+    def select(self, *columns, count=None):
+        self._op = "select"
+        self._columns = ", ".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, json, **_kwargs):
+        self._op = "insert"
+        self._payload = json if isinstance(json, list) else [json]
+        return self
+
+    def upsert(self, json, on_conflict: str = "", ignore_duplicates: bool = False, **_kwargs):
+        self._op = "upsert"
+        self._payload = json if isinstance(json, list) else [json]
+        self._on_conflict = on_conflict or None
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json, **_kwargs):
+        self._op = "update"
+        self._payload = json
+        return self
+
+    def delete(self, **_kwargs):
+        self._op = "delete"
+        return self
+
+    # ---- filters ----
+
+    def _filter(self, column: str, sql: str, *params):
+        self._filters.append(f"{self.client._check_column(self.table, column)} {sql}")
+        self._params.extend(_encode(p) for p in params)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "= ?", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "<> ?", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "> ?", value)
+
+    def gte(self, column, value):
+        return self._filter(column, ">= ?", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "< ?", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "<= ?", value)
+
+    def like(self, column, pattern):
+        return self._filter(column, "LIKE ?", pattern.replace("*", "%"))
+
+    def ilike(self, column, pattern):
+        self.client._check_column(self.table, column)
+        self._filters.append(f"lower({column}) LIKE lower(?)")
+        self._params.append(pattern.replace("*", "%"))
+        return self
+
+    def is_(self, column, value):
+        value = str(value).lower() if value is not None else "null"
+        if value not in ("null", "true", "false"):
+            raise ValueError(f"is_ no soporta {value!r}")
+        sql = "IS NULL" if value == "null" else f"= {int(value == 'true')}"
+        return self._filter(column, sql)
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self._filters.append("0")
+            return self
+        return self._filter(column, f"IN ({', '.join('?' * len(values))})", *values)
+
+    # ---- modifiers ----
+
+    def order(self, column, desc: bool = False, nullsfirst: bool = None):
+        # PostgREST default: NULLs last ascending, first descending
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        column = self.client._check_column(self.table, column)
+        # the clause is moot on NOT NULL columns, and leaving it out lets SQLite read
+        # an index backwards for DESC instead of sorting in a temp B-tree
+        nulls = "" if column in self.client._not_null[self.table] else f" NULLS {'FIRST' if nulls_first else 'LAST'}"
+        self._order.append(f"{column} {'DESC' if desc else 'ASC'}{nulls}")
+        return self
+
+    def limit(self, size: int):
+        self._limit = int(size)
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # ---- execution ----
+
+    def _where(self) -> str:
+        return f" WHERE {' AND '.join(self._filters)}" if self._filters else ""
+
+    def execute(self) -> APIResponse:
+        return getattr(self, f"_execute_{self._op}")()
+
+    def _execute_select(self):
+        plain, embeds = [], []
+        for item in _split_columns(self._columns):
+            match = _EMBED.match(item)
+            if match:
+                embeds.append(match.groups())
+            elif item == "*":
+                plain.append("*")
+            else:
+                plain.append(self.client._check_column(self.table, item))
+
+        # embeds need their local key even if the caller did not ask for it
+        fetched = list(plain) or ["id"]
+        local_keys = []
+        for alias, table, fkey, _cols in embeds:
+            local = self.client._embed_key(self.table, table, fkey)
+            local_keys.append(local)
+            if "*" not in fetched and local not in fetched:
+                fetched.append(local)
+
+        sql = f"SELECT {', '.join(fetched)} FROM {self.table}{self._where()}"
+        if self._order:
+            sql += f" ORDER BY {', '.join(self._order)}"
+        if self._limit is not None or self._offset is not None:
+            sql += f" LIMIT {self._limit if self._limit is not None else -1} OFFSET {self._offset or 0}"
+        rows = self.client._query(self.table, sql, self._params)
+
+        for (alias, table, _fkey, sub_columns), local in zip(embeds, local_keys):
+            self._embed(rows, alias or table, table, local, sub_columns)
+        if "*" not in plain:
+            requested = set(plain) | {alias or table for alias, table, _f, _c in embeds}
+            rows = [{k: v for k, v in row.items() if k in requested} for row in rows]
+
+        count = None
+        if self._count:
+            conn = self.client._conn()
+            count = conn.execute(f"SELECT COUNT(*) FROM {self.table}{self._where()}", self._params).fetchone()[0]
+        return APIResponse(rows, count)
+
+    def _embed(self, rows, alias, table, local, sub_columns):
+        ids = list({row[local] for row in rows if row.get(local) is not None})
+        related = {}
+        if ids:
+            columns = _split_columns(sub_columns) or ["*"]
+            keep_id = "*" in columns or "id" in columns
+            if not keep_id:
+                columns.append("id")
+            for item in SQLiteQuery(self.client, table).select(", ".join(columns)).in_("id", ids).execute().data:
+                related[item["id"]] = item if keep_id else {k: v for k, v in item.items() if k != "id"}
+        for row in rows:
+            row[alias] = related.get(row.get(local))
+
+    def _prepare(self, row: dict) -> dict:
+        row = {self.client._check_column(self.table, k): _encode(v) for k, v in row.items()}
+        columns = self.client._columns[self.table]
+        if self.client._pk[self.table] == ["id"] and row.get("id") is None:
+            row["id"] = str(uuid.uuid4())
+        if self._op == "insert":
+            now = datetime.now(timezone.utc).isoformat()
+            for column in _NOW_COLUMNS:
+                if column in columns and row.get(column) is None:
+                    row[column] = now
+        return row
+
+    def _insert_sql(self, row: dict) -> str:
+        columns = ", ".join(row)
+        sql = f"INSERT INTO {self.table} ({columns}) VALUES ({', '.join('?' * len(row))})"
+        if self._op == "upsert":
+            target = self._on_conflict or ", ".join(self.client._pk[self.table])
+            for col in target.split(","):
+                self.client._check_column(self.table, col.strip())
+            if self._ignore_duplicates:
+                sql += f" ON CONFLICT({target}) DO NOTHING"
+            else:
+                updates = ", ".join(f"{c} = excluded.{c}" for c in row)
+                sql += f" ON CONFLICT({target}) DO UPDATE SET {updates}"
+        return sql + " RETURNING *"
+
+    def _execute_insert(self):
+        statements = []
+        for row in self._payload:
+            row = self._prepare(row)
+            statements.append((self._insert_sql(row), list(row.values())))
+        return APIResponse(self.client._write(self.table, statements))
+
+    _execute_upsert = _execute_insert
+
+    def _execute_update(self):
+        row = {self.client._check_column(self.table, k): _encode(v) for k, v in self._payload.items()}
+        sets = ", ".join(f"{c} = ?" for c in row)
+        sql = f"UPDATE {self.table} SET {sets}{self._where()} RETURNING *"
+        return APIResponse(self.client._write(self.table, [(sql, list(row.values()) + self._params)]))
+
+    def _execute_delete(self):
+        sql = f"DELETE FROM {self.table}{self._where()} RETURNING *"
+        return APIResponse(self.client._write(self.table, [(sql, self._params)]))
+
+
+class SQLiteClient:
+    """Embedded stand-in for the Supabase client: same table() / execute() surface.
+
+    One connection per thread (the threadpool reuses its threads); WAL lets
+    readers run while a writer commits.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._columns = None
+        self._pk = None
+        self._not_null = None
+        self._conn()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._init_lock:
+                if self._columns is None:
+                    self._load_schema(conn)
+        return conn
+
+    def _load_schema(self, conn):
+        migrate(SQLiteMigrator(conn), load_migrations("sqlite"))
+        columns, pk, not_null = {}, {}, {}
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+            columns[table] = {r["name"]: (r["type"] or "").upper() for r in info}
+            pk[table] = [r["name"] for r in sorted(info, key=lambda r: r["pk"]) if r["pk"]]
+            # primary keys are always generated or given, never NULL
+            not_null[table] = {r["name"] for r in info if r["notnull"] or r["pk"]}
+        self._columns, self._pk, self._not_null = columns, pk, not_null
+
+    def _check_table(self, table: str) -> str:
+        if table not in self._columns:
+            raise ValueError(f"Tabla desconocida: {table}")
+        return table
+
+    def _check_column(self, table: str, column: str) -> str:
+        column = column.strip()
+        if not _IDENTIFIER.match(column) or column not in self._columns[table]:
+            raise ValueError(f"Columna desconocida en {table}: {column}")
+        return column
+
+    def _embed_key(self, table: str, target: str, fkey: str = None) -> str:
+        # PostgREST constraint names follow <table>_<column>_fkey
+        if fkey and fkey.startswith(f"{table}_") and fkey.endswith("_fkey"):
+            return self._check_column(table, fkey[len(table) + 1:-len("_fkey")])
+        self._check_table(target)
+        guess = f"{target.rstrip('s')}_id"
+        return self._check_column(table, guess)
+
+    def _decode(self, table: str, row) -> dict:
+        types = self._columns[table]
+        out = {}
+        for key in row.keys():
+            value = row[key]
+            kind = types.get(key, "")
+            if value is not None and kind == "BOOLEAN":
+                value = bool(value)
+            elif value is not None and kind == "JSON":
+                value = json.loads(value)
+            out[key] = value
+        return out
+
+    def _query(self, table: str, sql: str, params) -> list:
+        return [self._decode(table, r) for r in self._conn().execute(sql, params).fetchall()]
+
+    def _write(self, table: str, statements) -> list:
+        conn = self._conn()
+        rows = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                rows.extend(self._decode(table, r) for r in conn.execute(sql, params).fetchall())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, name)
+
+    from_ = table
@@ -0,0 +1,349 @@
+"""Record sync for offline-capable clients (ERP integrations, mobile sellers).
+
+Clients POST gzip-compressed NDJSON, one changed record per line:
+
+    {"collection": "orders", "id": "A-17", "data": {...}, "version": {"tablet-3": 12}, "deleted": false}
+
+`version` is a version vector (node id -> counter). A record is written only
+when its vector dominates the stored one; equal vectors are retries and are
+ignored, anything else is rejected with the server copy so the client can
+merge. The response carries every server-side change after the client's
+cursor (a per-store sequence bumped on each write).
+
+Devices that queue edits while offline POST them to /sync/{company_id}/queue
+instead, as field patches, in the order they were made:
+
+    {"collection": "orders", "id": "A-17", "set": {"qty": 3}, "unset": ["note"], "version": {"tablet-3": 13}, "at": 1767225600000}
+
+A patch whose vector dominates the stored one is applied. A concurrent one
+is merged rather than rejected: each field keeps the value with the latest
+edit time (`at`, device milliseconds, capped at the server's clock), and the
+merged vector dominates both sides. Full records written through /sync count
+as edited at the time the server received them.
+
+Cursor guarantee: a client that reads changes after its cursor never
+misses a committed write to that company. Each write takes the next seq
+under a per-company lock that is held until commit (Postgres migration
+0015; SQLite serializes every write anyway). A seq therefore becomes
+visible only after every lower seq of the same company is visible.
+Delta and snapshot readers can trust the highest seq they see. This is
+separate from the read-then-write race described in apply_batch.
+"""
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+import metrics
+
+SYNC_MAX_COMPRESSED_BYTES = 8 * 1024 * 1024
+SYNC_MAX_BODY_BYTES = 64 * 1024 * 1024
+SYNC_MAX_RECORDS = 20000
+SYNC_CHUNK_SIZE = 500
+SYNC_DELTA_LIMIT = 2000
+DELTA_COLUMNS = "collection, record_id, data, version, deleted, seq"
+STATE_COLUMNS = "collection, record_id, data, version, deleted, clock, seq"
+# clock key for deleted / restored
+DELETED_FIELD = "$deleted"
+
+records_total = metrics.counter("sync_records_total", "Records received by /sync, by outcome")
+queued_total = metrics.counter("sync_queued_writes_total", "Queued writes received by /sync/queue, by outcome")
+batch_duration = metrics.histogram("sync_batch_duration_ms", "Time to apply one /sync batch")
+
+
+class SyncPayloadError(Exception):
+    def __init__(self, status_code: int, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class SyncRecord(BaseModel):
+    collection: str = Field(pattern=r"^[a-z][a-z0-9_]{0,62}$")
+    id: str = Field(min_length=1, max_length=128)
+    data: dict = {}
+    version: Dict[str, int]
+    deleted: bool = False
+
+
+class QueuedWrite(BaseModel):
+    collection: str = Field(pattern=r"^[a-z][a-z0-9_]{0,62}$")
+    id: str = Field(min_length=1, max_length=128)
+    set: dict = {}
+    unset: List[str] = []
+    deleted: Optional[bool] = None
+    version: Dict[str, int]
+    at: int = Field(ge=0)
+
+
+class SyncChange(BaseModel):
+    collection: str
+    id: str
+    data: dict
+    version: Dict[str, int]
+    deleted: bool
+    seq: int
+
+
+class SyncRejected(BaseModel):
+    collection: str
+    id: str
+    reason: str
+    server: SyncChange
+
+
+class SyncResult(BaseModel):
+    cursor: int
+    has_more: bool
+    accepted: int
+    unchanged: int
+    rejected: List[SyncRejected]
+    changes: List[SyncChange]
+
+
+class QueueConflict(BaseModel):
+    collection: str
+    id: str
+    overridden: List[str]
+
+
+class QueueResult(BaseModel):
+    cursor: int
+    has_more: bool
+    applied: int
+    merged: int
+    unchanged: int
+    conflicts: List[QueueConflict]
+    changes: List[SyncChange]
+
+
+_records = TypeAdapter(List[SyncRecord])
+_queued = TypeAdapter(List[QueuedWrite])
+
+
+def decode_body(body: bytes, content_encoding: str) -> bytes:
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        raw = body
+    elif encoding in ("gzip", "deflate"):
+        # cap the inflated size so a small body cannot expand without bound
+        inflater = zlib.decompressobj(zlib.MAX_WBITS | (16 if encoding == "gzip" else 0))
+        try:
+            raw = inflater.decompress(body, SYNC_MAX_BODY_BYTES + 1)
+        except zlib.error:
+            raise SyncPayloadError(400, "Cuerpo comprimido inválido")
+    else:
+        raise SyncPayloadError(415, f"Content-Encoding no soportado: {encoding}")
+    if len(raw) > SYNC_MAX_BODY_BYTES:
+        raise SyncPayloadError(413, "Lote demasiado grande")
+    return raw
+
+
+def parse_records(raw: bytes, adapter: TypeAdapter = _records) -> list:
+    lines = [line for line in raw.split(b"\n") if line.strip()]
+    if len(lines) > SYNC_MAX_RECORDS:
+        raise SyncPayloadError(413, f"Máximo {SYNC_MAX_RECORDS} registros por lote")
+    # one validate_json call over the whole batch instead of one per line
+    try:
+        return adapter.validate_json(b"[" + b",".join(lines) + b"]")
+    except ValidationError as e:
+        errors = [
+            {"line": err["loc"][0] + 1 if err["loc"] and isinstance(err["loc"][0], int) else None,
+             "field": ".".join(str(p) for p in err["loc"][1:]), "error": err["msg"]}
+            for err in e.errors()[:20]
+        ]
+        raise SyncPayloadError(422, errors)
+
+
+def compare(incoming: dict, stored: dict) -> str:
+    """'newer', 'older', 'equal' or 'concurrent' for incoming relative to stored."""
+    ahead = any(v > stored.get(k, 0) for k, v in incoming.items())
+    behind = any(v > incoming.get(k, 0) for k, v in stored.items())
+    if ahead and behind:
+        return "concurrent"
+    if ahead:
+        return "newer"
+    return "older" if behind else "equal"
+
+
+def parse_queue(raw: bytes) -> list:
+    return parse_records(raw, _queued)
+
+
+def _change(row: dict) -> dict:
+    return {
+        "collection": row["collection"], "id": row["record_id"], "data": row.get("data") or {},
+        "version": row.get("version") or {}, "deleted": bool(row.get("deleted")), "seq": row["seq"],
+    }
+
+
+def apply_batch(client, company: dict, records: list, cursor: int) -> bytes:
+    """Write the dominating records and return the encoded SyncResult.
+
+    Versions are read and written in separate round trips, so two writers
+    racing on one record can both pass the check; the later write wins.
+    """
+    started = time.perf_counter()
+    company_id, owner_id = company["id"], company["owner_id"]
+    latest = {}
+    for record in records:
+        latest[(record.collection, record.id)] = record
+
+    stored = _stored(client, company, latest, DELTA_COLUMNS)
+    # a full record replaces every field as of now, for later merges of queued edits
+    clock = {"*": int(time.time() * 1000)}
+    writes, rejected, unchanged = [], [], 0
+    for key, record in latest.items():
+        current = stored.get(key)
+        relation = compare(record.version, current.get("version") or {}) if current else "newer"
+        if relation == "newer":
+            writes.append({
+                "company_id": company_id, "owner_id": owner_id, "collection": record.collection,
+                "record_id": record.id, "data": record.data, "version": record.version, "deleted": record.deleted,
+                "clock": clock,
+            })
+        elif relation == "equal":
+            unchanged += 1
+        else:
+            rejected.append({
+                "collection": record.collection, "id": record.id,
+                "reason": "stale" if relation == "older" else "conflict", "server": _change(current),
+            })
+
+    _write(client, writes)
+    # the client already holds what it just sent; only the cursor has to move past it
+    changes, new_cursor, has_more = _delta(
+        client, company, cursor, {(w["collection"], w["record_id"]): w["version"] for w in writes}
+    )
+
+    records_total.inc(len(writes), outcome="accepted")
+    records_total.inc(unchanged, outcome="unchanged")
+    records_total.inc(len(rejected), outcome="rejected")
+    batch_duration.observe((time.perf_counter() - started) * 1000)
+    return SyncResult.model_validate({
+        "cursor": new_cursor,
+        "has_more": has_more,
+        "accepted": len(writes),
+        "unchanged": unchanged,
+        "rejected": rejected,
+        "changes": changes,
+    }).model_dump_json().encode("utf-8")
+
+
+def _scoped(query, company: dict):
+    return query.eq("owner_id", company["owner_id"]).eq("company_id", company["id"])
+
+
+def _stored(client, company: dict, keys, columns: str) -> dict:
+    stored = {}
+    ids = sorted({record_id for _c, record_id in keys})
+    for i in range(0, len(ids), SYNC_CHUNK_SIZE):
+        rows = _scoped(client.table("sync_records").select(columns), company).in_(
+            "record_id", ids[i:i + SYNC_CHUNK_SIZE]
+        ).execute().data
+        for row in rows:
+            stored[(row["collection"], row["record_id"])] = row
+    return stored
+
+
+def _write(client, rows: list):
+    for i in range(0, len(rows), SYNC_CHUNK_SIZE):
+        client.table("sync_records").upsert(
+            rows[i:i + SYNC_CHUNK_SIZE], on_conflict="company_id,collection,record_id"
+        ).execute()
+
+
+def _delta(client, company: dict, cursor: int, echoed: dict):
+    """(changes after cursor, new cursor, has_more); rows still at an `echoed` version are skipped."""
+    delta = _scoped(client.table("sync_records").select(DELTA_COLUMNS), company).gt("seq", cursor).order(
+        "seq"
+    ).limit(SYNC_DELTA_LIMIT + 1).execute().data
+    has_more = len(delta) > SYNC_DELTA_LIMIT
+    delta = delta[:SYNC_DELTA_LIMIT]
+    changes = [
+        _change(row) for row in delta
+        if echoed.get((row["collection"], row["record_id"])) != (row.get("version") or {})
+    ]
+    return changes, delta[-1]["seq"] if delta else cursor, has_more
+
+
+def _edited_at(state: dict, field: str) -> int:
+    clock = state["clock"]
+    return max(clock.get(field, 0), clock.get("*", 0))
+
+
+def apply_queue(client, company: dict, writes: list, cursor: int) -> bytes:
+    """Fold queued patches into the stored records, in order, and return the encoded QueueResult.
+
+    Several patches to one record in a batch are folded in memory and written
+    once. As in apply_batch, a concurrent writer between the read and the
+    write can be overwritten.
+    """
+    started = time.perf_counter()
+    now = int(time.time() * 1000)
+    stored = _stored(client, company, {(w.collection, w.id) for w in writes}, STATE_COLUMNS)
+    state, outcome, overridden = {}, {}, {}
+    counts = {"applied": 0, "merged": 0, "unchanged": 0}
+    for write in writes:
+        key = (write.collection, write.id)
+        current = state.get(key)
+        if current is None:
+            row = stored.get(key)
+            current = state[key] = {
+                "data": dict(row.get("data") or {}), "version": dict(row.get("version") or {}),
+                "deleted": bool(row.get("deleted")), "clock": dict(row.get("clock") or {}),
+            } if row else {"data": {}, "version": {}, "deleted": False, "clock": {}}
+        relation = compare(write.version, current["version"])
+        if relation in ("equal", "older"):
+            # a replay, or already superseded
+            counts["unchanged"] += 1
+            continue
+        # a fast device clock must not win every later conflict
+        at = min(write.at, now)
+        concurrent = relation == "concurrent"
+        edits = [(f, True, v) for f, v in write.set.items()] + [(f, False, None) for f in write.unset]
+        if write.deleted is not None:
+            edits.append((DELETED_FIELD, True, write.deleted))
+        for field, present, value in edits:
+            if concurrent and _edited_at(current, field) > at:
+                overridden.setdefault(key, []).append(field)
+                continue
+            if field == DELETED_FIELD:
+                current["deleted"] = value
+            elif present:
+                current["data"][field] = value
+            else:
+                current["data"].pop(field, None)
+            current["clock"][field] = at
+        current["version"] = {
+            node: max(current["version"].get(node, 0), write.version.get(node, 0))
+            for node in current["version"].keys() | write.version.keys()
+        }
+        counts["merged" if concurrent else "applied"] += 1
+        outcome[key] = "merged" if concurrent or outcome.get(key) == "merged" else "applied"
+
+    rows = [
+        {"company_id": company["id"], "owner_id": company["owner_id"], "collection": collection,
+         "record_id": record_id, **state[(collection, record_id)]}
+        for collection, record_id in outcome
+    ]
+    _write(client, rows)
+    # applied records match the device's copy; merged ones come back in changes
+    changes, new_cursor, has_more = _delta(client, company, cursor, {
+        key: state[key]["version"] for key, result in outcome.items() if result == "applied"
+    })
+
+    for result, count in counts.items():
+        queued_total.inc(count, outcome=result)
+    batch_duration.observe((time.perf_counter() - started) * 1000)
+    return QueueResult.model_validate({
+        "cursor": new_cursor,
+        "has_more": has_more,
+        **counts,
+        "conflicts": [
+            {"collection": collection, "id": record_id, "overridden": sorted(set(fields))}
+            for (collection, record_id), fields in overridden.items()
+        ],
+        "changes": changes,
+    }).model_dump_json().encode("utf-8")
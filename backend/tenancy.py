@@ -0,0 +1,330 @@
+"""Tenant-aware routing of table queries across several data stores (shards).
+
+A tenant is a customer account, identified by its user id: subscriptions and
+companies carry it in user_id / owner_id. Those tables are routed to the
+tenant's shard; everything else (users, contact messages, audit, outbox,
+scheduler state) lives on the default shard. User rows are mirrored to the
+tenant's shard as well, so foreign keys and PostgREST embeds keep working there.
+
+Configured with DATA_SHARDS (JSON):
+
+    {"default": {"url": "https://a.supabase.co", "key": "..."},
+     "acme":    {"url": "https://b.supabase.co", "key": "...", "dedicated": true},
+     "local":   {"path": "/data/local.db"}}
+
+plus optional TENANT_PINS ({"<user id>": "acme"}) for isolating a customer.
+Dedicated shards only receive pinned tenants; the rest are spread with
+consistent hashing, so adding a shard moves roughly 1/N tenants
+(see `python tenancy.py plan`).
+"""
+import bisect
+import contextvars
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD = os.environ.get('DEFAULT_SHARD', 'default')
+TENANT_PINS = json.loads(os.environ.get('TENANT_PINS') or '{}')
+RING_VNODES = int(os.environ.get('RING_VNODES', '64'))
+
+# table -> column holding the tenant id
+TENANT_TABLES = {
+    "subscriptions": "user_id", "companies": "owner_id", "sync_records": "owner_id", "sync_chunks": "owner_id",
+}
+# derived from other tenant rows; a move drops them and the target rebuilds its own
+REBUILT_TABLES = {"sync_chunks"}
+# written to the default shard and to the shard of the tenant the row belongs to
+MIRRORED_TABLES = {"users": "id"}
+
+MOVE_PAGE_SIZE = 1000
+# generated in Postgres (admin search); never written back when copying rows
+GENERATED_COLUMNS = {"search_tsv"}
+
+current_tenant = contextvars.ContextVar("current_tenant", default=None)
+
+shard_queries = metrics.counter("shard_queries_total", "Table queries executed per shard")
+fanouts = metrics.counter("shard_fanout_total", "Queries without a tenant that ran on every shard")
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes."""
+
+    def __init__(self, nodes, vnodes: int = RING_VNODES):
+        self.nodes = sorted(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _n in points]
+        self._nodes = [n for _h, n in points]
+
+    def node_for(self, key: str) -> str:
+        i = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[i]
+
+
+def _storable(rows: list) -> list:
+    return [{k: v for k, v in row.items() if k not in GENERATED_COLUMNS} for row in rows]
+
+
+def _sort_key(value):
+    # None sorts after any value; mixed types fall back to their string form
+    return (value is None, "" if value is None else value if isinstance(value, (int, float)) else str(value))
+
+
+class ShardedQuery:
+    """Records a query-builder chain and replays it on the shard(s) it belongs to."""
+
+    _OPS = ("select", "insert", "upsert", "update", "delete")
+
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = table
+        self._calls = []
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def record(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+        return record
+
+    def _op(self):
+        return next((m for m, _a, _k in self._calls if m in self._OPS), "select")
+
+    def _replay(self, shard: str, calls=None):
+        shard_queries.inc(shard=shard, table=self.table)
+        builder = self.client.shards[shard].table(self.table)
+        for method, args, kwargs in (calls or self._calls):
+            builder = getattr(builder, method)(*args, **kwargs)
+        return builder.execute()
+
+    def _filtered_tenant(self, column: str):
+        for method, args, _kwargs in self._calls:
+            if method == "eq" and args[0] == column:
+                return str(args[1])
+        return None
+
+    def _with_payload(self, rows):
+        return [(m, (rows,) + a[1:], k) if m in ("insert", "upsert") else (m, a, k) for m, a, k in self._calls]
+
+    def execute(self):
+        op = self._op()
+        if self.table in MIRRORED_TABLES:
+            return self._execute_mirrored(op)
+        column = TENANT_TABLES.get(self.table)
+        if column is None:
+            return self._replay(self.client.default)
+
+        if op in ("insert", "upsert"):
+            return self._execute_insert(column)
+        tenant = self._filtered_tenant(column) or current_tenant.get()
+        if tenant is not None:
+            return self._replay(self.client.shard_for(tenant))
+        return self._execute_fanout(op)
+
+    def _execute_insert(self, column: str):
+        payload = next(a[0] for m, a, _k in self._calls if m in ("insert", "upsert"))
+        rows = payload if isinstance(payload, list) else [payload]
+        groups = defaultdict(list)
+        for row in rows:
+            tenant = row.get(column) or current_tenant.get()
+            groups[self.client.shard_for(tenant) if tenant else self.client.default].append(row)
+        if len(groups) == 1:
+            return self._replay(next(iter(groups)))
+        results = [self._replay(shard, self._with_payload(group)) for shard, group in groups.items()]
+        return _merged(results, [r for res in results for r in res.data])
+
+    def _execute_mirrored(self, op: str):
+        result = self._replay(self.client.default)
+        if op == "select" or len(self.client.shards) == 1:
+            return result
+        column = MIRRORED_TABLES[self.table]
+        copies = defaultdict(list)
+        for row in result.data or []:
+            shard = self.client.shard_for(row.get(column))
+            if shard != self.client.default:
+                copies[shard].append(row)
+        for shard, rows in copies.items():
+            try:
+                if op == "delete":
+                    self._replay(shard)
+                else:
+                    # the default shard generated ids and defaults; copy the stored rows as-is
+                    self.client.shards[shard].table(self.table).upsert(_storable(rows)).execute()
+            except Exception as e:
+                logger.error(f"Could not mirror {self.table} to shard {shard}: {e}")
+        return result
+
+    def _execute_fanout(self, op: str):
+        fanouts.inc(table=self.table, op=op)
+        calls, order, window = [], [], None
+        for method, args, kwargs in self._calls:
+            if method == "order":
+                order.append((args[0], kwargs.get("desc", False)))
+            elif method == "range" and op == "select":
+                # every shard returns its first end+1 rows; the global window is cut after merging
+                window = (args[0], args[1] + 1)
+                args = (0, args[1])
+            elif method == "limit" and op == "select":
+                window = (0, args[0])
+            calls.append((method, args, kwargs))
+
+        results = [self._replay(shard, calls) for shard in self.client.shards]
+        rows = [r for res in results for r in (res.data or [])]
+        for column, desc in reversed(order):
+            rows.sort(key=lambda r: _sort_key(r.get(column)), reverse=desc)
+        if window:
+            rows = rows[window[0]:window[1]]
+        return _merged(results, rows)
+
+
+def _merged(results, rows):
+    response = results[0]
+    counts = [getattr(r, "count", None) for r in results]
+    response.data = rows
+    if any(c is not None for c in counts):
+        response.count = sum(c or 0 for c in counts)
+    return response
+
+
+class ShardedClient:
+    """Drop-in for the single data client: same table() surface, routed per tenant."""
+
+    def __init__(self, shards: dict, default: str = DEFAULT_SHARD, pins: dict = None, dedicated=()):
+        if default not in shards:
+            raise ValueError(f"DEFAULT_SHARD {default!r} no está en DATA_SHARDS")
+        self.shards = shards
+        self.default = default
+        self.pins = {str(k): v for k, v in (pins or {}).items()}
+        unknown = set(self.pins.values()) - set(shards)
+        if unknown:
+            raise ValueError(f"TENANT_PINS apunta a shards inexistentes: {', '.join(sorted(unknown))}")
+        self.ring = HashRing([name for name in shards if name not in set(dedicated)] or [default])
+
+    def shard_for(self, tenant_id) -> str:
+        if tenant_id is None:
+            return self.default
+        tenant_id = str(tenant_id)
+        return self.pins.get(tenant_id) or self.ring.node_for(tenant_id)
+
+    def table(self, name: str):
+        if len(self.shards) == 1:
+            return self.shards[self.default].table(name)
+        return ShardedQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: dict = None):
+        # admin_search only sees the default shard; use SEARCH_BACKEND=memory when sharded
+        return self.shards[self.default].rpc(fn, params)
+
+
+def create_sharded_client(config: dict, client_factory) -> ShardedClient:
+    shards = {name: client_factory(cfg) for name, cfg in config.items()}
+    dedicated = [name for name, cfg in config.items() if cfg.get("dedicated")]
+    return ShardedClient(shards, DEFAULT_SHARD, TENANT_PINS, dedicated)
+
+
+class TenantMiddleware:
+    """Sets current_tenant for the request from the bearer token (via `resolve`)."""
+
+    def __init__(self, app, resolve):
+        self.app = app
+        self.resolve = resolve
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        tenant = None
+        auth = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+        if auth.lower().startswith("bearer "):
+            tenant = self.resolve(auth[7:].strip())
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+
+
+# ============== REBALANCING ==============
+
+def tenant_placement(client: ShardedClient) -> dict:
+    """tenant id -> set of shards currently holding its rows."""
+    placement = defaultdict(set)
+    for shard, store in client.shards.items():
+        for table, column in TENANT_TABLES.items():
+            start = 0
+            while True:
+                rows = store.table(table).select(column).range(start, start + MOVE_PAGE_SIZE - 1).execute().data
+                for row in rows:
+                    placement[str(row[column])].add(shard)
+                if len(rows) < MOVE_PAGE_SIZE:
+                    break
+                start += MOVE_PAGE_SIZE
+    return placement
+
+
+def plan_moves(client: ShardedClient) -> list:
+    """(tenant, source, target) for rows that are not on the shard the ring/pins assign."""
+    return [
+        (tenant, source, client.shard_for(tenant))
+        for tenant, shards in sorted(tenant_placement(client).items())
+        for source in sorted(shards)
+        if source != client.shard_for(tenant)
+    ]
+
+
+def move_tenant(client: ShardedClient, tenant: str, source: str, target: str) -> int:
+    """Copy a tenant's rows to target, then delete them from source. Safe to re-run."""
+    src, dst = client.shards[source], client.shards[target]
+    user = client.shards[client.default].table("users").select("*").eq("id", tenant).execute().data
+    if user and target != client.default:
+        dst.table("users").upsert(_storable(user)).execute()
+    moved = 0
+    for table, column in TENANT_TABLES.items():
+        if table in REBUILT_TABLES:
+            src.table(table).delete().eq(column, tenant).execute()
+            continue
+        rows = src.table(table).select("*").eq(column, tenant).execute().data
+        if rows:
+            dst.table(table).upsert(_storable(rows)).execute()
+            src.table(table).delete().eq(column, tenant).execute()
+            moved += len(rows)
+    return moved
+
+
+def main():
+    import argparse
+    from pathlib import Path
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+    from db import create_data_client
+
+    parser = argparse.ArgumentParser(description="Reubica tenants según DATA_SHARDS / TENANT_PINS")
+    parser.add_argument("command", choices=["plan", "apply"])
+    args = parser.parse_args()
+
+    client = create_data_client()
+    if not isinstance(client, ShardedClient):
+        raise SystemExit("DATA_SHARDS no está configurado")
+    moves = plan_moves(client)
+    for tenant, source, target in moves:
+        line = f"  {tenant}: {source} -> {target}"
+        if args.command == "apply":
+            line += f" ({move_tenant(client, tenant, source, target)} filas)"
+        print(line)
+    print(f"{len(moves)} tenants {'movidos' if args.command == 'apply' else 'por mover'}")
+
+
+if __name__ == "__main__":
+    main()
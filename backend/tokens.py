@@ -0,0 +1,250 @@
+"""Access-token signing and verification, with key rotation and a verified-token cache.
+
+Signing keys are PEM files in JWT_KEYS_DIR, one per key id: `<kid>.pem`.
+
+- Ed25519 keys sign EdDSA tokens and P-256 keys sign ES256 tokens.
+- New tokens are signed with JWT_SIGNING_KID, or else the newest private key
+  (kids sort by creation time).
+- A key reduced to its public half keeps verifying the tokens it signed, but
+  signs nothing new; remove the file once those tokens have expired.
+
+The public halves are published at /api/.well-known/jwks.json, so other
+services can verify our tokens locally.
+
+Without JWT_KEYS_DIR, tokens are HS256 with JWT_SECRET, as before. With
+keys, JWT_SECRET only verifies the HS256 tokens already issued, so a
+switch-over logs nobody out. With neither the server refuses to start;
+JWT_ALLOW_DEFAULT_SECRET=true falls back to a built-in secret for local
+development only, since anyone reading this file can forge its tokens.
+
+Every key is pinned to its algorithm: the token's `kid` picks the key, and
+its `alg` header must match it. An ES256 key is never used as an HS256
+secret.
+
+Verified tokens are kept in a bounded LRU (JWT_CACHE_SIZE) until they expire.
+Repeat requests with the same bearer token then skip the signature check;
+expiry is still checked on every call.
+
+    python tokens.py generate [--alg EdDSA|ES256]   # new key; it signs from the next restart
+    python tokens.py retire <kid>                   # keep only its public half
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import jwt
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+import metrics
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+except ImportError:  # only needed for JWT_KEYS_DIR
+    serialization = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SECRET = 'billennium-secret-key-2024-ecuador'
+JWT_SECRET = os.environ.get('JWT_SECRET', '')
+JWT_KEYS_DIR = os.environ.get('JWT_KEYS_DIR', '')
+JWT_ALLOW_DEFAULT_SECRET = os.environ.get('JWT_ALLOW_DEFAULT_SECRET', 'false').lower() == 'true'
+JWT_SIGNING_KID = os.environ.get('JWT_SIGNING_KID', '')
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', '10000'))
+
+ALGORITHMS = ("EdDSA", "ES256")
+
+verifications = metrics.counter("jwt_verifications_total", "Access tokens checked, by outcome")
+
+
+class TokenKey:
+    def __init__(self, kid, algorithm: str, signing_key, verifying_key):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.signing_key = signing_key  # None for retired keys
+        self.verifying_key = verifying_key
+
+    def jwk(self) -> dict:
+        exporter = OKPAlgorithm if self.algorithm == "EdDSA" else ECAlgorithm
+        return {**exporter.to_jwk(self.verifying_key, as_dict=True), "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+def _algorithm(key) -> str:
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) and key.curve.name == "secp256r1":
+        return "ES256"
+    raise ValueError("Solo se admiten claves Ed25519 (EdDSA) y P-256 (ES256)")
+
+
+def load_key(path: Path) -> TokenKey:
+    pem = path.read_bytes()
+    if b"PRIVATE KEY" in pem:
+        private = serialization.load_pem_private_key(pem, password=None)
+        return TokenKey(path.stem, _algorithm(private), private, private.public_key())
+    public = serialization.load_pem_public_key(pem)
+    return TokenKey(path.stem, _algorithm(public), None, public)
+
+
+def load_keys(directory: str) -> dict:
+    if serialization is None:
+        raise RuntimeError("JWT_KEYS_DIR necesita el paquete cryptography (pyjwt[crypto])")
+    return {key.kid: key for key in map(load_key, sorted(Path(directory).glob("*.pem")))}
+
+
+def _kid(token: str):
+    # jwt.decode parses and checks the header again; this only has to pick the key,
+    # and is several times cheaper than jwt.get_unverified_header
+    try:
+        segment = token.split(".", 1)[0]
+        header = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+        kid = header.get("kid")
+    except (ValueError, AttributeError):
+        raise jwt.InvalidTokenError("Invalid header")
+    if kid is not None and not isinstance(kid, str):
+        raise jwt.InvalidTokenError("Invalid key id")
+    return kid
+
+
+class VerifiedCache:
+    """token -> (claims, exp) for tokens whose signature already checked out."""
+
+    def __init__(self, size: int = JWT_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                self._entries.move_to_end(token)
+            return entry
+
+    def put(self, token: str, claims: dict):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (claims, claims.get("exp"))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+class TokenService:
+    def __init__(self, keys: dict, signing_kid: str = None, secret: str = None, cache_size: int = JWT_CACHE_SIZE):
+        self.keys = dict(keys)
+        if secret:
+            # HS256 tokens carry no kid
+            self.keys[None] = TokenKey(None, "HS256", secret, secret)
+        if signing_kid is None:
+            signing_kid = max((k for k, key in keys.items() if key.signing_key is not None), default=None)
+        if signing_kid is not None and self.keys.get(signing_kid) is None:
+            raise ValueError(f"No existe la clave JWT {signing_kid}")
+        if signing_kid is not None and self.keys[signing_kid].signing_key is None:
+            raise ValueError(f"La clave JWT {signing_kid} está retirada y no puede firmar")
+        if signing_kid is None and None not in self.keys:
+            raise ValueError("No hay clave para firmar tokens")
+        self.signing = self.keys[signing_kid]
+        self.cache = VerifiedCache(cache_size)
+
+    def issue(self, claims: dict) -> str:
+        headers = {"kid": self.signing.kid} if self.signing.kid else None
+        return jwt.encode(claims, self.signing.signing_key, algorithm=self.signing.algorithm, headers=headers)
+
+    def verify(self, token: str) -> dict:
+        """Claims of a valid token; raises jwt.ExpiredSignatureError / jwt.InvalidTokenError."""
+        cached = self.cache.get(token)
+        if cached is not None:
+            claims, exp = cached
+            if exp is not None and exp <= time.time():
+                self.cache.discard(token)
+                verifications.inc(outcome="expired")
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            verifications.inc(outcome="cached")
+            return dict(claims)
+        try:
+            key = self.keys.get(_kid(token))
+            if key is None:
+                raise jwt.InvalidTokenError("Unknown key id")
+            claims = jwt.decode(token, key.verifying_key, algorithms=[key.algorithm])
+        except jwt.ExpiredSignatureError:
+            verifications.inc(outcome="expired")
+            raise
+        except jwt.InvalidTokenError:
+            verifications.inc(outcome="invalid")
+            raise
+        verifications.inc(outcome="verified")
+        self.cache.put(token, claims)
+        return dict(claims)
+
+    def jwks(self) -> dict:
+        return {"keys": [self.keys[kid].jwk() for kid in sorted(k for k in self.keys if k is not None)]}
+
+
+def create_token_service() -> TokenService:
+    if not JWT_KEYS_DIR:
+        if not JWT_SECRET:
+            if not JWT_ALLOW_DEFAULT_SECRET:
+                raise RuntimeError("Defina JWT_SECRET o JWT_KEYS_DIR (JWT_ALLOW_DEFAULT_SECRET=true solo en desarrollo)")
+            logger.warning("JWT_SECRET no está configurado; se usa el secreto por defecto (solo desarrollo)")
+        return TokenService({}, secret=JWT_SECRET or DEFAULT_SECRET)
+    keys = load_keys(JWT_KEYS_DIR)
+    logger.info(f"JWT keys loaded: {', '.join(keys) or 'none'}")
+    return TokenService(keys, JWT_SIGNING_KID or None, secret=JWT_SECRET or None)
+
+
+def generate(directory: Path, algorithm: str) -> Path:
+    private = ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+    # the timestamp makes kids sort by age; the suffix tells apart keys made in the same second
+    kid = f"{datetime.now(timezone.utc):%Y%m%d%H%M%S}-{os.urandom(3).hex()}"
+    path = directory / f"{kid}.pem"
+    directory.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    path.chmod(0o600)
+    return path
+
+
+def retire(directory: Path, kid: str) -> Path:
+    path = directory / f"{kid}.pem"
+    key = load_key(path)
+    path.write_bytes(key.verifying_key.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ))
+    return path
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+
+    parser = argparse.ArgumentParser(description="Claves de firma de tokens")
+    parser.add_argument("--dir", default=os.environ.get('JWT_KEYS_DIR', ''))
+    commands = parser.add_subparsers(dest="command", required=True)
+    gen = commands.add_parser("generate")
+    gen.add_argument("--alg", choices=ALGORITHMS, default="EdDSA")
+    ret = commands.add_parser("retire")
+    ret.add_argument("kid")
+    args = parser.parse_args()
+    if not args.dir:
+        raise SystemExit("Defina JWT_KEYS_DIR o use --dir")
+    directory = Path(args.dir)
+    path = generate(directory, args.alg) if args.command == "generate" else retire(directory, args.kid)
+    print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -257,6 +257,24 @@ class BillenniumAPITester:
             description="Get current user's subscriptions"
         )[0]
 
+    def test_bff_dashboard(self):
+        """Test aggregated dashboard endpoint"""
+        if not self.user_token:
+            print("❌ Skipping - No user token available")
+            return False
+
+        success, response = self.run_test(
+            "BFF Dashboard",
+            "GET",
+            "bff/dashboard",
+            200,
+            token=self.user_token,
+            description="Get user, subscriptions and companies in one call"
+        )
+        if success:
+            return all(key in response for key in ['user', 'subscriptions', 'companies'])
+        return False
+
     def test_admin_stats(self):
         """Test admin stats endpoint"""
         if not self.admin_token:
@@ -309,6 +327,44 @@ class BillenniumAPITester:
             description="Get all contact messages (admin only)"
         )[0]
 
+    def test_admin_search(self):
+        """Test admin search over messages, users and companies"""
+        if not self.admin_token:
+            print("❌ Skipping - No admin token available")
+            return False
+
+        success, response = self.run_test(
+            "Admin Search",
+            "GET",
+            "admin/search?q=test&page_size=5",
+            200,
+            token=self.admin_token,
+            description="Search leads, users and companies (admin only)"
+        )
+        if success:
+            print(f"   Total hits: {response.get('total')}")
+            return 'hits' in response
+        return False
+
+    def test_admin_audit_log(self):
+        """Test admin audit log listing"""
+        if not self.admin_token:
+            print("❌ Skipping - No admin token available")
+            return False
+
+        success, response = self.run_test(
+            "Admin Audit Log",
+            "GET",
+            "admin/audit?page_size=10",
+            200,
+            token=self.admin_token,
+            description="List recent admin actions (admin only)"
+        )
+        if success:
+            print(f"   Total entries: {response.get('total')}")
+            return 'entries' in response
+        return False
+
     def test_unauthorized_access(self):
         """Test accessing admin endpoint without token"""
         return self.run_test(
@@ -364,11 +420,14 @@ def main():
     # Subscription tests
     tester.test_create_subscription()
     tester.test_get_user_subscriptions()
+    tester.test_bff_dashboard()
     
     # Admin-only tests
     tester.test_admin_stats()
     tester.test_admin_get_subscriptions()
     tester.test_admin_get_messages()
+    tester.test_admin_search()
+    tester.test_admin_audit_log()
     
     # Security tests
     tester.test_unauthorized_access()
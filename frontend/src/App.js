@@ -2,6 +2,7 @@ import { BrowserRouter, Routes, Route, Navigate } from "react-router-dom";
 import { AuthProvider } from "./context/AuthContext";
 import { Toaster } from "./components/ui/sonner";
 import Layout from "./components/Layout";
+import SessionError from "./components/SessionError";
 import { useAuth } from "./context/AuthContext";
 
 // Public Pages
@@ -30,7 +31,7 @@ const PublicPage = ({ children }) => (
 
 // Protected Admin Route
 const AdminRoute = ({ children }) => {
-  const { user, loading, isAdmin } = useAuth();
+  const { user, loading, loadError, isAdmin } = useAuth();
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -38,6 +39,9 @@ const AdminRoute = ({ children }) => {
       </div>
     );
   }
+  if (!user && loadError) {
+    return <SessionError />;
+  }
   if (!user || !isAdmin) {
     return <Navigate to="/login" replace />;
   }
@@ -13,6 +13,7 @@ import {
   ChevronRight
 } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
+import SessionError from './SessionError';
 import { Button } from './ui/button';
 
 const LOGO_URL = "https://customer-assets.emergentagent.com/job_04fdc029-61d0-4460-bdef-63f93c1202df/artifacts/3p4r9si5_billennium.jpg";
@@ -28,7 +29,7 @@ export const AdminLayout = ({ children }) => {
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const location = useLocation();
   const navigate = useNavigate();
-  const { user, logout, isAdmin, loading } = useAuth();
+  const { user, logout, isAdmin, loading, loadError } = useAuth();
 
   if (loading) {
     return (
@@ -38,6 +39,10 @@ export const AdminLayout = ({ children }) => {
     );
   }
 
+  if (!user && loadError) {
+    return <SessionError />;
+  }
+
   if (!user || !isAdmin) {
     return <Navigate to="/login" replace />;
   }
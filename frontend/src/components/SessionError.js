@@ -0,0 +1,30 @@
+import { AlertCircle } from 'lucide-react';
+import { Button } from './ui/button';
+import { useAuth } from '../context/AuthContext';
+
+// La sesión sigue abierta pero el servidor no respondió; se ofrece reintentar
+export const SessionError = () => {
+  const { retryLoad, logout } = useAuth();
+
+  return (
+    <div className="min-h-screen flex items-center justify-center bg-slate-50 p-4">
+      <div className="text-center max-w-sm">
+        <AlertCircle className="h-12 w-12 text-orange-500 mx-auto mb-4" />
+        <h2 className="text-xl font-semibold text-slate-900 mb-2">No pudimos cargar tu cuenta</h2>
+        <p className="text-slate-600 mb-6">
+          El servicio no está disponible en este momento. Tu sesión sigue abierta.
+        </p>
+        <div className="flex gap-3 justify-center">
+          <Button onClick={retryLoad} className="bg-blue-600 hover:bg-blue-700">
+            Reintentar
+          </Button>
+          <Button variant="outline" onClick={logout}>
+            Cerrar sesión
+          </Button>
+        </div>
+      </div>
+    </div>
+  );
+};
+
+export default SessionError;
@@ -1,5 +1,6 @@
 import { createContext, useContext, useState, useEffect } from 'react';
 import axios from 'axios';
+import { toast } from 'sonner';
 
 const AuthContext = createContext(null);
 
@@ -7,8 +8,12 @@ const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
 export const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
+  // Suscripciones y empresas del usuario, cargadas junto con el perfil
+  const [dashboard, setDashboard] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [loading, setLoading] = useState(true);
+  // El dashboard no cargó por una falla del servidor o de red; la sesión sigue abierta
+  const [loadError, setLoadError] = useState(false);
 
   useEffect(() => {
     if (token) {
@@ -21,11 +26,21 @@ export const AuthProvider = ({ children }) => {
 
   const fetchUser = async () => {
     try {
-      const response = await axios.get(`${API}/auth/me`);
-      setUser(response.data);
+      const response = await axios.get(`${API}/bff/dashboard`);
+      const { user: userData, subscriptions, companies } = response.data;
+      setUser(userData);
+      setDashboard({ subscriptions, companies });
+      setLoadError(false);
     } catch (error) {
       console.error('Error fetching user:', error);
-      logout();
+      // Solo un token rechazado cierra la sesión; un 5xx o un corte de red se reintenta
+      const status = error.response?.status;
+      if (status === 401 || status === 403) {
+        logout();
+      } else {
+        setLoadError(true);
+        toast.error('No se pudo cargar tu cuenta. Intenta de nuevo en unos momentos.');
+      }
     } finally {
       setLoading(false);
     }
@@ -34,6 +49,7 @@ export const AuthProvider = ({ children }) => {
   const login = async (email, password) => {
     const response = await axios.post(`${API}/auth/login`, { email, password });
     const { access_token, user: userData } = response.data;
+    setDashboard(null);
     localStorage.setItem('token', access_token);
     axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
     setToken(access_token);
@@ -44,6 +60,7 @@ export const AuthProvider = ({ children }) => {
   const register = async (userData) => {
     const response = await axios.post(`${API}/auth/register`, userData);
     const { access_token, user: newUser } = response.data;
+    setDashboard(null);
     localStorage.setItem('token', access_token);
     axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
     setToken(access_token);
@@ -51,17 +68,36 @@ export const AuthProvider = ({ children }) => {
     return newUser;
   };
 
+  const refreshDashboard = async () => {
+    const response = await axios.get(`${API}/bff/dashboard`);
+    const { user: userData, subscriptions, companies } = response.data;
+    setUser(userData);
+    setDashboard({ subscriptions, companies });
+    return { subscriptions, companies };
+  };
+
+  // Tras crear una suscripción: la próxima pantalla vuelve a pedir el dashboard
+  const invalidateDashboard = () => setDashboard(null);
+
   const logout = () => {
     localStorage.removeItem('token');
     delete axios.defaults.headers.common['Authorization'];
     setToken(null);
     setUser(null);
+    setDashboard(null);
+    setLoadError(false);
+  };
+
+  const retryLoad = () => {
+    setLoadError(false);
+    setLoading(true);
+    fetchUser();
   };
 
   const isAdmin = user?.role === 'admin';
 
   return (
-    <AuthContext.Provider value={{ user, token, loading, login, register, logout, isAdmin }}>
+    <AuthContext.Provider value={{ user, token, loading, loadError, retryLoad, login, register, logout, isAdmin, dashboard, refreshDashboard, invalidateDashboard }}>
       {children}
     </AuthContext.Provider>
   );
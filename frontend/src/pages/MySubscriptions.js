@@ -1,16 +1,14 @@
 import { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { motion } from 'framer-motion';
-import axios from 'axios';
 import { Package, Clock, CheckCircle, XCircle, AlertCircle, ArrowRight } from 'lucide-react';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
 import { useAuth } from '../context/AuthContext';
+import SessionError from '../components/SessionError';
 import Layout from '../components/Layout';
 
-const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
-
 const statusConfig = {
   pending: { label: 'Pendiente', icon: Clock, color: 'bg-yellow-100 text-yellow-800' },
   active: { label: 'Activo', icon: CheckCircle, color: 'bg-green-100 text-green-800' },
@@ -21,23 +19,28 @@ const statusConfig = {
 export const MySubscriptions = () => {
   const [subscriptions, setSubscriptions] = useState([]);
   const [loading, setLoading] = useState(true);
-  const { user, token } = useAuth();
+  const { user, token, loadError, dashboard, refreshDashboard } = useAuth();
   const navigate = useNavigate();
 
   useEffect(() => {
     if (!user) {
-      navigate('/login');
+      // Con token, AuthContext aún está cargando la cuenta o falló el servidor
+      if (!token) navigate('/login');
       return;
     }
-    fetchSubscriptions();
-  }, [user]);
+    // AuthContext ya trae las suscripciones junto con el perfil (/bff/dashboard)
+    if (dashboard) {
+      setSubscriptions(dashboard.subscriptions);
+      setLoading(false);
+    } else {
+      fetchSubscriptions();
+    }
+  }, [user, token, dashboard]);
 
   const fetchSubscriptions = async () => {
     try {
-      const response = await axios.get(`${API}/subscriptions/my`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setSubscriptions(response.data);
+      const data = await refreshDashboard();
+      setSubscriptions(data.subscriptions);
     } catch (error) {
       console.error('Error fetching subscriptions:', error);
     } finally {
@@ -45,6 +48,10 @@ export const MySubscriptions = () => {
     }
   };
 
+  if (!user && loadError) {
+    return <SessionError />;
+  }
+
   if (loading) {
     return (
       <Layout>
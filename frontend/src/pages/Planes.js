@@ -40,7 +40,7 @@ export const Planes = () => {
   const [loading, setLoading] = useState(true);
   const [selectedProduct, setSelectedProduct] = useState('restoflow');
   const [subscribing, setSubscribing] = useState(false);
-  const { user, token } = useAuth();
+  const { user, token, invalidateDashboard } = useAuth();
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -76,6 +76,7 @@ export const Planes = () => {
       });
       
       toast.success('¡Solicitud enviada! Un administrador revisará tu suscripción.');
+      invalidateDashboard();
       navigate('/mis-suscripciones');
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Error al procesar la suscripción');
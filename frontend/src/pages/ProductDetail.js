@@ -163,7 +163,7 @@ const productExtras = {
 export const ProductDetail = () => {
   const { slug } = useParams();
   const navigate = useNavigate();
-  const { user, token } = useAuth();
+  const { user, token, invalidateDashboard } = useAuth();
   const [product, setProduct] = useState(null);
   const [loading, setLoading] = useState(true);
   const [subscribing, setSubscribing] = useState(false);
@@ -202,6 +202,7 @@ export const ProductDetail = () => {
       });
 
       toast.success('¡Solicitud enviada! Un administrador revisará tu suscripción.');
+      invalidateDashboard();
       navigate('/mis-suscripciones');
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Error al procesar la suscripción');
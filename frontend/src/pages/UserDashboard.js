@@ -1,7 +1,6 @@
 import { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { motion } from 'framer-motion';
-import axios from 'axios';
 import {
   UtensilsCrossed,
   Smartphone,
@@ -19,8 +18,8 @@ import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
 import { useAuth } from '../context/AuthContext';
+import SessionError from '../components/SessionError';
 
-const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
 const LOGO_URL = "/billennium-logo.png";
 
@@ -79,23 +78,28 @@ const productConfig = {
 export const UserDashboard = () => {
   const [subscriptions, setSubscriptions] = useState([]);
   const [loading, setLoading] = useState(true);
-  const { user, token, logout } = useAuth();
+  const { user, token, loadError, dashboard, refreshDashboard, logout } = useAuth();
   const navigate = useNavigate();
 
   useEffect(() => {
     if (!user) {
-      navigate('/login');
+      // Con token, AuthContext aún está cargando la cuenta o falló el servidor
+      if (!token) navigate('/login');
       return;
     }
-    fetchSubscriptions();
-  }, [user]);
+    // AuthContext ya trae las suscripciones junto con el perfil (/bff/dashboard)
+    if (dashboard) {
+      setSubscriptions(dashboard.subscriptions);
+      setLoading(false);
+    } else {
+      fetchSubscriptions();
+    }
+  }, [user, token, dashboard]);
 
   const fetchSubscriptions = async () => {
     try {
-      const response = await axios.get(`${API}/subscriptions/my`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setSubscriptions(response.data);
+      const data = await refreshDashboard();
+      setSubscriptions(data.subscriptions);
     } catch (error) {
       console.error('Error fetching subscriptions:', error);
     } finally {
@@ -113,6 +117,10 @@ export const UserDashboard = () => {
     .filter(sub => sub.is_enabled && sub.status === 'active')
     .map(sub => sub.product_id);
 
+  if (!user && loadError) {
+    return <SessionError />;
+  }
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center bg-slate-50">
@@ -22,25 +22,10 @@ import { toast } from 'sonner';
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
-const PRODUCTS = [
-  { id: 'restoflow', name: 'RestoFlow' },
-  { id: 'sentinel', name: 'Pedidos Sentinel' },
-  { id: 'importaciones', name: 'Módulo de Importaciones' },
-  { id: 'lopdp', name: 'LOPDP' },
-  { id: 'facturacion', name: 'Facturación Electrónica' },
-  { id: 'dashboard', name: 'Dashboard Empresarial' },
-  { id: 'plataforma-ferias', name: 'Plataforma Móvil para Ferias' },
-];
-
-const PLANS = {
-  restoflow: ['Emprendedor', 'Empresarial', 'Corporativo'],
-  sentinel: ['Básico', 'Profesional', 'Corporativo'],
-  importaciones: ['Estándar', 'Profesional'],
-  lopdp: ['PYME', 'Empresarial'],
-  facturacion: ['Básico', 'Profesional', 'Empresarial'],
-  dashboard: ['Básico', 'Profesional'],
-  'plataforma-ferias': ['Estándar'],
-};
+// Productos sin planes publicados (p. ej. Plataforma Ferias) se asignan con este plan
+const DEFAULT_PLANS = ['Estándar'];
+
+const USER_SEARCH_DEBOUNCE_MS = 250;
 
 const statusConfig = {
   pending: { label: 'Pendiente', color: 'bg-yellow-100 text-yellow-800' },
@@ -51,7 +36,7 @@ const statusConfig = {
 
 export const AdminSubscriptions = () => {
   const [subscriptions, setSubscriptions] = useState([]);
-  const [users, setUsers] = useState([]);
+  const [catalog, setCatalog] = useState([]);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
   const [statusFilter, setStatusFilter] = useState('all');
@@ -60,6 +45,9 @@ export const AdminSubscriptions = () => {
   // Modal para agregar producto
   const [showAddModal, setShowAddModal] = useState(false);
   const [selectedUserId, setSelectedUserId] = useState('');
+  const [userQuery, setUserQuery] = useState('');
+  const [userResults, setUserResults] = useState([]);
+  const [searchingUsers, setSearchingUsers] = useState(false);
   const [selectedProduct, setSelectedProduct] = useState('');
   const [selectedPlan, setSelectedPlan] = useState('');
   const [addingProduct, setAddingProduct] = useState(false);
@@ -68,15 +56,45 @@ export const AdminSubscriptions = () => {
     fetchData();
   }, []);
 
+  // Búsqueda de usuarios con debounce para el selector del modal
+  useEffect(() => {
+    const query = userQuery.trim();
+    if (query.length < 2) {
+      setUserResults([]);
+      return;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      setSearchingUsers(true);
+      try {
+        const token = localStorage.getItem('token');
+        const response = await axios.get(`${API}/admin/users/search`, {
+          params: { q: query, role: 'user', limit: 10 },
+          headers: { Authorization: `Bearer ${token}` }
+        });
+        if (!cancelled) setUserResults(response.data);
+      } catch (error) {
+        if (!cancelled) setUserResults([]);
+      } finally {
+        if (!cancelled) setSearchingUsers(false);
+      }
+    }, USER_SEARCH_DEBOUNCE_MS);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [userQuery]);
+
   const fetchData = async () => {
     try {
       const token = localStorage.getItem('token');
-      const [subsRes, usersRes] = await Promise.all([
-        axios.get(`${API}/admin/subscriptions`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API}/admin/users`, { headers: { Authorization: `Bearer ${token}` } })
-      ]);
-      setSubscriptions(subsRes.data);
-      setUsers(usersRes.data.filter(u => u.role !== 'admin'));
+      const response = await axios.get(`${API}/bff/admin/subscriptions`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setSubscriptions(response.data.subscriptions);
+      setCatalog(response.data.catalog);
     } catch (error) {
       console.error('Error fetching data:', error);
       toast.error('Error al cargar los datos');
@@ -109,6 +127,27 @@ export const AdminSubscriptions = () => {
     }
   };
 
+  const handleRenew = async (subscriptionId) => {
+    setUpdating(subscriptionId);
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.post(`${API}/admin/subscriptions/${subscriptionId}/renew`, {}, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+
+      setSubscriptions(subs => subs.map(s =>
+        s.id === subscriptionId ? { ...s, is_enabled: true, status: 'active' } : s
+      ));
+
+      const periodEnd = new Date(response.data.current_period_end).toLocaleDateString('es-EC');
+      toast.success(`Pago registrado; periodo vigente hasta ${periodEnd}`);
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Error al renovar la suscripción');
+    } finally {
+      setUpdating(null);
+    }
+  };
+
   const handleAddProduct = async () => {
     if (!selectedUserId || !selectedProduct || !selectedPlan) {
       toast.error('Completa todos los campos');
@@ -129,6 +168,8 @@ export const AdminSubscriptions = () => {
       toast.success('Producto agregado correctamente');
       setShowAddModal(false);
       setSelectedUserId('');
+      setUserQuery('');
+      setUserResults([]);
       setSelectedProduct('');
       setSelectedPlan('');
       fetchData();
@@ -139,6 +180,12 @@ export const AdminSubscriptions = () => {
     }
   };
 
+  const selectedPlans = (() => {
+    const product = catalog.find(p => p.id === selectedProduct);
+    if (!product) return null;
+    return product.plans.length > 0 ? product.plans : DEFAULT_PLANS;
+  })();
+
   const filteredSubscriptions = subscriptions.filter(sub => {
     const matchesSearch =
       sub.user_name?.toLowerCase().includes(search.toLowerCase()) ||
@@ -270,6 +317,17 @@ export const AdminSubscriptions = () => {
                             </div>
                             <div className="flex items-center gap-3">
                               <Badge className={status.color}>{status.label}</Badge>
+                              {(sub.status === 'active' || sub.status === 'suspended') && (
+                                <Button
+                                  variant="outline"
+                                  size="sm"
+                                  onClick={() => handleRenew(sub.id)}
+                                  disabled={updating === sub.id}
+                                  data-testid={`renew-${sub.id}`}
+                                >
+                                  Registrar pago
+                                </Button>
+                              )}
                               <div className="flex items-center gap-2">
                                 <span className="text-sm text-slate-600">
                                   {sub.is_enabled ? 'Activo' : 'Inactivo'}
@@ -306,18 +364,41 @@ export const AdminSubscriptions = () => {
             <div className="space-y-4 py-4">
               <div className="space-y-2">
                 <Label>Usuario</Label>
-                <Select value={selectedUserId} onValueChange={setSelectedUserId}>
-                  <SelectTrigger data-testid="select-user">
-                    <SelectValue placeholder="Selecciona un usuario" />
-                  </SelectTrigger>
-                  <SelectContent>
-                    {users.map(user => (
-                      <SelectItem key={user.id} value={user.id}>
-                        {user.name} ({user.email})
-                      </SelectItem>
-                    ))}
-                  </SelectContent>
-                </Select>
+                <div className="relative">
+                  <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-4 w-4 text-slate-400" />
+                  <Input
+                    placeholder="Buscar por nombre, email o empresa..."
+                    value={userQuery}
+                    onChange={(e) => { setUserQuery(e.target.value); setSelectedUserId(''); }}
+                    className="pl-10"
+                    data-testid="select-user"
+                  />
+                </div>
+                {userQuery.trim().length >= 2 && !selectedUserId && (
+                  <div className="max-h-56 overflow-y-auto rounded-md border border-slate-200">
+                    {searchingUsers && userResults.length === 0 ? (
+                      <p className="p-3 text-sm text-slate-500">Buscando...</p>
+                    ) : userResults.length === 0 ? (
+                      <p className="p-3 text-sm text-slate-500">Sin resultados</p>
+                    ) : (
+                      userResults.map(user => (
+                        <button
+                          key={user.id}
+                          type="button"
+                          onClick={() => { setSelectedUserId(user.id); setUserQuery(`${user.name} (${user.email})`); }}
+                          className="w-full text-left px-3 py-2 text-sm hover:bg-slate-50"
+                          data-testid={`user-option-${user.id}`}
+                        >
+                          <span className="font-medium text-slate-900">{user.name}</span>
+                          <span className="text-slate-500"> ({user.email})</span>
+                          {user.company_name && (
+                            <span className="block text-xs text-slate-400">{user.company_name}</span>
+                          )}
+                        </button>
+                      ))
+                    )}
+                  </div>
+                )}
               </div>
 
               <div className="space-y-2">
@@ -327,7 +408,7 @@ export const AdminSubscriptions = () => {
                     <SelectValue placeholder="Selecciona un producto" />
                   </SelectTrigger>
                   <SelectContent>
-                    {PRODUCTS.map(product => (
+                    {catalog.map(product => (
                       <SelectItem key={product.id} value={product.id}>
                         {product.name}
                       </SelectItem>
@@ -336,7 +417,7 @@ export const AdminSubscriptions = () => {
                 </Select>
               </div>
 
-              {selectedProduct && PLANS[selectedProduct] && (
+              {selectedProduct && selectedPlans && (
                 <div className="space-y-2">
                   <Label>Plan</Label>
                   <Select value={selectedPlan} onValueChange={setSelectedPlan}>
@@ -344,7 +425,7 @@ export const AdminSubscriptions = () => {
                       <SelectValue placeholder="Selecciona un plan" />
                     </SelectTrigger>
                     <SelectContent>
-                      {PLANS[selectedProduct].map(plan => (
+                      {selectedPlans.map(plan => (
                         <SelectItem key={plan} value={plan}>
                           {plan}
                         </SelectItem>
@@ -0,0 +1,32 @@
+"""The API runs in-process on a throwaway SQLite file for every test module.
+
+server.py and the modules it imports read their settings at import time, so
+they are set here, once, before any test module imports server.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ.update({
+    "DATA_BACKEND": "sqlite",
+    "JWT_SECRET": "tests-only-secret-not-for-production",
+    "SQLITE_PATH": str(Path(tempfile.mkdtemp(prefix="billennium-tests-")) / "tests.db"),
+    "PROFILING_ENABLED": "true",
+    "PROFILE_SAMPLE_RATE": "0",
+    "SCHEDULER_ENABLED": "false",
+    "NOTIFICATIONS_ENABLED": "false",
+    "LEADS_ENABLED": "false",
+    "ADMIN_STREAMING": "false",
+    # tests tell their clients apart by X-Forwarded-For
+    "TRUST_PROXY_HEADERS": "true",
+})
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    with pytest.MonkeyPatch.context() as mp:
+        yield mp
@@ -0,0 +1,142 @@
+"""Count the data-store calls each route makes and hold them to a budget.
+
+Runs the API in-process (see conftest.py) with request profiling on, walks a
+user and an admin through the routes below, and compares each request's
+data-client calls (see backend/profiling.py) with its budget. A new
+dependency that looks the user up again, or a loop that queries per row,
+shows up here as a route over budget.
+
+Budgets are exact call counts for these small fixtures, not limits on
+production traffic; lower one when a change saves a call.
+"""
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import profiling
+import server
+
+# "METHOD route" -> data-store calls per request
+BUDGETS = {
+    "POST /api/auth/register": 2,
+    "POST /api/auth/login": 1,
+    "GET /api/auth/me": 1,
+    "GET /api/auth/entitlements": 2,
+    "GET /api/products": 0,
+    "POST /api/subscriptions": 3,
+    "GET /api/subscriptions/my": 2,
+    "POST /api/companies": 2,
+    "GET /api/companies/my": 2,
+    "GET /api/bff/dashboard": 3,
+    "POST /api/sync/{company_id}": 5,
+    "POST /api/sync/{company_id}/queue": 5,
+    "GET /api/sync/{company_id}/snapshot": 6,
+    "GET /api/sync/{company_id}/chunks/{digest}": 3,
+    "GET /api/admin/subscriptions": 2,
+    "PUT /api/admin/subscriptions/{subscription_id}": 4,
+    "POST /api/admin/subscriptions/create": 3,
+    "GET /api/admin/users": 2,
+    "GET /api/admin/companies": 2,
+    "GET /api/admin/stats": 5,
+    "GET /api/bff/admin/subscriptions": 2,
+}
+
+
+class Recorder:
+    """Stands in for profiling.store, keeping every finished request profile."""
+
+    def __init__(self):
+        self.profiles = []
+
+    def add(self, profile):
+        self.profiles.append(profile)
+
+
+def walk(client, recorder):
+    """Returns ({"METHOD route": most calls seen}, {"METHOD route": last response})."""
+    measured, responses = {}, {}
+
+    def call(method, route, path=None, **kwargs):
+        response = client.request(method, path or route, **kwargs)
+        assert response.status_code < 400, f"{method} {route}: {response.status_code} {response.text[:200]}"
+        profile = recorder.profiles.pop()
+        recorder.profiles.clear()
+        key = f"{method} {route}"
+        measured[key] = max(measured.get(key, 0), len(profile.data_calls))
+        responses[key] = response
+        return response
+
+    token = call("POST", "/api/auth/register", headers={"X-Forwarded-For": "203.0.113.9"}, json={
+        "email": "budget@example.com", "name": "Budget", "password": "budget-password",
+    }).json()["access_token"]
+    user = {"Authorization": f"Bearer {token}"}
+    call("POST", "/api/auth/login", json={"email": "budget@example.com", "password": "budget-password"})
+    call("GET", "/api/auth/me", headers=user)
+    call("GET", "/api/products")
+    sub = call("POST", "/api/subscriptions", headers=user, json={
+        "product_id": "facturacion", "plan_name": "Básico",
+    }).json()
+    call("GET", "/api/subscriptions/my", headers=user)
+    company = call("POST", "/api/companies", headers=user, json={
+        "name": "Budget SA", "email": "budget@example.com",
+    }).json()
+    call("GET", "/api/companies/my", headers=user)
+    call("GET", "/api/bff/dashboard", headers=user)
+
+    company_path = f"/api/sync/{company['id']}"
+    record = b'{"collection": "orders", "id": "A-1", "data": {"qty": 1}, "version": {"t1": 1}}\n'
+    call("POST", "/api/sync/{company_id}", company_path, headers={**user, "Content-Encoding": "gzip"},
+         content=gzip.compress(record))
+    patch = b'{"collection": "orders", "id": "A-1", "set": {"qty": 2}, "version": {"t1": 2}, "at": 1767225600000}\n'
+    call("POST", "/api/sync/{company_id}/queue", company_path + "/queue",
+         headers={**user, "Content-Encoding": "gzip"}, content=gzip.compress(patch))
+    manifest = call("GET", "/api/sync/{company_id}/snapshot", company_path + "/snapshot", headers=user).json()
+    call("GET", "/api/sync/{company_id}/chunks/{digest}", f"{company_path}/chunks/{manifest['chunks'][0]['hash']}",
+         headers=user)
+
+    admin_token = call("POST", "/api/auth/login", json={
+        "email": "facturacion@billenniumsystem.com", "password": "Admin2024!",
+    }).json()["access_token"]
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    call("GET", "/api/admin/subscriptions", headers=admin)
+    call("PUT", "/api/admin/subscriptions/{subscription_id}", f"/api/admin/subscriptions/{sub['id']}",
+         headers=admin, json={"is_enabled": True, "status": "active"})
+    call("GET", "/api/auth/entitlements", headers=user)
+    call("POST", "/api/admin/subscriptions/create", headers=admin, json={
+        "user_id": sub["user_id"], "product_id": "dashboard", "plan_name": "Básico",
+    })
+    call("GET", "/api/admin/users", headers=admin)
+    call("GET", "/api/admin/companies", headers=admin)
+    call("GET", "/api/admin/stats", headers=admin)
+    call("GET", "/api/bff/admin/subscriptions", headers=admin)
+    return measured, responses
+
+
+@pytest.fixture(scope="module")
+def walkthrough(monkeypatch_module):
+    recorder = Recorder()
+    monkeypatch_module.setattr(profiling, "store", recorder)
+    with TestClient(server.app) as client:
+        return walk(client, recorder)
+
+
+@pytest.fixture(scope="module")
+def measured(walkthrough):
+    return walkthrough[0]
+
+
+@pytest.mark.parametrize("route", BUDGETS)
+def test_route_within_budget(measured, route):
+    assert route in measured, "ruta sin ejercitar"
+    assert measured[route] <= BUDGETS[route]
+
+
+def test_every_measured_route_has_a_budget(measured):
+    assert set(measured) <= set(BUDGETS)
+
+
+def test_entitlements_follow_activation(walkthrough):
+    # read after the admin enabled the user's subscription
+    _measured, responses = walkthrough
+    assert responses["GET /api/auth/entitlements"].json() == {"products": ["facturacion"]}
@@ -0,0 +1,158 @@
+"""Degradation drills: the API with injected data-layer faults.
+
+Runs the API in-process (see conftest.py), injects errors and latency into its
+data calls (see backend/resilience.py), and checks that:
+
+- the cached read endpoints keep answering, marked stale;
+- writes fail fast with 503 and Retry-After;
+- the breaker opens and closes again once the faults stop;
+- the public catalog never depends on the data layer;
+- load shedding turns low-priority requests away first.
+
+The tests run in file order: the outage drill serves the cache the fresh reads
+filled, and recovery starts from the breaker the slow drill left open.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import resilience
+import server
+
+READS = [
+    ("/api/auth/me", "user"),
+    ("/api/subscriptions/my", "user"),
+    ("/api/companies/my", "user"),
+    ("/api/companies/my?fields=id,name", "user"),
+    ("/api/bff/dashboard", "user"),
+    ("/api/admin/stats", "admin"),
+]
+
+
+def _stale(response) -> bool:
+    return response.status_code == 200 and response.headers.get("warning", "").startswith("110")
+
+
+def _wait_for_probe():
+    time.sleep(resilience.breaker.reset_seconds + 0.1)
+
+
+@pytest.fixture(scope="module")
+def drill(monkeypatch_module):
+    monkeypatch_module.setattr(resilience, "DATA_READ_TIMEOUT_MS", 300)
+    monkeypatch_module.setattr(resilience, "DATA_WRITE_TIMEOUT_MS", 300)
+    monkeypatch_module.setattr(resilience.breaker, "threshold", 3)
+    monkeypatch_module.setattr(resilience.breaker, "reset_seconds", 1)
+    with TestClient(server.app) as client:
+        token = client.post("/api/auth/register", headers={"X-Forwarded-For": "203.0.113.7"}, json={
+            "email": "drill@example.com", "name": "Drill", "password": "drill-password",
+        }).json()["access_token"]
+        user = {"Authorization": f"Bearer {token}"}
+        client.post("/api/companies", headers=user, json={"name": "Drill SA", "email": "drill@example.com"})
+        admin_token = client.post("/api/auth/login", json={
+            "email": "facturacion@billenniumsystem.com", "password": "Admin2024!",
+        }).json()["access_token"]
+        yield SimpleNamespace(client=client, auth={"user": user, "admin": {"Authorization": f"Bearer {admin_token}"}})
+
+        resilience.faults.clear()
+        if resilience.breaker.state != resilience.CircuitBreaker.CLOSED:
+            _wait_for_probe()
+            client.get("/api/auth/me", headers=user)
+
+
+@pytest.mark.parametrize("path, who", READS)
+def test_reads_fresh_without_faults(drill, path, who):
+    response = drill.client.get(path, headers=drill.auth[who])
+    assert response.status_code == 200
+    assert "warning" not in response.headers
+
+
+def test_outage_serves_cache_and_fails_writes_fast(drill):
+    resilience.faults.set(error_rate=1.0)
+    for path, who in READS:
+        response = drill.client.get(path, headers=drill.auth[who])
+        # the stats may still be inside their fresh window
+        assert _stale(response) or (path == "/api/admin/stats" and response.status_code == 200), path
+    assert resilience.breaker.state == resilience.CircuitBreaker.OPEN
+
+    response = drill.client.post("/api/companies", headers=drill.auth["user"], json={
+        "name": "Otra", "email": "otra@example.com",
+    })
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+
+    started = time.perf_counter()
+    response = drill.client.post("/api/auth/login", json={"email": "drill@example.com", "password": "drill-password"})
+    assert response.status_code == 503
+    assert time.perf_counter() - started < 0.2, "el login no falla rápido"
+
+    assert drill.client.get("/api/products").status_code == 200
+
+
+def test_slow_probe_times_out_and_serves_cache(drill):
+    resilience.faults.set(latency_ms=2000)
+    _wait_for_probe()
+    started = time.perf_counter()
+    response = drill.client.get("/api/companies/my", headers=drill.auth["user"])
+    assert _stale(response)
+    assert time.perf_counter() - started < 1.0, "la sonda no agota el tiempo"
+    assert resilience.breaker.state == resilience.CircuitBreaker.OPEN
+
+
+def test_recovery(drill):
+    resilience.faults.clear()
+    _wait_for_probe()
+    response = drill.client.get("/api/auth/me", headers=drill.auth["user"])
+    assert response.status_code == 200
+    assert "warning" not in response.headers
+    assert resilience.breaker.state == resilience.CircuitBreaker.CLOSED
+    response = drill.client.post("/api/companies", headers=drill.auth["user"], json={
+        "name": "Otra", "email": "otra@example.com",
+    })
+    assert response.status_code == 200
+
+
+def test_load_shedding_turns_low_priority_away_first():
+    async def drill_shedding():
+        release = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        # with 4 slots, low priority gets 2 and normal priority 3
+        shedder = resilience.LoadShedMiddleware(slow_app, max_inflight=4)
+        transport = httpx.ASGITransport(app=shedder)
+        async with httpx.AsyncClient(transport=transport, base_url="http://drill") as client:
+            held = []
+
+            async def send(method, path):
+                """None while the request is held (admitted), else its status."""
+                task = asyncio.create_task(client.request(method, path))
+                await asyncio.sleep(0.05)
+                if not task.done():
+                    held.append(task)
+                    return None
+                return (await task).status_code
+
+            outcomes = [
+                await send("GET", "/api/admin/users"),
+                await send("POST", "/api/sync/c1"),
+                await send("GET", "/api/admin/stats"),
+                await send("GET", "/api/auth/me"),
+                await send("GET", "/api/companies/my"),
+                await send("POST", "/api/auth/login"),
+                await send("GET", "/api/products"),
+            ]
+            release.set()
+            return outcomes, [(await task).status_code for task in held]
+
+    outcomes, finished = asyncio.run(drill_shedding())
+    # admin, sync, admin over half, normal, normal over 3/4, login, catalog with every slot taken
+    assert outcomes == [None, None, 503, None, 503, None, 503]
+    assert finished == [200] * 4